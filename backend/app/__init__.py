@@ -1 +1,5 @@
 # Backend app package
+from dotenv import load_dotenv
+
+# Before any module reads its settings from the environment
+load_dotenv()
@@ -1,10 +1,13 @@
+import json
 from sqlalchemy.orm import Session
-from sqlalchemy import extract, case
+from sqlalchemy import extract, case, or_, and_
 from sqlalchemy import func
 from datetime import datetime, timedelta
 from . import models
 from .utils.id_generator import generate_ticket_id
 from .models import Grievance
+from .services import archive
+from .utils.severity import normalize_severity, overall_severity
 
 def create_citizen(db: Session, citizen):
     db_citizen = models.Citizen(
@@ -46,7 +49,8 @@ def get_grievance_by_ticket_id(db: Session, ticket_id: str):
 def get_all_grievances(
     db: Session,
     status: str | None = None,
-    priority: str | None = None
+    priority: str | None = None,
+    severity: str | None = None
 ):
     query = db.query(Grievance)
 
@@ -56,6 +60,8 @@ def get_all_grievances(
     if priority:
         query = query.filter(func.lower(Grievance.priority) == priority.lower())
 
+    query = severity_filter(query, severity)
+
     return query.order_by(Grievance.created_at.desc()).all()
 
 
@@ -115,7 +121,10 @@ def get_category_distribution(db: Session):
         .all()
     )
 
-    return [{"category": r.category, "count": r.count} for r in rows]
+    counts = archive.counts("category")
+    for r in rows:
+        counts[r.category] = counts.get(r.category, 0) + r.count
+    return [{"category": category, "count": count} for category, count in counts.items()]
 
 
 def get_department_performance(db: Session):
@@ -130,13 +139,150 @@ def get_department_performance(db: Session):
         .all()
     )
 
-    return [
+    # Archived grievances are all resolved
+    archived = archive.counts("department")
+    performance = [
         {
             "name": r.department,
             "pending": r.pending or 0,
             "inProgress": r.in_progress or 0,
-            "resolved": r.resolved or 0,
+            "resolved": (r.resolved or 0) + archived.pop(r.department, 0),
         }
         for r in rows
     ]
+    performance += [
+        {"name": department, "pending": 0, "inProgress": 0, "resolved": count}
+        for department, count in archived.items()
+    ]
+    return performance
+
+
+def get_duplicate_clusters(db: Session, min_size: int = 2):
+    rows = (
+        db.query(
+            models.Grievance.cluster_id,
+            func.count().label("size"),
+            func.max(models.Grievance.created_at).label("last_reported"),
+        )
+        .filter(models.Grievance.cluster_id.isnot(None))
+        .group_by(models.Grievance.cluster_id)
+        .having(func.count() >= min_size)
+        .order_by(func.count().desc())
+        .all()
+    )
+
+    heads = {
+        g.id: g
+        for g in db.query(models.Grievance).filter(
+            models.Grievance.id.in_([r.cluster_id for r in rows])
+        )
+    }
+
+    return [(heads.get(r.cluster_id), r) for r in rows]
+
+
+def get_cluster_members(db: Session, cluster_id: str):
+    return (
+        db.query(models.Grievance)
+        .filter(models.Grievance.cluster_id == cluster_id)
+        .order_by(models.Grievance.created_at.asc())
+        .all()
+    )
+
+
+def get_hotspots(
+    db: Session,
+    precision: int,
+    cells: list[str] | None = None,
+    category: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None
+):
+    """Complaint counts per geohash cell and category, served from the geohash index."""
+    cell = func.substr(models.Grievance.geohash, 1, precision).label("cell")
+    query = db.query(cell, models.Grievance.category, func.count().label("count")).filter(
+        models.Grievance.geohash.isnot(None)
+    )
 
+    if cells:
+        # Prefix range scans: every geohash starting with c sorts in [c, c + "~")
+        query = query.filter(or_(*[
+            and_(models.Grievance.geohash >= c, models.Grievance.geohash < c + "~")
+            for c in cells
+        ]))
+    if since:
+        query = query.filter(models.Grievance.created_at >= since)
+    if until:
+        query = query.filter(models.Grievance.created_at < until)
+    if category:
+        query = query.filter(models.Grievance.category == category)
+
+    return query.group_by(cell, models.Grievance.category).order_by(func.count().desc()).all()
+
+
+def image_analysis_values(grievance_id: str, analyses: list) -> list[dict]:
+    """Child-table rows for the image analyses returned by analyze_grievance."""
+    def as_json(value):
+        return json.dumps(value) if value else None
+
+    return [
+        {
+            "grievance_id": grievance_id,
+            "image_index": a.get("image_index", i),
+            "severity": normalize_severity(a.get("severity")),
+            "severity_reason": a.get("severity_reason"),
+            "description": a.get("description"),
+            "identified_problems": as_json(a.get("identified_problems")),
+            "recommended_actions": as_json(a.get("recommended_actions")),
+            "error": a.get("error"),
+        }
+        for i, a in enumerate(analyses or [])
+    ]
+
+
+def set_image_analyses(grievance: Grievance, analyses: list, assessed: str | None = None):
+    """
+    Replace the grievance's image findings and recompute its overall severity,
+    taking the combined assessment of all images into account when there is one.
+    """
+    grievance.analyses = [models.ImageAnalysis(**v) for v in image_analysis_values(grievance.id, analyses)]
+    grievance.overall_severity = overall_severity((a.get("severity") for a in analyses or []), assessed)
+
+
+def apply_analysis(db: Session, grievance: Grievance, result: dict):
+    """Store a fresh analyze_grievance result (e.g. an escalated tier) on an existing grievance."""
+    text_analysis = result.get("text_analysis", {})
+    image_analyses = result.get("image_analyses", [])
+    grievance.sentiment = text_analysis.get("sentiment", "neutral")
+    grievance.sentiment_confidence = text_analysis.get("confidence", 0.0)
+    grievance.image_analyses = json.dumps(image_analyses) if image_analyses else None
+    grievance.analysis_tier = result.get("analysis_tier")
+    set_image_analyses(grievance, image_analyses, result.get("overall_severity"))
+    db.commit()
+    db.refresh(grievance)
+    return grievance
+
+
+def severity_filter(query, severity: str | None):
+    """Filter on a comma-separated list of overall severities."""
+    if severity:
+        levels = [s.strip().lower() for s in severity.split(",") if s.strip()]
+        query = query.filter(Grievance.overall_severity.in_(levels))
+    return query
+
+
+def get_severity_counts(db: Session, since: datetime | None = None):
+    """Grievances by overall severity and image findings by severity, both from indexes."""
+    grievances = db.query(Grievance.overall_severity, func.count()).filter(
+        Grievance.overall_severity.isnot(None)
+    )
+    findings = db.query(models.ImageAnalysis.severity, func.count())
+    if since:
+        grievances = grievances.filter(Grievance.created_at >= since)
+        findings = findings.join(Grievance, models.ImageAnalysis.grievance_id == Grievance.id).filter(
+            Grievance.created_at >= since
+        )
+    return (
+        dict(grievances.group_by(Grievance.overall_severity).all()),
+        dict(findings.group_by(models.ImageAnalysis.severity).all()),
+    )
@@ -1,22 +1,176 @@
 import os
+import re
+import threading
+from contextvars import ContextVar
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "..", "db", "grievance.db")
 
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+
+def _default_archive_url(url: str) -> str:
+    # Next to a SQLite database (grievance.db -> grievance-archive.db); other databases keep the archive table
+    if url.startswith("sqlite:///") and url.endswith(".db"):
+        return url[:-len(".db")] + "-archive.db"
+    return url
+
+
+# Resolved grievances moved out of the hot tables (services/archive.py)
+ARCHIVE_DATABASE_URL = os.getenv("ARCHIVE_DATABASE_URL", _default_archive_url(DATABASE_URL))
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# Municipalities served by this deployment, each in its own database (see services/tenancy.py).
+# Requests that name no tenant use DATABASE_URL.
+TENANT_PATTERN = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+TENANTS = [t.strip().lower() for t in os.getenv("TENANTS", "").split(",") if t.strip()]
+TENANT_DATABASE_URL = os.getenv(
+    "TENANT_DATABASE_URL", "sqlite:///" + os.path.join(BASE_DIR, "..", "db", "tenants", "{tenant}", "grievance.db"))
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+for _tenant in TENANTS:
+    if not TENANT_PATTERN.match(_tenant):
+        raise ValueError(f"Invalid tenant name {_tenant!r} in TENANTS")
+
+
+def _engine(url: str) -> Engine:
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else ""
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    return create_engine(url, connect_args=connect_args)
+
+
+engine = _engine(DATABASE_URL)
 
 Base = declarative_base()
 
+archive_engine = _engine(ARCHIVE_DATABASE_URL)
+
+ArchiveBase = declarative_base()
+
+# Tenant of the current request; None is the default database
+current_tenant: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+
+
+class TenantEngines:
+    """
+    Engines per tenant, created on first use. Each tenant has its own
+    database (a separate SQLite file by default), so one city's writes never
+    wait on another's lock.
+    """
+
+    def __init__(self):
+        self._engines: Dict[Optional[str], Engine] = {None: engine}
+        self._archive_engines: Dict[Optional[str], Engine] = {None: archive_engine}
+        self._instruments: List[Callable[[Engine], None]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def url(tenant: Optional[str]) -> str:
+        return DATABASE_URL if tenant is None else TENANT_DATABASE_URL.format(tenant=tenant)
+
+    @staticmethod
+    def archive_url(tenant: Optional[str]) -> str:
+        return ARCHIVE_DATABASE_URL if tenant is None else _default_archive_url(TenantEngines.url(tenant))
+
+    def _get(self, engines: Dict[Optional[str], Engine], tenant: Optional[str], url: Callable[[Optional[str]], str]):
+        found = engines.get(tenant)
+        if found is not None:
+            return found
+        if tenant not in TENANTS:
+            raise KeyError(f"Unknown tenant {tenant!r}")
+        with self._lock:
+            if tenant not in engines:
+                created = _engine(url(tenant))
+                for instrument in self._instruments:
+                    instrument(created)
+                engines[tenant] = created
+            return engines[tenant]
+
+    def engine(self, tenant: Optional[str] = None) -> Engine:
+        return self._get(self._engines, tenant, self.url)
+
+    def archive_engine(self, tenant: Optional[str] = None) -> Engine:
+        return self._get(self._archive_engines, tenant, self.archive_url)
+
+    def instrument(self, callback: Callable[[Engine], None]):
+        """Apply callback to every engine, including ones created later."""
+        with self._lock:
+            self._instruments.append(callback)
+            for created in [*self._engines.values(), *self._archive_engines.values()]:
+                callback(created)
+
+
+tenant_engines = TenantEngines()
+
+
+class TenantSessionmaker(sessionmaker):
+    """Sessions bound to the current tenant's database, with the tenant in session.info."""
+
+    def __init__(self, engine_for: Callable[[Optional[str]], Engine], **kw):
+        super().__init__(**kw)
+        self.engine_for = engine_for
+
+    def __call__(self, **local_kw):
+        tenant = current_tenant.get()
+        if "bind" not in local_kw:
+            local_kw["bind"] = self.engine_for(tenant)
+        session = super().__call__(**local_kw)
+        session.info["tenant"] = tenant
+        return session
+
+
+SessionLocal = TenantSessionmaker(tenant_engines.engine, autocommit=False, autoflush=False, bind=engine)
+
+ArchiveSessionLocal = TenantSessionmaker(
+    tenant_engines.archive_engine, autocommit=False, autoflush=False, bind=archive_engine)
+
+T = TypeVar("T")
+
+
+class PerTenant(Generic[T]):
+    """In-memory state kept separately for each tenant (indexes, feeds), created on first use."""
+
+    def __init__(self, factory: Callable[[Optional[str]], T]):
+        self._factory = factory
+        self._instances: Dict[Optional[str], T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant: Optional[str] = None) -> T:
+        instance = self._instances.get(tenant)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(tenant)
+                if instance is None:
+                    instance = self._instances[tenant] = self._factory(tenant)
+        return instance
+
+    def current(self) -> T:
+        return self.get(current_tenant.get())
+
+    def of(self, session) -> T:
+        """The instance for the tenant whose database session is bound to."""
+        return self.get(session.info.get("tenant"))
+
+    def created(self) -> Dict[Optional[str], T]:
+        return dict(self._instances)
+
+
+def tenant_path(tenant: Optional[str], filename: str) -> str:
+    """Where a tenant's local files (vector index, notification log) live: db/ or db/tenants/<tenant>/."""
+    if tenant is None:
+        return os.path.join(os.path.dirname(DB_PATH), filename)
+    directory = os.path.join(os.path.dirname(DB_PATH), "tenants", tenant)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
 
 def get_db():
     """Dependency for getting database session"""
@@ -24,4 +178,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
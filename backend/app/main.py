@@ -1,18 +1,45 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
+import os
 import uuid
 import json
+import time
 
-from .database import engine, get_db
-from .models import Base, Grievance, Citizen
-from .services.ai_services import analyze_sentiment, analyze_image, analyze_grievance
+import anyio
+
+from .database import TENANTS, get_db, tenant_engines
+from .models import Grievance, Citizen
+from .services.ai_services import (
+    analyze_sentiment, analyze_image, analyze_grievance, calculate_urgency, choose_tier, providers_for,
+)
+from .services import (
+    admission, archive, batch_analysis, changefeed, dedup, idempotency, notifications, vector_index, warmup,
+)
+from .services.tenancy import TenantMiddleware
+from .services.row_cache import fetch_rendered, json_response, list_response, render_grievance, row_caches
+from .services.geo import normalize_location
+from .services.track_cache import track_cache
+from .services.classifier import predict_category
+from .utils.departments import CATEGORY_DEPARTMENTS
+from .routes import admin, grievance as grievance_routes
+from .utils import etag, metrics
+from .utils.profiler import ProfilerMiddleware
+from .utils.response_compression import CompressionMiddleware
+from . import crud
+
+metrics.configure_logging()
+tenant_engines.instrument(metrics.instrument_engine)
 
 app = FastAPI(title="Grievance AI Analysis API")
 
+# Innermost, so endpoint coroutines run under it (see utils/profiler.py)
+app.add_middleware(ProfilerMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -26,9 +53,69 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Request-ID", "Idempotent-Replayed"],
 )
 
-Base.metadata.create_all(bind=engine)
+# Inside observe_requests: BaseHTTPMiddleware re-streams bodies, which would look like a streamed response
+app.add_middleware(CompressionMiddleware)
+
+# Outside compression, whose cache is keyed by tenant
+app.add_middleware(TenantMiddleware)
+
+app.include_router(admin.router)
+app.include_router(grievance_routes.router)
+
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """Propagate X-Request-ID into logs and record per-route latency."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = metrics.request_id_var.set(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_LATENCY.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status,
+        )
+        metrics.request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+@app.exception_handler(admission.Rejected)
+def admission_rejected(request: Request, exc: admission.Rejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.on_event("startup")
+def prepare():
+    # Schema changes run in a separate `python -m app.migrate` step unless asked for here
+    if os.getenv("MIGRATE_ON_STARTUP", "false").lower() in ("1", "true", "yes"):
+        from .migrate import migrate
+        for tenant in [None, *TENANTS]:
+            migrate(tenant_engines.engine(tenant))
+    if warmup.WARMUP_ON_STARTUP:
+        warmup.start()
+    notifications.start_dispatchers()
+
+
+@app.on_event("shutdown")
+def save_indexes():
+    for index in vector_index.vector_indexes.created().values():
+        index.save()
+    changefeed.close_all()
+    notifications.stop_dispatchers()
 
 
 # ============ Pydantic Models ============
@@ -46,6 +133,10 @@ class GrievanceAnalysisRequest(BaseModel):
     images: Optional[List[str]] = None  # list of base64 encoded images
 
 
+class BatchAnalysisRequest(BaseModel):
+    items: List[GrievanceAnalysisRequest]
+
+
 class GrievanceCreateRequest(BaseModel):
     # Citizen info
     name: str
@@ -94,32 +185,40 @@ def root():
     return {"status": "DB ready"}
 
 
-@app.post("/api/analyze-text")
-def analyze_text_endpoint(request: TextAnalysisRequest):
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus metrics for this worker."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/api/analyze-text", dependencies=[Depends(admission.rate_limit)])
+async def analyze_text_endpoint(request: TextAnalysisRequest):
     """
     Analyze text sentiment using HuggingFace multilingual-e5-small model.
     """
     if not request.text or len(request.text.strip()) < 10:
         raise HTTPException(status_code=400, detail="Text must be at least 10 characters")
 
-    result = analyze_sentiment(request.text)
+    async with admission.admit(providers_for(), urgency=calculate_urgency(request.text)):
+        result = await admission.run(analyze_sentiment, request.text)
     return result
 
 
-@app.post("/api/analyze-image")
-def analyze_image_endpoint(request: ImageAnalysisRequest):
+@app.post("/api/analyze-image", dependencies=[Depends(admission.rate_limit)])
+async def analyze_image_endpoint(request: ImageAnalysisRequest):
     """
     Analyze image using Groq VLM to extract description and identify problems.
     """
     if not request.image:
         raise HTTPException(status_code=400, detail="Image data is required")
 
-    result = analyze_image(request.image)
+    async with admission.admit(providers_for([request.image])):
+        result = await admission.run(analyze_image, request.image)
     return result
 
 
-@app.post("/api/analyze-grievance")
-def analyze_grievance_endpoint(request: GrievanceAnalysisRequest):
+@app.post("/api/analyze-grievance", dependencies=[Depends(admission.rate_limit)])
+async def analyze_grievance_endpoint(request: GrievanceAnalysisRequest):
     """
     Analyze a complete grievance including text and images.
     Returns combined analysis with sentiment, urgency, and image descriptions.
@@ -127,24 +226,31 @@ def analyze_grievance_endpoint(request: GrievanceAnalysisRequest):
     if not request.text or len(request.text.strip()) < 10:
         raise HTTPException(status_code=400, detail="Text must be at least 10 characters")
 
-    result = analyze_grievance(request.text, request.images)
+    urgency = calculate_urgency(request.text)
+    tier = choose_tier(urgency, image_count=len(request.images or []))
+    async with admission.admit(providers_for(request.images, tier), urgency=urgency):
+        result = await admission.run(analyze_grievance, request.text, request.images, tier=tier)
     return result
 
 
-# ============ Grievance CRUD Endpoints ============
+@app.post("/api/analyze-batch")
+def analyze_batch_endpoint(request: BatchAnalysisRequest, http_request: Request):
+    """
+    Analyze many grievances in one request, with batched provider calls.
+    Streams NDJSON: one line per item as it completes (with its input "index"),
+    then a final "summary" line.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if len(request.items) > batch_analysis.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {batch_analysis.BATCH_MAX_ITEMS} items per batch")
+    admission.check_rate(http_request, batch_analysis.rate_limit_cost(len(request.items)))
+
+    results = batch_analysis.analyze_batch([(item.text, item.images) for item in request.items])
+    return StreamingResponse(batch_analysis.ndjson(results), media_type="application/x-ndjson")
 
-CATEGORY_DEPARTMENTS = {
-    "sanitation": "Municipal Corporation",
-    "water-supply": "Water Department",
-    "electricity": "Electricity Board",
-    "roads": "Public Works Department",
-    "public-safety": "Police Department",
-    "healthcare": "Health Department",
-    "education": "Education Department",
-    "housing": "Housing Authority",
-    "other": "General Administration",
-}
 
+# ============ Grievance CRUD Endpoints ============
 
 def generate_ticket_id():
     """Generate a unique ticket ID like GRV-2024-001"""
@@ -163,25 +269,96 @@ def determine_priority(urgency_score: int) -> str:
     return "low"
 
 
-@app.post("/api/grievances")
-def create_grievance(request: GrievanceCreateRequest, db: Session = Depends(get_db)):
+@app.post("/api/grievances", dependencies=[Depends(admission.rate_limit)])
+async def create_grievance(
+    request: GrievanceCreateRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None),
+):
     """
     Create a new grievance with AI analysis.
+    Near-duplicates of an open grievance are linked to its cluster head.
+    With an Idempotency-Key, a retry gets the original's response instead of a second grievance.
     """
-    # Run AI analysis
-    ai_result = analyze_grievance(request.description, request.images)
+    if idempotency_key is None:
+        return await _create_grievance(request, background_tasks, db)
+    return await idempotency.execute(db, idempotency_key, request.model_dump_json().encode(),
+                                     lambda: _create_grievance(request, background_tasks, db))
+
+
+def _prepare_grievance(request: GrievanceCreateRequest, db: Session):
+    """The local work before any provider is called: duplicate check and category."""
+    # Check for a near-duplicate before paying for AI analysis
+    signature, head, similarity = dedup.find_duplicate(db, request.description, request.location)
+
+    # Predict the category locally if not given; it also helps pick the analysis tier
+    category = request.category
+    category_confidence = None
+    if not category:
+        prediction = predict_category(f"{request.title}. {request.description}")
+        if prediction:
+            category = prediction["category"]
+            category_confidence = prediction["confidence"]
+    return signature, head, similarity, category or "other", category_confidence
+
+
+async def _create_grievance(request: GrievanceCreateRequest, background_tasks: BackgroundTasks, db: Session):
+    # Database and model work runs in the threadpool; the wait for provider slots runs on the event loop
+    prepared = await anyio.to_thread.run_sync(_prepare_grievance, request, db)
+    head, category = prepared[1], prepared[3]
+
+    if head and dedup.REUSE_ANALYSIS and (not request.images or head.image_analyses):
+        # Reuse the cluster head's analysis instead of calling the providers again
+        analysis = {
+            "sentiment": head.sentiment,
+            "sentiment_confidence": head.sentiment_confidence,
+            "urgency_score": head.urgency_score,
+            "image_analyses": json.loads(head.image_analyses) if head.image_analyses else [],
+            "assessed_severity": head.overall_severity,
+            "analysis_tier": head.analysis_tier,
+        }
+    else:
+        # Run AI analysis
+        # Keyword urgency is local and cheap; it orders the wait for provider slots and picks the tier
+        urgency = calculate_urgency(request.description)
+        analysis_tier = choose_tier(urgency, category, len(request.images or []))
+        async with admission.admit(providers_for(request.images, analysis_tier), urgency=urgency):
+            with metrics.span("analysis"):
+                ai_result = await admission.run(analyze_grievance, request.description, request.images,
+                                                tier=analysis_tier)
+
+        # Extract AI results
+        analysis = {
+            "sentiment": ai_result.get("text_analysis", {}).get("sentiment", "neutral"),
+            "sentiment_confidence": ai_result.get("text_analysis", {}).get("confidence", 0.0),
+            "urgency_score": ai_result.get("overall_urgency", 5),
+            "image_analyses": ai_result.get("image_analyses", []),
+            "assessed_severity": ai_result.get("overall_severity"),
+            "analysis_tier": analysis_tier,
+        }
 
-    # Extract AI results
-    sentiment = ai_result.get("text_analysis", {}).get("sentiment", "neutral")
-    sentiment_confidence = ai_result.get("text_analysis", {}).get("confidence", 0.0)
-    urgency_score = ai_result.get("overall_urgency", 5)
-    image_analyses = ai_result.get("image_analyses", [])
+    return await anyio.to_thread.run_sync(_store_grievance, request, background_tasks, db, prepared, analysis)
+
+
+def _store_grievance(request: GrievanceCreateRequest, background_tasks: BackgroundTasks, db: Session,
+                     prepared: tuple, analysis: dict):
+    signature, head, similarity, category, category_confidence = prepared
+    cluster_id = head.id if head else None
+    sentiment = analysis["sentiment"]
+    sentiment_confidence = analysis["sentiment_confidence"]
+    urgency_score = analysis["urgency_score"]
+    image_analyses = analysis["image_analyses"]
+    assessed_severity = analysis["assessed_severity"]
+    analysis_tier = analysis["analysis_tier"]
 
     # Determine department and priority
-    category = request.category or "other"
     department = CATEGORY_DEPARTMENTS.get(category, "General Administration")
     priority = determine_priority(urgency_score)
 
+    with metrics.span("geo.normalize"):
+        geo = normalize_location(request.location) or {}
+
     # Create citizen record
     citizen_id = str(uuid.uuid4())
     citizen = Citizen(
@@ -211,38 +388,66 @@ def create_grievance(request: GrievanceCreateRequest, db: Session = Depends(get_
         sentiment=sentiment,
         sentiment_confidence=sentiment_confidence,
         images=json.dumps(request.images) if request.images else None,
-        image_analyses=json.dumps(image_analyses) if image_analyses else None
+        image_analyses=json.dumps(image_analyses) if image_analyses else None,
+        analysis_tier=analysis_tier,
+        cluster_id=cluster_id,
+        latitude=geo.get("latitude"),
+        longitude=geo.get("longitude"),
+        geohash=geo.get("geohash")
     )
+    crud.set_image_analyses(grievance, image_analyses, assessed_severity)
     db.add(grievance)
-    db.commit()
+    if head and not head.cluster_id:
+        head.cluster_id = head.id
+    with metrics.span("db.commit"):
+        db.commit()
     db.refresh(grievance)
 
+    duplicate_index = dedup.duplicate_indexes.of(db)
+    duplicate_index.add(grievance_id, signature, cluster_id, grievance.created_at)
+    if head:
+        duplicate_index.set_cluster(head.id, head.id)
+    background_tasks.add_task(vector_index.index_grievance_task, grievance_id)
+
     return {
         "success": True,
         "ticket_id": ticket_id,
         "grievance_id": grievance_id,
         "message": "Grievance submitted successfully",
+        "duplicate_of": head.ticket_id if head else None,
+        "duplicate_similarity": round(similarity, 3) if head else None,
         "ai_analysis": {
             "sentiment": sentiment,
             "urgency_score": urgency_score,
             "priority": priority,
-            "department": department
+            "department": department,
+            "category": category,
+            "category_confidence": category_confidence,
+            "analysis_tier": analysis_tier
         }
     }
 
 
 @app.get("/api/grievances")
 def list_grievances(
+    request: Request,
     status: Optional[str] = None,
     priority: Optional[str] = None,
     department: Optional[str] = None,
     search: Optional[str] = None,
+    severity: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     List all grievances with optional filters.
+    severity is one or more overall image severities, e.g. "critical" or "high,critical".
     """
-    query = db.query(Grievance, Citizen).join(Citizen, Grievance.citizen_id == Citizen.id)
+    # Any grievance change advances the change log, so its head seq versions the whole list
+    tag = etag.make_etag("list", changefeed.head_seq(db), status, priority, department, search, severity)
+    if etag.is_fresh(request, tag):
+        return etag.not_modified(tag)
+
+    query = db.query(Grievance.id, Grievance.version).join(Citizen, Grievance.citizen_id == Citizen.id)
 
     if status:
         query = query.filter(Grievance.status == status)
@@ -250,6 +455,7 @@ def list_grievances(
         query = query.filter(Grievance.priority == priority)
     if department:
         query = query.filter(Grievance.department == department)
+    query = crud.severity_filter(query, severity)
     if search:
         search_term = f"%{search}%"
         query = query.filter(
@@ -258,71 +464,128 @@ def list_grievances(
             (Grievance.ticket_id.ilike(search_term))
         )
 
-    results = query.order_by(Grievance.created_at.desc()).all()
-
-    grievances = []
-    for grievance, citizen in results:
-        grievances.append({
-            "id": grievance.id,
-            "ticket_id": grievance.ticket_id,
-            "title": grievance.title,
-            "description": grievance.description_text,
-            "category": grievance.category,
-            "location": grievance.location,
-            "status": grievance.status,
-            "priority": grievance.priority,
-            "department": grievance.department,
-            "citizen_name": citizen.full_name,
-            "citizen_phone": citizen.phone_number,
-            "citizen_email": citizen.email,
-            "images": json.loads(grievance.images) if grievance.images else [],
-            "sentiment": grievance.sentiment,
-            "sentiment_confidence": grievance.sentiment_confidence,
-            "urgency_score": grievance.urgency_score,
-            "image_analyses": json.loads(grievance.image_analyses) if grievance.image_analyses else [],
-            "created_at": grievance.created_at.isoformat()
-        })
+    # Only ids and versions here; row bodies come from the pre-serialized cache
+    keys = query.order_by(Grievance.created_at.desc()).all()
+    return etag.set_etag(list_response(fetch_rendered(db, keys)), tag)
 
-    return {"grievances": grievances, "total": len(grievances)}
+
+@app.get("/api/grievances/changes")
+def grievance_changes(since: Optional[int] = None, limit: int = 500, db: Session = Depends(get_db)):
+    """
+    Incremental sync: changes with seq greater than `since`, oldest first.
+    Without `since`, returns no changes and the current cursor to start from.
+    """
+    if since is None:
+        return {"changes": [], "cursor": changefeed.head_seq(db), "has_more": False}
+    limit = max(1, min(limit, changefeed.PAGE_SIZE))
+    changes = changefeed.read_changes(db, since, limit)
+    return {
+        "changes": changes,
+        "cursor": changes[-1]["seq"] if changes else since,
+        "has_more": len(changes) == limit,
+    }
+
+
+@app.get("/api/grievances/changes/stream")
+async def grievance_change_stream(request: Request, since: Optional[int] = None):
+    """
+    Server-Sent Events stream of grievance changes.
+    Resumes after `since` or the Last-Event-ID header; otherwise starts from now.
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        changefeed.stream_changes(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/grievances/{grievance_id}")
-def get_grievance(grievance_id: str, db: Session = Depends(get_db)):
+def get_grievance(grievance_id: str, request: Request, db: Session = Depends(get_db)):
     """
-    Get a single grievance by ID.
+    Get a single grievance by ID, falling back to the archive for old resolved ones.
     """
-    result = db.query(Grievance, Citizen).join(
+    cached = track_cache.fetch("grievance", grievance_id, lambda: render_detail(db, grievance_id))
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Grievance not found")
+
+    tag, body = cached
+    if etag.is_fresh(request, tag):
+        return etag.not_modified(tag)
+    return etag.set_etag(json_response(body), tag)
+
+
+def render_detail(db: Session, grievance_id: str):
+    """(ETag, JSON body) of a grievance, or None if it does not exist."""
+    key = db.query(Grievance.id, Grievance.version).join(
         Citizen, Grievance.citizen_id == Citizen.id
     ).filter(
         (Grievance.id == grievance_id) | (Grievance.ticket_id == grievance_id)
     ).first()
 
-    if not result:
+    rows = fetch_rendered(db, [key]) if key else []
+    if rows:
+        return etag.make_etag("grievance", key.id, key.version), rows[0]
+
+    # Resolved long ago: served read-only from the archive
+    archived = archive.lookup(grievance_id)
+    if not archived:
+        return None
+    citizen = db.query(Citizen).filter(Citizen.id == archived.citizen_id).first() or Citizen()
+    tag = etag.make_etag("archived", archived.id, archived.archived_at)
+    return tag, render_grievance(archive.as_grievance(archived), citizen)
+
+
+@app.get("/api/grievances/{grievance_id}/similar")
+def similar_grievances(
+    grievance_id: str,
+    background_tasks: BackgroundTasks,
+    k: int = 5,
+    category: Optional[str] = None,
+    department: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Find past grievances most similar to this one by text embedding.
+    """
+    grievance = db.query(Grievance).filter(
+        (Grievance.id == grievance_id) | (Grievance.ticket_id == grievance_id)
+    ).first()
+
+    if not grievance:
         raise HTTPException(status_code=404, detail="Grievance not found")
 
-    grievance, citizen = result
+    k = max(1, min(k, 50))
+    matches = vector_index.find_similar(db, grievance, k, category=category, department=department,
+                                        background_tasks=background_tasks)
+    if matches is None:
+        raise HTTPException(status_code=503, detail="Embedding service unavailable")
 
-    return {
-        "id": grievance.id,
-        "ticket_id": grievance.ticket_id,
-        "title": grievance.title,
-        "description": grievance.description_text,
-        "category": grievance.category,
-        "location": grievance.location,
-        "status": grievance.status,
-        "priority": grievance.priority,
-        "department": grievance.department,
-        "citizen_name": citizen.full_name,
-        "citizen_phone": citizen.phone_number,
-        "citizen_email": citizen.email,
-        "images": json.loads(grievance.images) if grievance.images else [],
-        "sentiment": grievance.sentiment,
-        "sentiment_confidence": grievance.sentiment_confidence,
-        "urgency_score": grievance.urgency_score,
-        "image_analyses": json.loads(grievance.image_analyses) if grievance.image_analyses else [],
-        "created_at": grievance.created_at.isoformat()
+    rows = {
+        g.id: g for g in db.query(Grievance).filter(Grievance.id.in_([m[0] for m in matches]))
     }
 
+    similar = []
+    for match_id, score in matches:
+        match = rows.get(match_id)
+        if not match:
+            continue
+        similar.append({
+            "id": match.id,
+            "ticket_id": match.ticket_id,
+            "title": match.title,
+            "category": match.category,
+            "location": match.location,
+            "status": match.status,
+            "department": match.department,
+            "created_at": match.created_at.isoformat(),
+            "score": round(score, 4)
+        })
+
+    return {"grievance_id": grievance.id, "similar": similar}
+
 
 @app.patch("/api/grievances/{grievance_id}")
 def update_grievance(grievance_id: str, request: GrievanceUpdateRequest, db: Session = Depends(get_db)):
@@ -334,6 +597,8 @@ def update_grievance(grievance_id: str, request: GrievanceUpdateRequest, db: Ses
     ).first()
 
     if not grievance:
+        if archive.lookup(grievance_id):
+            raise HTTPException(status_code=409, detail="Grievance is archived; restore it before updating")
         raise HTTPException(status_code=404, detail="Grievance not found")
 
     if request.status:
@@ -345,6 +610,10 @@ def update_grievance(grievance_id: str, request: GrievanceUpdateRequest, db: Ses
 
     db.commit()
     db.refresh(grievance)
+    row_caches.of(db).invalidate(grievance.id)
+
+    if request.department:
+        vector_index.vector_indexes.of(db).update_metadata(grievance.id, department=grievance.department)
 
     return {"success": True, "message": "Grievance updated successfully"}
 
@@ -352,16 +621,21 @@ def update_grievance(grievance_id: str, request: GrievanceUpdateRequest, db: Ses
 @app.delete("/api/grievances/{grievance_id}")
 def delete_grievance(grievance_id: str, db: Session = Depends(get_db)):
     """
-    Delete a grievance by ID or ticket_id.
+    Delete a grievance by ID or ticket_id, including an archived one.
     """
     grievance = db.query(Grievance).filter(
         (Grievance.id == grievance_id) | (Grievance.ticket_id == grievance_id)
     ).first()
 
     if not grievance:
+        if archive.delete(db, grievance_id):
+            return {"success": True, "message": "Grievance deleted successfully"}
         raise HTTPException(status_code=404, detail="Grievance not found")
 
+    vector_index.remove_grievance(db, grievance.id)
     db.delete(grievance)
     db.commit()
+    dedup.duplicate_indexes.of(db).remove(grievance.id)
+    row_caches.of(db).invalidate(grievance.id)
 
     return {"success": True, "message": "Grievance deleted successfully"}
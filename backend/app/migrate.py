@@ -0,0 +1,99 @@
+"""
+Create or upgrade the database schema.
+
+Usage (from backend/):
+    python -m app.migrate [--dry-run] [--tenant NAME]
+
+Creates missing tables, then adds columns and indexes that the models define
+but an existing database lacks (e.g. a grievance.db from before the version,
+overall_severity, updated_at or analysis_tier columns). Only additions are
+handled; SQLite cannot change or drop columns in place. The CLI also
+upgrades the archive database (services/archive.py), and does both for the
+default database and every tenant in TENANTS unless --tenant picks one.
+
+This runs once per deploy (the build step in render.yaml), not on import,
+so API processes start without touching the schema. Set MIGRATE_ON_STARTUP=true
+to run it from the app's startup hook instead (handy for local development).
+"""
+import argparse
+import logging
+from typing import List
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+
+from .database import TENANTS, engine as default_engine, tenant_engines
+from .models import ArchiveBase, Base
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column_sql(engine: Engine, table, column) -> str:
+    column_type = column.type.compile(dialect=engine.dialect)
+    sql = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+    default = column.server_default.arg if column.server_default is not None else None
+    if default is not None:
+        sql += f" DEFAULT {default if isinstance(default, str) and default.isdigit() else repr(str(default))}"
+        if not column.nullable:
+            sql += " NOT NULL"
+    elif not column.nullable:
+        # Existing rows need a value; without a server default the column has to stay nullable
+        logger.warning("Adding %s.%s as nullable: it has no server default", table.name, column.name)
+    return sql
+
+
+def migrate(engine: Engine = default_engine, dry_run: bool = False, metadata: MetaData = Base.metadata) -> List[str]:
+    """Bring the schema up to date; returns a description of each change made (or needed)."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    changes = [f"create table {t.name}" for t in metadata.sorted_tables if t.name not in existing_tables]
+
+    statements = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        statements += [_add_column_sql(engine, table, c) for c in table.columns if c.name not in present]
+    changes += statements
+
+    missing_indexes = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {i["name"] for i in inspector.get_indexes(table.name)}
+        missing_indexes += [i for i in table.indexes if i.name not in present]
+    changes += [f"create index {i.name}" for i in missing_indexes]
+
+    if dry_run:
+        return changes
+
+    with engine.begin() as connection:
+        metadata.create_all(bind=connection)
+        for sql in statements:
+            connection.execute(text(sql))
+        for index in missing_indexes:
+            index.create(bind=connection, checkfirst=True)
+    return changes
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Create or upgrade the database schema")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the changes that would be made")
+    parser.add_argument("--tenant", choices=TENANTS, help="Only this tenant (default: all databases)")
+    args = parser.parse_args()
+
+    changes = []
+    for tenant in [args.tenant] if args.tenant else [None, *TENANTS]:
+        prefix = f"[{tenant}] " if tenant else ""
+        tenant_changes = migrate(tenant_engines.engine(tenant), args.dry_run)
+        tenant_changes += migrate(tenant_engines.archive_engine(tenant), args.dry_run, ArchiveBase.metadata)
+        changes += [prefix + change for change in tenant_changes]
+    for change in changes:
+        print(("would " if args.dry_run else "") + change)
+    print(f"{len(changes)} change(s){' pending' if args.dry_run else ' applied'}; schema is "
+          f"{'not yet ' if args.dry_run and changes else ''}up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Float
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Float, LargeBinary, Index, event, text
+from sqlalchemy.orm import relationship
 from datetime import datetime
-from .database import Base
+from .database import ArchiveBase, Base
 
 class Citizen(Base):
     __tablename__ = "citizens"
@@ -24,8 +25,193 @@ class Grievance(Base):
     location = Column(String)
     status = Column(String, default="pending")
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=True)
     # AI Analysis fields
     sentiment = Column(String, nullable=True)
     sentiment_confidence = Column(Float, nullable=True)
     images = Column(Text, nullable=True)  # JSON string of base64 images
     image_analyses = Column(Text, nullable=True)  # JSON string of image analysis results
+    analysis_tier = Column(String, nullable=True)  # fast / standard / deep (services/ai_services.py)
+    # Near-duplicate clustering: id of the cluster head grievance
+    cluster_id = Column(String, nullable=True, index=True)
+    # Normalized location (see services/geo.py)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String, nullable=True)
+    # Most severe image finding or combined assessment (utils/severity.py); per-image rows are ImageAnalysis
+    overall_severity = Column(String, nullable=True)
+    # Bumped on every update; keys the pre-serialized row cache (services/row_cache.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        # Covering index for hotspot counts by cell prefix, time window and category
+        Index("ix_grievances_geohash_created_category", "geohash", "created_at", "category"),
+        # Severity filters and counts, newest first
+        Index("ix_grievances_severity_created", "overall_severity", "created_at"),
+        # Recent-window scans (duplicate index load and refresh)
+        Index("ix_grievances_created", "created_at"),
+    )
+
+    # Loaded on access only, so list queries never touch the child table
+    analyses = relationship(
+        "ImageAnalysis", back_populates="grievance", lazy="select",
+        cascade="all, delete-orphan", order_by="ImageAnalysis.image_index",
+    )
+
+
+@event.listens_for(Grievance, "before_update")
+def _bump_version(mapper, connection, target):
+    target.version = (target.version or 0) + 1
+    target.updated_at = datetime.utcnow()
+
+
+class ImageAnalysis(Base):
+    """One AI finding per attached image; Grievance.image_analyses keeps the JSON copy the API returns."""
+    __tablename__ = "image_analyses"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grievance_id = Column(String, ForeignKey("grievances.id"), nullable=False, index=True)
+    image_index = Column(Integer, nullable=False, default=0)
+    severity = Column(String, nullable=False, default="unknown")
+    severity_reason = Column(Text, nullable=True)
+    description = Column(Text, nullable=True)
+    identified_problems = Column(Text, nullable=True)  # JSON list
+    recommended_actions = Column(Text, nullable=True)  # JSON list
+    error = Column(Text, nullable=True)
+
+    grievance = relationship("Grievance", back_populates="analyses")
+
+    __table_args__ = (
+        Index("ix_image_analyses_severity_grievance", "severity", "grievance_id"),
+    )
+
+
+class ChangeLog(Base):
+    """Append-only log of grievance creates, updates and deletes; seq is the sync cursor."""
+    __tablename__ = "change_log"
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    grievance_id = Column(String, nullable=False, index=True)
+    op = Column(String, nullable=False)  # create / update / delete, or archive / restore (services/archive.py)
+    data = Column(Text, nullable=True)  # JSON: grievance summary and previous values of changed fields
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+    # Never reuse a seq, even after the newest rows are deleted
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class StatusEvent(Base):
+    """Append-only status transitions; from_status is None for the initial status."""
+    __tablename__ = "status_events"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grievance_id = Column(String, nullable=False)
+    from_status = Column(String, nullable=True)
+    to_status = Column(String, nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_status_events_grievance_changed", "grievance_id", "changed_at"),
+        Index("ix_status_events_to_status_changed", "to_status", "changed_at"),
+    )
+
+
+class NotificationOutbox(Base):
+    """
+    Citizen notifications, written in the same commit as the status change (services/notifications.py).
+    A pending row absorbs later changes to the same grievance until it is sent.
+    """
+    __tablename__ = "notification_outbox"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grievance_id = Column(String, nullable=False)
+    channel = Column(String, nullable=False)  # sms / email
+    state = Column(String, nullable=False, default="pending")  # pending / sent / skipped / failed
+    previous_status = Column(String, nullable=True)  # what the citizen was last told
+    status = Column(String, nullable=False)  # latest status to announce
+    changes = Column(Integer, nullable=False, default=1)  # status changes coalesced into this message
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    available_at = Column(DateTime, nullable=False)  # end of the coalescing window, then of each backoff
+    claimed_by = Column(String, nullable=True)
+    claimed_until = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # At most one pending message per grievance and channel: that row is the coalescing point
+        Index("ix_notification_outbox_pending", "grievance_id", "channel", unique=True,
+              sqlite_where=text("state = 'pending'")),
+        Index("ix_notification_outbox_state_available", "state", "available_at"),
+    )
+
+
+class ResolutionSketch(Base):
+    """t-digest of hours from submission to first resolution, per department, category and month."""
+    __tablename__ = "resolution_sketches"
+    department = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    month = Column(String, primary_key=True)  # YYYY-MM of the resolution
+    count = Column(Integer, nullable=False, default=0)
+    digest = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GrievanceEmbedding(Base):
+    __tablename__ = "grievance_embeddings"
+    grievance_id = Column(String, ForeignKey("grievances.id"), primary_key=True)
+    model = Column(String, index=True)
+    vector = Column(LargeBinary)  # float32 bytes, L2-normalized
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedGrievance(ArchiveBase):
+    """
+    A resolved grievance moved out of the hot table (services/archive.py), in the archive database.
+    Filter columns stay plain; text and JSON are compressed with `codec` (utils/compression.py).
+    """
+    __tablename__ = "archived_grievances"
+    id = Column(String, primary_key=True)
+    ticket_id = Column(String, index=True)
+    citizen_id = Column(String)
+    title = Column(String)
+    category = Column(String)
+    department = Column(String)
+    priority = Column(String)
+    status = Column(String)
+    location = Column(String)
+    overall_severity = Column(String, nullable=True)
+    urgency_score = Column(Integer)
+    created_at = Column(DateTime)
+    resolved_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    codec = Column(String, nullable=False)
+    description_text = Column(LargeBinary, nullable=True)
+    images = Column(LargeBinary, nullable=True)
+    image_analyses = Column(LargeBinary, nullable=True)
+    # JSON: the remaining grievance columns, its ImageAnalysis rows and its embedding
+    record = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        # Covering index for the archived counts merged into the admin dashboard
+        Index("ix_archived_grievances_department_category", "department", "category"),
+        Index("ix_archived_grievances_resolved", "resolved_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """
+    Outcome of a POST /api/grievances sent with an Idempotency-Key (services/idempotency.py).
+    While in_progress, locked_until is the owner's lease; once completed, the response is replayed.
+    """
+    __tablename__ = "idempotency_keys"
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)  # sha256 of the request body
+    state = Column(String, nullable=False)  # in_progress / completed
+    status_code = Column(Integer, nullable=True)
+    response = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# Session hooks that write the change log, status events and notifications in the same transaction
+# as the grievance change, and drop cached ticket views after it commits; imported here so every
+# user of the models gets them.
+from .services import changefeed, notifications, resolution, track_cache  # noqa: E402,F401
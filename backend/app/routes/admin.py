@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from typing import List
+from datetime import datetime, timedelta
+import hmac
+import json
+import anyio
 from ..database import SessionLocal
 from .. import schemas, crud
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from ..utils.escalation import is_escalation_needed
+from ..services import admission, archive, changefeed, geo, resolution, tenancy
+from ..services.ai_services import ANALYSIS_TIERS, analyze_grievance, providers_for
+from ..utils import etag, profiler
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -16,9 +25,24 @@ def get_db():
         db.close()
 
 
+def _missing(ticket_id: str):
+    """404, or 409 for an archived grievance that has to be restored before it can change."""
+    if archive.lookup(ticket_id):
+        raise HTTPException(status_code=409, detail="Grievance is archived; restore it first")
+    raise HTTPException(status_code=404, detail="Not found")
+
+
 # DASHBOARD STATS
 @router.get("/stats", response_model=schemas.AdminStatsResponse)
-def admin_stats(db: Session = Depends(get_db)):
+def admin_stats(request: Request, response: Response, db: Session = Depends(get_db)):
+    tag = etag.make_etag("stats", changefeed.head_seq(db))
+    if etag.is_fresh(request, tag):
+        return etag.not_modified(tag)
+    etag.set_etag(response, tag)
+    return _dashboard_counts(db)
+
+
+def _dashboard_counts(db: Session) -> dict:
     total = db.query(func.count()).select_from(crud.models.Grievance).scalar()
     pending = db.query(func.count()).filter(func.lower(crud.models.Grievance.status) == "pending").scalar()
     in_progress = db.query(func.count()).filter(func.lower(crud.models.Grievance.status) == "in progress").scalar()
@@ -26,6 +50,11 @@ def admin_stats(db: Session = Depends(get_db)):
     high_priority = db.query(func.count()).filter(func.lower(crud.models.Grievance.priority) == "high").scalar()
     escalated = db.query(func.count()).filter(func.lower(crud.models.Grievance.status) != "resolved").scalar()
 
+    # Archived grievances are all resolved
+    archived = archive.total()
+    total += archived
+    resolved += archived
+
 
     return {
         "total": total,
@@ -42,9 +71,10 @@ def admin_stats(db: Session = Depends(get_db)):
 def list_grievances(
     status: str | None = None,
     priority: str | None = None,
+    severity: str | None = None,
     db: Session = Depends(get_db)
 ):
-    grievances = crud.get_all_grievances(db, status, priority)
+    grievances = crud.get_all_grievances(db, status, priority, severity)
 
     return [
         {
@@ -57,6 +87,7 @@ def list_grievances(
             "status": g.status.lower().replace(" ", "-"),
             "submittedAt": g.created_at,
             "escalationNeeded": is_escalation_needed(g.status, g.created_at),
+            "severity": g.overall_severity,
         }
         for g in grievances
     ]
@@ -66,9 +97,13 @@ def list_grievances(
 @router.get("/grievances/{ticket_id}", response_model=schemas.GrievanceTrackResponse)
 def admin_grievance_detail(ticket_id: str, db: Session = Depends(get_db)):
     grievance = crud.get_grievance_by_ticket_id(db, ticket_id)
+    archived_at = None
 
     if not grievance:
-        raise HTTPException(status_code=404, detail="Not found")
+        archived = archive.lookup(ticket_id)
+        if not archived:
+            raise HTTPException(status_code=404, detail="Not found")
+        grievance, archived_at = archive.as_grievance(archived), archived.archived_at
 
     return {
         "ticketId": grievance.id,
@@ -80,12 +115,78 @@ def admin_grievance_detail(ticket_id: str, db: Session = Depends(get_db)):
         "department": grievance.department,
         "priority": grievance.priority.lower(),
         "submittedAt": grievance.created_at,
-        "updatedAt": grievance.created_at,
+        "updatedAt": grievance.updated_at or grievance.created_at,
         "aiClassification": {
             "confidence": 0.82,
             "urgencyScore": grievance.urgency_score,
             "sentiment": "neutral"
-        }
+        },
+        "overallSeverity": grievance.overall_severity,
+        "analysisTier": grievance.analysis_tier,
+        "archivedAt": archived_at,
+        # Lazy relationship: the child rows are only loaded for the detail view
+        "imageFindings": [
+            {
+                "imageIndex": a.image_index,
+                "severity": a.severity,
+                "severityReason": a.severity_reason,
+                "description": a.description,
+                "identifiedProblems": json.loads(a.identified_problems) if a.identified_problems else [],
+                "recommendedActions": json.loads(a.recommended_actions) if a.recommended_actions else [],
+            }
+            for a in grievance.analyses
+        ],
+    }
+
+
+# ON-DEMAND ANALYSIS (escalate to a deeper tier)
+@router.post("/grievances/{ticket_id}/analyze", response_model=schemas.GrievanceTrackResponse)
+async def reanalyze_grievance(ticket_id: str, tier: str = "deep", db: Session = Depends(get_db)):
+    if tier not in ANALYSIS_TIERS:
+        raise HTTPException(status_code=400, detail=f"tier must be one of {', '.join(ANALYSIS_TIERS)}")
+    grievance = await anyio.to_thread.run_sync(crud.get_grievance_by_ticket_id, db, ticket_id)
+    if not grievance:
+        await anyio.to_thread.run_sync(_missing, ticket_id)
+    if grievance.analysis_tier in ANALYSIS_TIERS and ANALYSIS_TIERS.index(tier) < ANALYSIS_TIERS.index(grievance.analysis_tier):
+        raise HTTPException(status_code=400, detail=f"Grievance already has a {grievance.analysis_tier} analysis")
+
+    images = json.loads(grievance.images) if grievance.images else None
+    # Queued on the event loop, so a provider backlog holds no threadpool threads (services/admission.py)
+    async with admission.admit(providers_for(images, tier),
+                               urgency=grievance.urgency_score or admission.DEFAULT_URGENCY):
+        result = await admission.run(analyze_grievance, grievance.description_text, images, tier=tier,
+                                     category=grievance.category)
+    await anyio.to_thread.run_sync(crud.apply_analysis, db, grievance, result)
+    return await anyio.to_thread.run_sync(admin_grievance_detail, ticket_id, db)
+
+
+# RESTORE FROM ARCHIVE
+@router.post("/grievances/{ticket_id}/restore", response_model=schemas.GrievanceTrackResponse)
+def restore_grievance(ticket_id: str, db: Session = Depends(get_db)):
+    if crud.get_grievance_by_ticket_id(db, ticket_id):
+        raise HTTPException(status_code=400, detail="Grievance is not archived")
+    try:
+        grievance = archive.restore(db, ticket_id)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Another grievance now uses this ticket id")
+    if not grievance:
+        raise HTTPException(status_code=404, detail="Not found")
+    return admin_grievance_detail(grievance.id, db)
+
+
+# STATUS HISTORY
+@router.get("/grievances/{ticket_id}/history", response_model=schemas.StatusHistoryResponse)
+def status_history(ticket_id: str, db: Session = Depends(get_db)):
+    events = resolution.status_history(db, ticket_id)
+    if not events and not crud.get_grievance_by_ticket_id(db, ticket_id) and not archive.lookup(ticket_id):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return {
+        "ticketId": ticket_id,
+        "events": [
+            {"fromStatus": e.from_status, "toStatus": e.to_status, "changedAt": e.changed_at}
+            for e in events
+        ],
     }
 
 
@@ -98,14 +199,239 @@ def update_status(
 ):
     grievance = crud.update_grievance_status(db, ticket_id, body.status)
     if not grievance:
-        raise HTTPException(status_code=404, detail="Not found")
+        _missing(ticket_id)
 
     return {"message": "Status updated"}
 
 @router.get("/analytics", response_model=schemas.AdminAnalyticsResponse)
-def admin_analytics(db: Session = Depends(get_db)):
+def admin_analytics(request: Request, response: Response, db: Session = Depends(get_db)):
+    # The weekly trend window slides; the date makes a cached copy expire at least once a day
+    tag = etag.make_etag("analytics", changefeed.head_seq(db), datetime.utcnow().date())
+    if etag.is_fresh(request, tag):
+        return etag.not_modified(tag)
+    etag.set_etag(response, tag)
+
     return {
         "weeklyTrend": crud.get_weekly_trend(db),
         "categoryDistribution": crud.get_category_distribution(db),
         "departmentStats": crud.get_department_performance(db),
     }
+
+
+# STATE-LEVEL ANALYTICS
+@router.get("/state/analytics", response_model=schemas.StateAnalyticsResponse)
+def state_analytics():
+    """Dashboard counts per municipality and summed across all of them (each tenant queried in parallel)."""
+    results = tenancy.for_each_tenant(lambda db: (
+        _dashboard_counts(db), crud.get_category_distribution(db), crud.get_department_performance(db),
+    ))
+
+    totals = dict.fromkeys(schemas.AdminStatsResponse.model_fields, 0)
+    categories: dict = {}
+    departments: dict = {}
+    for stats, category_counts, department_stats in results.values():
+        for field, value in stats.items():
+            totals[field] += value
+        for item in category_counts:
+            categories[item["category"]] = categories.get(item["category"], 0) + item["count"]
+        for item in department_stats:
+            merged = departments.setdefault(item["name"], {"name": item["name"], "pending": 0, "inProgress": 0, "resolved": 0})
+            for field in ("pending", "inProgress", "resolved"):
+                merged[field] += item[field]
+
+    return {
+        "totals": totals,
+        "tenants": [{"tenant": tenant, "stats": stats} for tenant, (stats, _, _) in results.items()],
+        "categoryDistribution": [{"category": c, "count": n} for c, n in categories.items()],
+        "departmentStats": list(departments.values()),
+    }
+
+
+# SEVERITY
+@router.get("/severity", response_model=schemas.SeverityCountsResponse)
+def severity_counts(days: int | None = None, db: Session = Depends(get_db)):
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    grievances, findings = crud.get_severity_counts(db, since)
+    return {"grievances": grievances, "findings": findings}
+
+
+# TIME TO RESOLUTION
+@router.get("/resolution-times", response_model=schemas.ResolutionTimeResponse)
+def resolution_times(
+    department: str | None = None,
+    category: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    group_by: str | None = None,
+    percentiles: str = "50,90",
+    sla_hours: float | None = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Hours from submission to first resolution, from merged per-month sketches.
+    since/until are resolution months (YYYY-MM); group_by is department, category or month.
+    """
+    if group_by and group_by not in resolution.GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(resolution.GROUP_BY)}")
+    try:
+        levels = [float(p) for p in percentiles.split(",") if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be numbers, e.g. 50,90,99")
+    if any(not 0 <= p <= 100 for p in levels):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+
+    groups = []
+    for group, digest in resolution.resolution_times(db, department, category, since, until, group_by):
+        groups.append({
+            "group": group,
+            "count": int(digest.count),
+            "meanHours": round(digest.mean, 2) if digest.count else None,
+            "percentiles": {f"p{p:g}": round(digest.quantile(p / 100), 2) for p in levels},
+            "slaCompliance": round(digest.cdf(sla_hours), 4) if sla_hours is not None else None,
+        })
+
+    return {"groupBy": group_by, "slaHours": sla_hours, "groups": groups}
+
+
+# DUPLICATE CLUSTERS
+@router.get("/clusters", response_model=List[schemas.DuplicateClusterItem])
+def list_clusters(min_size: int = 2, db: Session = Depends(get_db)):
+    clusters = crud.get_duplicate_clusters(db, min_size)
+
+    return [
+        {
+            "clusterId": row.cluster_id,
+            "headTicketId": head.ticket_id if head else None,
+            "title": head.title if head else None,
+            "location": head.location if head else None,
+            "category": head.category if head else None,
+            "status": head.status.lower() if head and head.status else None,
+            "size": row.size,
+            "lastReportedAt": row.last_reported,
+        }
+        for head, row in clusters
+    ]
+
+
+@router.get("/clusters/{cluster_id}", response_model=schemas.DuplicateClusterDetail)
+def cluster_detail(cluster_id: str, db: Session = Depends(get_db)):
+    members = crud.get_cluster_members(db, cluster_id)
+
+    if not members:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    head = next((g for g in members if g.id == cluster_id), None)
+
+    return {
+        "clusterId": cluster_id,
+        "headTicketId": head.ticket_id if head else None,
+        "members": [
+            {
+                "ticketId": g.ticket_id or g.id,
+                "title": g.title,
+                "location": g.location,
+                "status": g.status.lower(),
+                "submittedAt": g.created_at,
+            }
+            for g in members
+        ],
+    }
+
+
+# LOCATION HOTSPOTS
+@router.get("/hotspots", response_model=schemas.HotspotResponse)
+def hotspots(
+    precision: int = 6,
+    category: str | None = None,
+    days: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    bbox: str | None = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Complaint counts by geohash cell and category.
+    bbox is "south,west,north,east" for the current map viewport.
+    """
+    precision = max(1, min(precision, geo.GEOHASH_PRECISION))
+    if days and not since:
+        since = datetime.utcnow() - timedelta(days=days)
+
+    cells = None
+    if bbox:
+        try:
+            south, west, north, east = [float(v) for v in bbox.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="bbox must be south,west,north,east")
+        cells = geo.covering_cells(south, west, north, east, precision)
+
+    items = []
+    for row in crud.get_hotspots(db, precision, cells, category, since, until):
+        if bbox:
+            s, w, n, e = geo.geohash_bounds(row.cell)
+            if s > north or n < south or w > east or e < west:
+                continue
+        lat, lng = geo.geohash_center(row.cell)
+        items.append({
+            "cell": row.cell,
+            "latitude": round(lat, 6),
+            "longitude": round(lng, 6),
+            "category": row.category,
+            "count": row.count,
+        })
+
+    return {"precision": precision, "total": sum(i["count"] for i in items), "cells": items}
+
+
+# PROFILING
+@router.post("/profile", response_model=schemas.ProfileResponse)
+async def capture_profile(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    path: str | None = None,
+    header: str | None = None,
+    top: int = 25,
+    format: str = "json",
+    x_admin_token: str | None = Header(default=None),
+):
+    """
+    Sample this worker's Python stacks for `seconds`. `path` (prefix) and
+    `header` ("Name" or "Name: value") limit samples to matching requests.
+    format=collapsed returns only the flamegraph input as text.
+    """
+    if not profiler.PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, profiler.PROFILER_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if not 0 < seconds <= profiler.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {profiler.PROFILER_MAX_SECONDS:g}]")
+    if format not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be json or collapsed")
+
+    match_header = None
+    if header:
+        name, sep, value = header.partition(":")
+        match_header = (name.strip(), value.strip() if sep else None)
+    try:
+        capture = profiler.begin(profiler.Capture(seconds, interval_ms / 1000, path, match_header))
+    except profiler.Busy:
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+    try:
+        await anyio.sleep(seconds)
+    finally:
+        # Also on client disconnect, so a cancelled request never leaves the sampler running;
+        # shielded, or the cancellation would skip end() and leave the capture marked busy
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(profiler.end, capture)
+
+    if format == "collapsed":
+        return PlainTextResponse(capture.collapsed())
+    return {
+        "seconds": round(capture.elapsed, 3),
+        "intervalMs": capture.interval * 1000,
+        "ticks": capture.ticks,
+        "samples": capture.samples,
+        "matchedRequests": capture.matched_requests if capture.filtered else None,
+        "top": capture.top(max(1, top)),
+        "collapsed": capture.collapsed(),
+    }
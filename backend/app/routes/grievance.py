@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 from ..database import SessionLocal
 from .. import schemas, crud
+from ..services import archive
+from ..services.row_cache import json_response
+from ..services.track_cache import track_cache
+from ..utils import etag
 
 router = APIRouter(prefix="/grievances", tags=["Grievances"])
 
@@ -59,26 +63,45 @@ def submit_grievance(
     }
     
 @router.get("/track/{ticket_id}", response_model=schemas.GrievanceTrackResponse)
-def track_grievance(ticket_id: str, db: Session = Depends(get_db)):
-    grievance = crud.get_grievance_by_ticket_id(db, ticket_id)
-
-    if not grievance:
+def track_grievance(ticket_id: str, request: Request, db: Session = Depends(get_db)):
+    # Polled far more often than tickets change: served from the view cache, usually as a 304
+    cached = track_cache.fetch("track", ticket_id, lambda: _render_track(db, ticket_id))
+    if cached is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
 
-    return {
-        "ticketId": grievance.id,
-        "title": grievance.title,
-        "description": grievance.description_text,
-        "status": grievance.status.lower(),
-        "category": grievance.category,
-        "location": grievance.location,
-        "department": grievance.department,
-        "priority": grievance.priority.lower(),
-        "submittedAt": grievance.created_at,
-        "updatedAt": grievance.created_at,
-        "aiClassification": {
+    tag, body = cached
+    if etag.is_fresh(request, tag):
+        return etag.not_modified(tag)
+    return etag.set_etag(json_response(body), tag)
+
+
+def _render_track(db: Session, ticket_id: str):
+    """(ETag, JSON body) of the tracking view, or None for an unknown ticket."""
+    grievance = crud.get_grievance_by_ticket_id(db, ticket_id)
+    if grievance:
+        tag = etag.make_etag("track", ticket_id, grievance.version)
+    else:
+        archived = archive.lookup(ticket_id)
+        if archived is None:
+            return None
+        tag = etag.make_etag("archived", ticket_id, archived.archived_at)
+        grievance = archive.as_grievance(archived)
+
+    view = schemas.GrievanceTrackResponse(
+        ticketId=grievance.id,
+        title=grievance.title,
+        description=grievance.description_text,
+        status=grievance.status.lower(),
+        category=grievance.category,
+        location=grievance.location,
+        department=grievance.department,
+        priority=grievance.priority.lower(),
+        submittedAt=grievance.created_at,
+        updatedAt=grievance.updated_at or grievance.created_at,
+        aiClassification={
             "confidence": 0.82,
             "urgencyScore": grievance.urgency_score,
             "sentiment": "neutral"
-        }
-    }
+        },
+    )
+    return tag, view.model_dump_json().encode()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from typing import List
 
@@ -30,6 +30,15 @@ class AIClassification(BaseModel):
     sentiment: str
 
 
+class ImageFinding(BaseModel):
+    imageIndex: int
+    severity: str
+    severityReason: Optional[str] = None
+    description: Optional[str] = None
+    identifiedProblems: List[str] = []
+    recommendedActions: List[str] = []
+
+
 class GrievanceTrackResponse(BaseModel):
     ticketId: str
     title: str
@@ -42,6 +51,10 @@ class GrievanceTrackResponse(BaseModel):
     submittedAt: datetime
     updatedAt: Optional[datetime] = None
     aiClassification: Optional[AIClassification] = None
+    overallSeverity: Optional[str] = None
+    imageFindings: Optional[List[ImageFinding]] = None
+    analysisTier: Optional[str] = None
+    archivedAt: Optional[datetime] = None
 
 class AdminStatsResponse(BaseModel):
     total: int
@@ -62,6 +75,7 @@ class AdminGrievanceListItem(BaseModel):
     status: str
     submittedAt: datetime
     escalationNeeded: bool
+    severity: Optional[str] = None
 
 
 class UpdateStatusRequest(BaseModel):
@@ -90,3 +104,103 @@ class AdminAnalyticsResponse(BaseModel):
     categoryDistribution: List[CategoryDistributionItem]
     departmentStats: List[DepartmentPerformanceItem]
 
+
+
+class TenantStatsItem(BaseModel):
+    tenant: str
+    stats: AdminStatsResponse
+
+
+class StateAnalyticsResponse(BaseModel):
+    totals: AdminStatsResponse
+    tenants: List[TenantStatsItem]
+    categoryDistribution: List[CategoryDistributionItem]
+    departmentStats: List[DepartmentPerformanceItem]
+
+
+
+class DuplicateClusterItem(BaseModel):
+    clusterId: str
+    headTicketId: Optional[str] = None
+    title: Optional[str] = None
+    location: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    size: int
+    lastReportedAt: datetime
+
+
+class DuplicateClusterMember(BaseModel):
+    ticketId: str
+    title: str
+    location: str
+    status: str
+    submittedAt: datetime
+
+
+class DuplicateClusterDetail(BaseModel):
+    clusterId: str
+    headTicketId: Optional[str] = None
+    members: List[DuplicateClusterMember]
+
+
+class HotspotCell(BaseModel):
+    cell: str
+    latitude: float
+    longitude: float
+    category: Optional[str] = None
+    count: int
+
+
+class HotspotResponse(BaseModel):
+    precision: int
+    total: int
+    cells: List[HotspotCell]
+
+
+class SeverityCountsResponse(BaseModel):
+    grievances: Dict[str, int]
+    findings: Dict[str, int]
+
+
+class StatusEventItem(BaseModel):
+    fromStatus: Optional[str] = None
+    toStatus: str
+    changedAt: datetime
+
+
+class StatusHistoryResponse(BaseModel):
+    ticketId: str
+    events: List[StatusEventItem]
+
+
+class ResolutionTimeGroup(BaseModel):
+    group: Optional[str] = None
+    count: int
+    meanHours: Optional[float] = None
+    percentiles: Dict[str, float]
+    slaCompliance: Optional[float] = None
+
+
+class ResolutionTimeResponse(BaseModel):
+    groupBy: Optional[str] = None
+    slaHours: Optional[float] = None
+    groups: List[ResolutionTimeGroup]
+
+
+class ProfileFunction(BaseModel):
+    function: str
+    selfSamples: int
+    totalSamples: int
+    selfPercent: float
+    totalPercent: float
+
+
+class ProfileResponse(BaseModel):
+    seconds: float
+    intervalMs: float
+    ticks: int
+    samples: int
+    matchedRequests: Optional[int] = None
+    top: List[ProfileFunction]
+    collapsed: str
@@ -0,0 +1,74 @@
+"""
+Move grievances resolved long ago into the compressed archive, or restore one.
+
+Usage (from backend/):
+    python -m app.scripts.archive_grievances [--older-than-days 90] [--batch-size 500] [--limit N] [--dry-run] [--vacuum]
+    python -m app.scripts.archive_grievances --restore GRV-1A2B3C4D
+    python -m app.scripts.archive_grievances --tenant pune [...]   # one municipality's database
+
+Meant to run periodically (e.g. a nightly cron job). --vacuum rewrites the
+main database afterwards so the freed pages are returned and the hot table
+is stored contiguously again; it needs exclusive access for a moment, so
+run it off-peak.
+"""
+import argparse
+import logging
+import os
+
+from sqlalchemy import text
+
+from app.database import TENANTS, SessionLocal, current_tenant, tenant_engines
+from app.services.archive import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    archive_resolved,
+    count_candidates,
+    restore,
+)
+
+
+def _size(url: str) -> str:
+    path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else None
+    if not path or not os.path.exists(path):
+        return "n/a"
+    return f"{os.path.getsize(path) / 1e6:.1f} MB"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive grievances resolved at least this many days ago")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=None, help="archive at most this many grievances")
+    parser.add_argument("--dry-run", action="store_true", help="only count the grievances that would move")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the main database afterwards")
+    parser.add_argument("--restore", metavar="TICKET_ID", help="move one grievance back to the hot table")
+    parser.add_argument("--tenant", choices=TENANTS, help="work on this tenant's database instead of the default one")
+    args = parser.parse_args()
+
+    current_tenant.set(args.tenant)
+    engine = tenant_engines.engine(args.tenant)
+
+    db = SessionLocal()
+    try:
+        if args.restore:
+            grievance = restore(db, args.restore)
+            print(f"Restored {grievance.id}" if grievance else f"{args.restore} is not archived")
+            return
+        if args.dry_run:
+            print(f"{count_candidates(db, args.older_than_days)} grievances would be archived")
+            return
+        moved = archive_resolved(db, args.older_than_days, args.batch_size, args.limit)
+    finally:
+        db.close()
+
+    print(f"Archived {moved} grievances resolved more than {args.older_than_days} days ago")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+    print(f"Main database: {_size(str(engine.url))}, archive: {_size(tenant_engines.archive_url(args.tenant))}")
+
+
+if __name__ == "__main__":
+    main()
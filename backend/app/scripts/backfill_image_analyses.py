@@ -0,0 +1,50 @@
+"""
+Copy image analyses from the Grievance.image_analyses JSON column into the
+image_analyses child table and set each grievance's overall severity.
+
+Usage (from backend/):
+    python -m app.scripts.backfill_image_analyses [--batch-size 1000]
+"""
+import argparse
+import json
+
+from app import crud
+from app.database import SessionLocal
+from app.models import Grievance
+
+
+def backfill(batch_size: int = 1000):
+    db = SessionLocal()
+    grievances = findings = 0
+    last_id = ""
+    try:
+        while True:
+            rows = (
+                db.query(Grievance)
+                .filter(Grievance.overall_severity.is_(None), Grievance.id > last_id)
+                .order_by(Grievance.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for grievance in rows:
+                try:
+                    analyses = json.loads(grievance.image_analyses) if grievance.image_analyses else []
+                except ValueError:
+                    analyses = []
+                crud.set_image_analyses(grievance, analyses)
+                grievances += 1
+                findings += len(analyses)
+            last_id = rows[-1].id
+            db.commit()
+        print(f"Backfilled {grievances} grievances with {findings} image findings")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    backfill(args.batch_size)
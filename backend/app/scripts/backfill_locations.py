@@ -0,0 +1,49 @@
+"""
+Geocode existing grievances that have no normalized location yet.
+
+Usage (from backend/):
+    python -m app.scripts.backfill_locations [--batch-size 1000]
+"""
+import argparse
+
+from app.database import SessionLocal
+from app.models import Grievance
+from app.services.geo import normalize_location
+
+
+def backfill(batch_size: int = 1000):
+    db = SessionLocal()
+    resolved = unresolved = 0
+    last_id = ""
+    try:
+        while True:
+            rows = (
+                db.query(Grievance)
+                .filter(Grievance.geohash.is_(None), Grievance.id > last_id)
+                .order_by(Grievance.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for grievance in rows:
+                geo = normalize_location(grievance.location)
+                if geo:
+                    grievance.latitude = geo["latitude"]
+                    grievance.longitude = geo["longitude"]
+                    grievance.geohash = geo["geohash"]
+                    resolved += 1
+                else:
+                    unresolved += 1
+            last_id = rows[-1].id
+            db.commit()
+        print(f"Geocoded {resolved} grievances, {unresolved} locations not found in gazetteer")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    backfill(args.batch_size)
@@ -0,0 +1,53 @@
+"""
+Seed status history for grievances created before status events were recorded,
+then rebuild the time-to-resolution sketches from status_events.
+
+Grievances without any event get one initial event with their current status
+at created_at. Their true resolution time is unknown, so only transitions
+recorded from now on (or by the dataset generator) feed the sketches.
+
+Usage (from backend/):
+    python -m app.scripts.backfill_status_events [--batch-size 5000] [--sketches-only]
+"""
+import argparse
+
+from sqlalchemy import exists, insert, select
+
+from app.database import engine
+from app.models import Grievance, StatusEvent
+from app.services.resolution import normalize_status, rebuild_sketches
+
+
+def seed_events(batch_size: int = 5000) -> int:
+    seeded = 0
+    last_id = ""
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(Grievance.id, Grievance.status, Grievance.created_at)
+                .where(Grievance.id > last_id,
+                       ~exists().where(StatusEvent.grievance_id == Grievance.id))
+                .order_by(Grievance.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return seeded
+            conn.execute(insert(StatusEvent), [
+                {"grievance_id": r.id, "from_status": None, "to_status": normalize_status(r.status) or "pending",
+                 "changed_at": r.created_at}
+                for r in rows
+            ])
+        seeded += len(rows)
+        last_id = rows[-1].id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--sketches-only", action="store_true", help="only rebuild the sketches")
+    args = parser.parse_args()
+
+    if not args.sketches_only:
+        print(f"Seeded initial status for {seed_events(args.batch_size)} grievances")
+    with engine.begin() as conn:
+        print(f"Rebuilt resolution sketches from {rebuild_sketches(conn)} resolved grievances")
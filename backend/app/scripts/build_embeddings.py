@@ -0,0 +1,64 @@
+"""
+Embed grievances that have no stored embedding yet and persist the vector index.
+
+Usage (from backend/):
+    python -m app.scripts.build_embeddings [--batch-size 64] [--rebuild]
+"""
+import argparse
+import time
+
+from app.database import SessionLocal
+from app.models import Grievance, GrievanceEmbedding
+from app.services import vector_index
+
+
+def build(batch_size: int = 64, rebuild: bool = False):
+    db = SessionLocal()
+    try:
+        if rebuild:
+            db.query(GrievanceEmbedding).filter(
+                GrievanceEmbedding.model == vector_index.MODEL_NAME
+            ).delete()
+            db.commit()
+
+        index = vector_index.get_index(db)
+        embedded = db.query(GrievanceEmbedding.grievance_id).filter(
+            GrievanceEmbedding.model == vector_index.MODEL_NAME
+        )
+        pending = (
+            db.query(Grievance.id, Grievance.title, Grievance.description_text,
+                     Grievance.category, Grievance.department)
+            .filter(Grievance.id.notin_(embedded))
+            .all()
+        )
+        print(f"Embedding {len(pending)} grievances with {vector_index.MODEL_NAME}...")
+
+        started = time.perf_counter()
+        done = 0
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            vectors = vector_index.embed_texts([vector_index.grievance_text(g) for g in batch])
+            if vectors is None:
+                print("Embedding service unavailable, stopping")
+                break
+            for g, vector in zip(batch, vectors):
+                db.add(GrievanceEmbedding(
+                    grievance_id=g.id, model=vector_index.MODEL_NAME, vector=vector.tobytes()
+                ))
+                index.add(g.id, vector, g.category, g.department)
+            db.commit()
+            done += len(batch)
+
+        index.save()
+        elapsed = time.perf_counter() - started
+        print(f"Embedded {done} grievances in {elapsed:.1f}s; index has {len(index)} vectors ({index.mode})")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every grievance")
+    args = parser.parse_args()
+    build(args.batch_size, args.rebuild)
@@ -0,0 +1,428 @@
+"""
+Generate a large, deterministic synthetic grievance dataset.
+
+The same --seed (and --now) always produces the same rows. Categories and
+locations follow Zipf-like distributions (a few busy categories and hotspots,
+a long tail), descriptions are assembled from per-category phrase banks, each
+grievance gets a plausible status history in status_events (from which the
+resolution-time sketches are built), and a fraction carry small
+synthetic images with matching image analyses. Rows are streamed through
+chunked Core inserts, so memory stays flat at millions of rows.
+
+Usage (from backend/):
+    python -m app.scripts.generate_dataset --rows 1000000 --seed 7 --output db/large.db
+    python -m app.scripts.generate_dataset --rows 5000            # into the app database
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import struct
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import create_engine, event, insert
+
+from app.crud import image_analysis_values
+from app.migrate import migrate
+from app.models import ChangeLog, Citizen, Grievance, ImageAnalysis, StatusEvent
+from app.services.changefeed import SUMMARY_FIELDS
+from app.services.geo import GAZETTEER_PATH, normalize_location
+from app.services.resolution import rebuild_sketches
+from app.utils.departments import CATEGORY_DEPARTMENTS
+from app.utils.severity import SEVERITY_LEVELS, overall_severity
+
+# Most-reported first; weights fall off as 1 / rank ** CATEGORY_SKEW
+CATEGORY_ORDER = [
+    "sanitation", "roads", "water-supply", "electricity", "public-safety",
+    "housing", "healthcare", "other", "education",
+]
+CATEGORY_SKEW = 1.1
+LOCATION_SKEW = 1.2
+CITIZEN_SKEW = 0.8
+
+PHRASES = {
+    "sanitation": {
+        "subjects": ["garbage", "the dustbin", "sewage", "the drain", "the public toilet", "waste dumped on the roadside"],
+        "problems": ["has not been collected for {days} days", "is overflowing onto the street",
+                     "is blocked and stinking", "is attracting stray dogs and mosquitoes",
+                     "has not been cleaned since last month"],
+    },
+    "roads": {
+        "subjects": ["a huge pothole", "the main road", "the footpath", "the speed breaker", "the lane"],
+        "problems": ["is causing accidents every day", "has caved in after the rain",
+                     "is broken and dangerous for children", "has been dug up and left open for {days} days",
+                     "is waterlogged and impossible to cross"],
+    },
+    "water-supply": {
+        "subjects": ["the water supply", "a water pipe", "the tap water", "the tubewell", "the overhead tank"],
+        "problems": ["has stopped for {days} days", "burst and is flooding the street",
+                     "is muddy and smells bad", "is leaking and wasting water", "comes only for ten minutes a day"],
+    },
+    "electricity": {
+        "subjects": ["the street light", "the transformer", "power supply", "an electric wire", "the electricity pole"],
+        "problems": ["is not working at night", "sparks every evening", "has been cut for {days} days",
+                     "is hanging low over the road", "is leaning and may fall"],
+    },
+    "public-safety": {
+        "subjects": ["the park", "the bus stop", "the market area", "the underpass", "the school road"],
+        "problems": ["is unsafe after dark", "has no police patrolling", "is used for gambling and drinking",
+                     "has had three chain snatchings this week", "is dark and women feel unsafe"],
+    },
+    "housing": {
+        "subjects": ["the government flat", "the building wall", "the roof", "the staircase", "the allotted house"],
+        "problems": ["is cracked and may collapse", "leaks badly when it rains",
+                     "has not been repaired for {days} days", "was allotted but possession is still pending",
+                     "is illegally encroached"],
+    },
+    "healthcare": {
+        "subjects": ["the primary health centre", "the government hospital", "the ambulance service",
+                     "the dispensary", "the vaccination camp"],
+        "problems": ["has no doctor available", "has run out of basic medicines", "did not arrive for two hours",
+                     "is closed during working hours", "was cancelled without notice"],
+    },
+    "education": {
+        "subjects": ["the government school", "the school building", "the mid-day meal", "the teachers",
+                     "the school toilet"],
+        "problems": ["has no drinking water", "roof is leaking in the classrooms", "is of very poor quality",
+                     "are absent for {days} days", "is locked and unusable"],
+    },
+    "other": {
+        "subjects": ["the community hall", "the stray cattle", "the noise from the factory", "the ration shop",
+                     "the birth certificate application"],
+        "problems": ["is always locked", "are blocking traffic", "continues late into the night",
+                     "is not giving full ration", "has been pending for {days} days"],
+    },
+}
+IMPACTS = [
+    "Residents are facing a lot of trouble.", "Senior citizens and children are suffering.",
+    "Please take action urgently.", "We have complained before but nothing happened.",
+    "This is a danger to public health.", "Kindly resolve this at the earliest.", "",
+]
+OPENERS = ["", "Respected sir, ", "Dear officer, ", "Sir/Madam, ", "Kindly note that "]
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Sunita", "Vikram", "Anjali", "Mohammed", "Kavita", "Suresh",
+               "Neha", "Amit", "Pooja", "Ravi", "Fatima", "Manoj", "Deepa", "Arjun", "Meena"]
+LAST_NAMES = ["Sharma", "Verma", "Singh", "Khan", "Gupta", "Yadav", "Patel", "Kumar", "Das", "Reddy"]
+CATEGORY_URGENCY = {"public-safety": 7, "healthcare": 7, "electricity": 6, "water-supply": 6,
+                    "sanitation": 5, "roads": 5, "housing": 5, "education": 4, "other": 3}
+
+
+def zipf_weights(n: int, skew: float) -> List[float]:
+    """Cumulative weights 1 / rank ** skew, for random.choices(cum_weights=...)."""
+    return list(accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+
+def load_places(path: str = GAZETTEER_PATH) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def synthetic_png(rng: random.Random, size: int = 8) -> str:
+    """A tiny solid-colour PNG as a data URI; valid image bytes, negligible size."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    pixel = bytes(rng.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + pixel * size for _ in range(size))
+    png = (b"\x89PNG\r\n\x1a\n"
+           + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+           + chunk(b"IDAT", zlib.compress(raw))
+           + chunk(b"IEND", b""))
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def status_history(rng: random.Random, created_at: datetime, now: datetime) -> List[Tuple[str, datetime]]:
+    """
+    Walk pending -> in progress -> resolved with realistic dwell times,
+    stopping at whatever state has been reached by `now`. The last entry
+    is the grievance's current status.
+    """
+    history = [("pending", created_at)]
+    if rng.random() < 0.15:  # never picked up
+        return history
+    started = created_at + timedelta(hours=rng.expovariate(1 / 36))
+    if started > now:
+        return history
+    history.append(("in progress", started))
+    if rng.random() < 0.1:  # stuck
+        return history
+    resolved = started + timedelta(hours=rng.expovariate(1 / 96))
+    if resolved <= now:
+        history.append(("resolved", resolved))
+    return history
+
+
+class DatasetGenerator:
+    """Deterministic stream of citizen and grievance rows for a given seed."""
+
+    def __init__(self, seed: int = 0, days: int = 365, image_rate: float = 0.1,
+                 duplicate_rate: float = 0.03, now: Optional[datetime] = None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.days = days
+        self.image_rate = image_rate
+        self.duplicate_rate = duplicate_rate
+        # Midnight, so repeated runs on the same day generate identical rows
+        self.now = now or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        self.categories = CATEGORY_ORDER
+        self.category_weights = zipf_weights(len(self.categories), CATEGORY_SKEW)
+
+        # Which places are hotspots depends on the seed
+        places = load_places()
+        self.rng.shuffle(places)
+        self.locations = []
+        for place in places:
+            names = [place["name"]] + place.get("aliases", [])
+            self.locations.append(names)
+        self.location_weights = zipf_weights(len(self.locations), LOCATION_SKEW)
+        self._geo_cache: Dict[str, Optional[dict]] = {}
+        self._recent_heads: List[dict] = []
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def citizens(self, count: int) -> Iterator[dict]:
+        self.citizen_ids = []
+        for i in range(count):
+            citizen_id = self._uuid()
+            self.citizen_ids.append(citizen_id)
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            yield {
+                "id": citizen_id,
+                "full_name": f"{first} {last}",
+                "phone_number": f"9{self.rng.randint(100000000, 999999999)}",
+                "email": f"{first.lower()}.{last.lower()}{i}@example.com" if self.rng.random() < 0.6 else None,
+                "created_at": self.now - timedelta(days=self.rng.uniform(0, self.days)),
+            }
+        self.citizen_weights = zipf_weights(count, CITIZEN_SKEW)
+
+    def _location(self) -> Tuple[str, Optional[dict]]:
+        names = self.rng.choices(self.locations, cum_weights=self.location_weights)[0]
+        text = self.rng.choice(names)
+        roll = self.rng.random()
+        if roll < 0.2:
+            text = f"Near {text}, lane {self.rng.randint(1, 20)}"
+        elif roll < 0.25:
+            text = f"House no. {self.rng.randint(1, 999)}"  # not resolvable, like many real entries
+        if text not in self._geo_cache:
+            self._geo_cache[text] = normalize_location(text)
+        return text, self._geo_cache[text]
+
+    def _description(self, category: str) -> Tuple[str, str]:
+        bank = PHRASES[category]
+        subject = self.rng.choice(bank["subjects"])
+        problem = self.rng.choice(bank["problems"]).format(days=self.rng.randint(2, 30))
+        sentence = f"{subject} {problem}"
+        title = sentence[0].upper() + sentence[1:]
+        body = f"{self.rng.choice(OPENERS)}{sentence}. {self.rng.choice(IMPACTS)}".strip()
+        return title, body[0].upper() + body[1:]
+
+    def _image_analyses(self, category: str, urgency: int, count: int) -> List[dict]:
+        severity = SEVERITY_LEVELS[min(3, max(0, (urgency - 1) // 3))]
+        return [{
+            "image_index": i,
+            "description": f"Photo of a {category.replace('-', ' ')} issue",
+            "key_observations": [],
+            "identified_problems": [f"Reported {category.replace('-', ' ')} problem"],
+            "affected_areas": [],
+            "recommended_actions": [],
+            "severity": severity if self.rng.random() < 0.8 else self.rng.choice(SEVERITY_LEVELS),
+            "severity_reason": "Synthetic analysis",
+        } for i in range(count)]
+
+    def grievances(self, count: int) -> Iterator[Tuple[dict, List[dict], List[dict]]]:
+        """(grievance row, image analysis rows, status event rows) triples."""
+        span_minutes = self.days * 24 * 60
+        for i in range(count):
+            # Recent periods are busier: half uniform, half exponential towards now
+            if self.rng.random() < 0.5:
+                age = self.rng.uniform(0, span_minutes)
+            else:
+                age = min(span_minutes, self.rng.expovariate(4 / span_minutes))
+            created_at = self.now - timedelta(minutes=age)
+
+            grievance_id = self._uuid()
+            cluster_id = None
+            if self._recent_heads and self.rng.random() < self.duplicate_rate:
+                head = self.rng.choice(self._recent_heads)
+                category, location, geo = head["category"], head["location"], head["geo"]
+                title, description = head["title"], head["description"] + " " + self.rng.choice(IMPACTS)
+                cluster_id = head["id"]
+            else:
+                category = self.rng.choices(self.categories, cum_weights=self.category_weights)[0]
+                location, geo = self._location()
+                title, description = self._description(category)
+                self._recent_heads.append({"id": grievance_id, "category": category, "location": location,
+                                           "geo": geo, "title": title, "description": description})
+                if len(self._recent_heads) > 1000:
+                    self._recent_heads.pop(0)
+
+            urgency = max(1, min(10, round(self.rng.gauss(CATEGORY_URGENCY[category], 1.8))))
+            history = status_history(self.rng, created_at, self.now)
+
+            images, analyses = None, []
+            if self.rng.random() < self.image_rate:
+                n_images = self.rng.randint(1, 3)
+                images = json.dumps([synthetic_png(self.rng) for _ in range(n_images)])
+                analyses = self._image_analyses(category, urgency, n_images)
+
+            if urgency >= 7:
+                sentiment = "negative"
+            else:
+                sentiment = self.rng.choices(["neutral", "negative", "positive"], [0.6, 0.3, 0.1])[0]
+
+            row = {
+                "id": grievance_id,
+                "ticket_id": f"GEN-{self.seed}-{i:08d}",
+                "citizen_id": self.rng.choices(self.citizen_ids, cum_weights=self.citizen_weights)[0],
+                "title": title,
+                "description_text": description,
+                "category": category,
+                "urgency_score": urgency,
+                "priority": "high" if urgency >= 8 else "medium" if urgency >= 5 else "low",
+                "department": CATEGORY_DEPARTMENTS[category],
+                "location": location,
+                "status": history[-1][0],
+                "created_at": created_at,
+                "sentiment": sentiment,
+                "sentiment_confidence": round(self.rng.uniform(0.55, 0.99), 3),
+                "images": images,
+                "image_analyses": json.dumps(analyses) if analyses else None,
+                "overall_severity": overall_severity(a["severity"] for a in analyses),
+                "cluster_id": cluster_id,
+                "latitude": geo["latitude"] if geo else None,
+                "longitude": geo["longitude"] if geo else None,
+                "geohash": geo["geohash"] if geo else None,
+            }
+            events = [
+                {"grievance_id": grievance_id, "from_status": history[i - 1][0] if i else None,
+                 "to_status": status, "changed_at": changed_at}
+                for i, (status, changed_at) in enumerate(history)
+            ]
+            yield row, image_analysis_values(grievance_id, analyses), events
+
+
+def _change(row: dict) -> dict:
+    summary = {field: row.get(field) for field in SUMMARY_FIELDS}
+    return {"grievance_id": row["id"], "op": "create", "changed_at": row["created_at"],
+            "data": orjson.dumps({"grievance": summary}).decode()}
+
+
+def _chunks(rows: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(url: str, rows: int, seed: int = 0, batch_size: int = 5000, citizens: Optional[int] = None,
+             days: int = 365, image_rate: float = 0.1, duplicate_rate: float = 0.03,
+             now: Optional[datetime] = None, change_log: bool = True, bulk_load: bool = False,
+             progress: bool = False) -> dict:
+    """
+    Create the schema at url and stream `rows` grievances into it.
+    With change_log, each row is also recorded as a create in the change log, so
+    change feeds and ETags see the new data. With bulk_load, SQLite durability
+    is relaxed for the load (only for throwaway files).
+    Returns {"rows", "citizens", "seconds", "rows_per_second"}.
+    """
+    engine = create_engine(url)
+    if bulk_load and engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=OFF")
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.close()
+
+    migrate(engine)
+    generator = DatasetGenerator(seed=seed, days=days, image_rate=image_rate,
+                                 duplicate_rate=duplicate_rate, now=now)
+    n_citizens = citizens or max(1, rows // 5)
+
+    started = last_report = time.perf_counter()
+    written = 0
+    try:
+        with engine.begin() as conn:
+            for batch in _chunks(generator.citizens(n_citizens), batch_size):
+                conn.execute(insert(Citizen.__table__), batch)
+        for batch in _chunks(generator.grievances(rows), batch_size):
+            # One transaction per batch: bounded journal, and progress survives an interrupt
+            with engine.begin() as conn:
+                conn.execute(insert(Grievance.__table__), [row for row, _, _ in batch])
+                findings = [finding for _, children, _ in batch for finding in children]
+                if findings:
+                    conn.execute(insert(ImageAnalysis.__table__), findings)
+                conn.execute(insert(StatusEvent.__table__), [e for _, _, events in batch for e in events])
+                if change_log:
+                    conn.execute(insert(ChangeLog.__table__), [_change(row) for row, _, _ in batch])
+            written += len(batch)
+            if progress and time.perf_counter() - last_report >= 2:
+                last_report = time.perf_counter()
+                rate = written / (last_report - started)
+                print(f"  {written:,}/{rows:,} rows, {rate:,.0f} rows/s", file=sys.stderr)
+        seconds = time.perf_counter() - started
+
+        # Resolution-time sketches cover the whole table, so build them once at the end
+        with engine.begin() as conn:
+            rebuild_sketches(conn)
+    finally:
+        engine.dispose()
+
+    return {"rows": written, "citizens": n_citizens, "seconds": round(seconds, 2),
+            "rows_per_second": round(written / seconds, 1) if seconds else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="grievances to generate")
+    parser.add_argument("--seed", type=int, default=0, help="same seed, same dataset")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per INSERT batch")
+    parser.add_argument("--citizens", type=int, help="distinct citizens (default: rows / 5)")
+    parser.add_argument("--days", type=int, default=365, help="spread created_at over this many days")
+    parser.add_argument("--now", type=datetime.fromisoformat, help="end of the time range (default: today)")
+    parser.add_argument("--image-rate", type=float, default=0.1, help="fraction of grievances with images")
+    parser.add_argument("--duplicate-rate", type=float, default=0.03, help="fraction of near-duplicate reports")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--output", help="write to this SQLite file instead of the app database")
+    target.add_argument("--database-url", help="write to this SQLAlchemy URL instead of the app database")
+    parser.add_argument("--no-change-log", action="store_true",
+                        help="skip change log entries (faster; for throwaway benchmark files)")
+    parser.add_argument("--fresh", action="store_true", help="delete the --output file first")
+    args = parser.parse_args()
+
+    bulk_load = False
+    if args.output:
+        if args.fresh and os.path.exists(args.output):
+            os.remove(args.output)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        url = f"sqlite:///{os.path.abspath(args.output)}"
+        bulk_load = True
+    elif args.database_url:
+        url = args.database_url
+    else:
+        from app.database import DATABASE_URL
+        url = DATABASE_URL
+
+    print(f"Generating {args.rows:,} grievances (seed {args.seed}) into {url}", file=sys.stderr)
+    stats = generate(url, args.rows, seed=args.seed, batch_size=args.batch_size, citizens=args.citizens,
+                     days=args.days, image_rate=args.image_rate, duplicate_rate=args.duplicate_rate,
+                     now=args.now, change_log=not args.no_change_log, bulk_load=bulk_load, progress=True)
+    print(f"Inserted {stats['rows']:,} grievances and {stats['citizens']:,} citizens in {stats['seconds']}s "
+          f"({stats['rows_per_second']:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
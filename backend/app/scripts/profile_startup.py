@@ -0,0 +1,90 @@
+"""
+Profile API cold start: import time per module and time to the first healthy response.
+
+Usage (from backend/):
+    python -m app.scripts.profile_startup [--top 25] [--runs 3] [--no-server]
+
+Import times come from `python -X importtime -c "import app.main"` in a fresh
+interpreter. The server check starts uvicorn on a free port and polls `GET /`
+until it answers 200, so it includes interpreter start, imports and startup hooks.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def import_profile():
+    """[(cumulative_us, self_us, module)] for `import app.main`, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    rows.sort(reverse=True)
+    return rows
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_healthy(timeout: float = 60.0) -> float:
+    """Seconds from spawning uvicorn to the first 200 from GET /."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not become healthy in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=25, help="Modules to list")
+    parser.add_argument("--runs", type=int, default=3, help="Server starts to time")
+    parser.add_argument("--no-server", action="store_true", help="Only profile imports")
+    args = parser.parse_args()
+
+    rows = import_profile()
+    total = next((c for c, _, m in rows if m.strip() == "app.main"), rows[0][0] if rows else 0)
+    print(f"import app.main: {total / 1000:.0f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative, self_time, module in rows[:args.top]:
+        print(f"{cumulative / 1000:14.1f} {self_time / 1000:8.1f}  {module}")
+
+    if not args.no_server:
+        times = [time_to_healthy() for _ in range(args.runs)]
+        print(f"\ntime to first healthy response: median {statistics.median(times) * 1000:.0f} ms "
+              f"(runs: {', '.join(f'{t * 1000:.0f}' for t in times)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Train the local category classifier, or use it to backfill uncategorized grievances.
+
+Usage (from backend/):
+    python -m app.scripts.train_classifier train [--csv labelled.csv] [--epochs 20]
+    python -m app.scripts.train_classifier backfill [--min-confidence 0.5] [--dry-run]
+
+Training data comes from grievances whose category is one of CATEGORY_DEPARTMENTS
+(excluding "other"), or from a CSV file with "text" and "category" columns.
+"""
+import argparse
+import csv
+import random
+import time
+
+from app.database import SessionLocal
+from app.models import Grievance
+from app.services import classifier
+from app.utils.departments import CATEGORY_DEPARTMENTS
+
+
+def load_training_data(csv_path: str | None):
+    if csv_path:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [(r["text"], r["category"]) for r in csv.DictReader(f)]
+    else:
+        db = SessionLocal()
+        try:
+            rows = [
+                (f"{title}. {description}", category)
+                for title, description, category in db.query(
+                    Grievance.title, Grievance.description_text, Grievance.category
+                ).filter(Grievance.category.in_([c for c in CATEGORY_DEPARTMENTS if c != "other"]))
+            ]
+        finally:
+            db.close()
+    return [(text, category) for text, category in rows if text and category in CATEGORY_DEPARTMENTS]
+
+
+def train(csv_path: str | None, epochs: int, holdout: float):
+    rows = load_training_data(csv_path)
+    if len(rows) < 20:
+        print(f"Only {len(rows)} labelled grievances found, need at least 20")
+        return
+
+    random.Random(0).shuffle(rows)
+    split = int(len(rows) * (1 - holdout))
+    train_rows, test_rows = rows[:split], rows[split:]
+
+    started = time.perf_counter()
+    model = classifier.CategoryClassifier.train(
+        [t for t, _ in train_rows], [c for _, c in train_rows], epochs=epochs
+    )
+    print(f"Trained on {len(train_rows)} grievances in {time.perf_counter() - started:.1f}s")
+
+    if test_rows:
+        predictions = model.predict_batch([t for t, _ in test_rows])
+        correct = sum(1 for (_, label), (predicted, _) in zip(test_rows, predictions) if label == predicted)
+        print(f"Holdout accuracy: {correct / len(test_rows):.3f} on {len(test_rows)} grievances")
+
+    started = time.perf_counter()
+    for text, _ in test_rows[:200] or train_rows[:200]:
+        model.predict(text)
+    per_call = (time.perf_counter() - started) / min(200, len(test_rows) or len(train_rows))
+    print(f"Single prediction latency: {per_call * 1000:.3f} ms")
+
+    model.save(classifier.MODEL_PATH)
+    print(f"Saved model to {classifier.MODEL_PATH}")
+
+
+def backfill(min_confidence: float, dry_run: bool, batch_size: int = 1000):
+    model = classifier.get_classifier()
+    if model is None:
+        print("No trained model found, run `train` first")
+        return
+
+    db = SessionLocal()
+    updated = skipped = 0
+    last_id = ""
+    try:
+        while True:
+            rows = (
+                db.query(Grievance)
+                .filter((Grievance.category.is_(None)) | (Grievance.category == "other"))
+                .filter(Grievance.id > last_id)
+                .order_by(Grievance.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            predictions = model.predict_batch([f"{g.title}. {g.description_text}" for g in rows])
+            for grievance, (category, confidence) in zip(rows, predictions):
+                if confidence < min_confidence or category == "other":
+                    skipped += 1
+                    continue
+                grievance.category = category
+                grievance.department = CATEGORY_DEPARTMENTS[category]
+                updated += 1
+            last_id = rows[-1].id
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+        print(f"{'Would update' if dry_run else 'Updated'} {updated} grievances, {skipped} below confidence")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = sub.add_parser("train", help="train and save the model")
+    train_parser.add_argument("--csv", help="CSV with text,category columns instead of the database")
+    train_parser.add_argument("--epochs", type=int, default=20)
+    train_parser.add_argument("--holdout", type=float, default=0.1)
+
+    backfill_parser = sub.add_parser("backfill", help="categorize grievances filed as 'other'")
+    backfill_parser.add_argument("--min-confidence", type=float, default=classifier.MIN_CONFIDENCE)
+    backfill_parser.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "train":
+        train(args.csv, args.epochs, args.holdout)
+    else:
+        backfill(args.min_confidence, args.dry_run)
@@ -0,0 +1,349 @@
+"""
+Admission control for the endpoints that call paid AI providers.
+
+Two layers, both in-process (each worker enforces its own share):
+
+- A token bucket per client IP refills at RATE_LIMIT_PER_MINUTE up to
+  RATE_LIMIT_BURST. An empty bucket is rejected with 429 right away.
+- A concurrency limit per provider (HuggingFace, Groq) with a bounded wait
+  queue ordered by the ticket's keyword urgency (calculate_urgency, which is
+  local and cheap) with aging. When all slots are busy, a request waits at
+  most PROVIDER_QUEUE_TIMEOUT. If the queue is already full, or the wait
+  times out, it gets 503 instead of piling up behind the provider.
+
+Endpoints wait on the event loop (admit() is async), so queued requests
+hold no threads, and admitted calls run via run() on PROVIDER_THREADS
+threads of their own. A backlog at the providers therefore never starves the
+threadpool that every sync endpoint shares. Batch analysis, which already
+runs on its own threads, waits with admit_blocking().
+
+Both rejections carry Retry-After. Queue depth, in-flight calls and rejection
+counts are exported on /metrics.
+"""
+import asyncio
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+import anyio
+from fastapi import Request
+
+from ..utils.metrics import counter, gauge, histogram
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Behind a reverse proxy (e.g. Render) set to the number of proxies that append to X-Forwarded-For
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+PROVIDER_LIMITS = {
+    "hf": int(os.getenv("HF_MAX_CONCURRENCY", "8")),
+    "groq": int(os.getenv("GROQ_MAX_CONCURRENCY", "4")),
+}
+PROVIDER_QUEUE_SIZE = int(os.getenv("PROVIDER_QUEUE_SIZE", "16"))
+PROVIDER_QUEUE_TIMEOUT = float(os.getenv("PROVIDER_QUEUE_TIMEOUT", "10"))
+PRIORITY_AGING_SECONDS = float(os.getenv("PRIORITY_AGING_SECONDS", "2"))  # wait that earns one urgency point
+# Threads for admitted provider calls; a request may hold a slot with each provider but uses one thread
+PROVIDER_THREADS = int(os.getenv("PROVIDER_THREADS", str(sum(PROVIDER_LIMITS.values()))))
+DEFAULT_URGENCY = 5
+
+# (level, minimum urgency, share of a provider's slots); floors match main.determine_priority
+PRIORITY_SHARES = (
+    ("high", 8, 1.0),
+    ("medium", 5, 0.9),
+    ("low", 0, 0.75),
+)
+
+REJECTED = counter("admission_rejected_total", "Requests rejected by admission control", ("reason", "provider"))
+QUEUE_DEPTH = gauge("admission_queue_depth", "Requests waiting for a provider slot", ("provider",))
+IN_FLIGHT = gauge("admission_in_flight", "Provider slots in use", ("provider",))
+WAIT_TIME = histogram("admission_wait_seconds", "Time spent queued for a provider slot", ("provider", "level"))
+RATE_LIMITED_CLIENTS = gauge("rate_limit_tracked_clients", "Clients with a token bucket")
+
+T = TypeVar("T")
+
+
+class Rejected(Exception):
+    """Raised when a request cannot be admitted; main.py turns it into 429/503 with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimiter:
+    """Token bucket per client key; least recently seen clients are forgotten past max_clients."""
+
+    def __init__(self, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 if admitted, else seconds until enough tokens refill."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / self.rate
+
+
+class _Waiter:
+    __slots__ = ("key", "level", "granted", "rejected", "wake")
+
+    def __init__(self, key: Tuple[float, int], level: str, wake: Callable[[], None]):
+        self.key = key
+        self.level = level
+        self.granted = False
+        self.rejected = False
+        self.wake = wake  # called (under the limiter's lock) once granted or displaced
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def priority_level(urgency: int) -> str:
+    for level, floor, _ in PRIORITY_SHARES:
+        if urgency >= floor:
+            return level
+    return PRIORITY_SHARES[-1][0]
+
+
+class ProviderLimiter:
+    """
+    At most `limit` concurrent calls; at most `queue_size` callers waiting.
+
+    Waiters are served by urgency plus PRIORITY_AGING_SECONDS of credit per
+    point, so a routine request that has waited long enough overtakes a fresh
+    urgent one. Since every waiter ages at the same rate, the order is fixed
+    at enqueue time (key = enqueue time / aging - urgency). Each priority level
+    may hold only its share of the slots, which leaves headroom for urgent
+    work during a backlog. When the queue is full, a more urgent arrival
+    displaces the least urgent waiter instead of being turned away.
+
+    Endpoints wait with acquire_async() on the event loop; code that already
+    runs on a worker thread of its own (batch analysis) blocks in acquire().
+    Both share one queue.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int = PROVIDER_QUEUE_SIZE,
+                 timeout: float = PROVIDER_QUEUE_TIMEOUT, aging: float = PRIORITY_AGING_SECONDS):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.aging = aging
+        self.in_flight = 0
+        self._running: Dict[str, int] = {level: 0 for level, _, _ in PRIORITY_SHARES}
+        self._caps = {level: max(1, int(self.limit * share)) for level, _, share in PRIORITY_SHARES}
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._service_time = 1.0  # EWMA of slot hold time, for Retry-After
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _retry_after(self) -> float:
+        return self._service_time * (len(self._waiters) + 1) / self.limit
+
+    def _can_run(self, level: str) -> bool:
+        return self.in_flight < self.limit and self._running[level] < self._caps[level]
+
+    def _start(self, level: str):
+        self.in_flight += 1
+        self._running[level] += 1
+
+    def _finish(self, level: str):
+        self.in_flight -= 1
+        self._running[level] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the best waiters their level's share allows."""
+        for waiter in sorted(self._waiters, key=lambda w: w.key):
+            if self.in_flight >= self.limit:
+                break
+            if self._can_run(waiter.level):
+                self._waiters.remove(waiter)
+                waiter.granted = True
+                self._start(waiter.level)
+                waiter.wake()
+
+    def _reject(self, reason: str):
+        REJECTED.inc(reason=reason, provider=self.name)
+        raise Rejected(503, f"{self.name} is at capacity, try again later", self._retry_after())
+
+    def _enqueue(self, urgency: int, wake: Callable[[], None]) -> Tuple[str, Optional[_Waiter], float]:
+        """Take a free slot (waiter None) or join the queue; (level, waiter, enqueue time)."""
+        level = priority_level(urgency)
+        started = time.monotonic()
+        with self._lock:
+            if not self._waiters and self._can_run(level):
+                self._start(level)
+                return level, None, started
+
+            waiter = _Waiter((started / self.aging - urgency, next(self._sequence)), level, wake)
+            if len(self._waiters) >= self.queue_size:
+                worst = max(self._waiters, key=lambda w: w.key, default=None)
+                if worst is None or worst.key < waiter.key:
+                    self._reject("queue_full")
+                self._waiters.remove(worst)
+                worst.rejected = True
+                worst.wake()
+            self._waiters.append(waiter)
+            self._dispatch()
+            return level, waiter, started
+
+    def _settle(self, waiter: _Waiter, started: float) -> str:
+        """After the wait: the granted level, or leave the queue and reject."""
+        with self._lock:
+            if not waiter.granted:
+                if not waiter.rejected:
+                    self._waiters.remove(waiter)
+                self._reject("displaced" if waiter.rejected else "queue_timeout")
+        WAIT_TIME.observe(time.monotonic() - started, provider=self.name, level=waiter.level)
+        return waiter.level
+
+    def _abandon(self, waiter: _Waiter):
+        """A cancelled wait: leave the queue, or hand back a slot granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                self._finish(waiter.level)
+            elif not waiter.rejected:
+                self._waiters.remove(waiter)
+
+    async def acquire_async(self, urgency: int = DEFAULT_URGENCY) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        level, waiter, started = self._enqueue(urgency, lambda: loop.call_soon_threadsafe(_resolve, future))
+        if waiter is None:
+            return level
+        try:
+            with anyio.move_on_after(self.timeout):
+                await future
+        except BaseException:
+            # e.g. the client went away
+            self._abandon(waiter)
+            raise
+        return self._settle(waiter, started)
+
+    def acquire(self, urgency: int = DEFAULT_URGENCY) -> str:
+        event = threading.Event()
+        level, waiter, started = self._enqueue(urgency, event.set)
+        if waiter is None:
+            return level
+        event.wait(self.timeout)
+        return self._settle(waiter, started)
+
+    def release(self, level: str, held: float):
+        with self._lock:
+            self._service_time += 0.2 * (held - self._service_time)
+            self._finish(level)
+
+    @asynccontextmanager
+    async def slot_async(self, urgency: int = DEFAULT_URGENCY):
+        level = await self.acquire_async(urgency)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(level, time.monotonic() - started)
+
+    @contextmanager
+    def slot(self, urgency: int = DEFAULT_URGENCY):
+        level = self.acquire(urgency)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(level, time.monotonic() - started)
+
+
+rate_limiter = RateLimiter()
+providers: Dict[str, ProviderLimiter] = {name: ProviderLimiter(name, limit) for name, limit in PROVIDER_LIMITS.items()}
+provider_threads = anyio.CapacityLimiter(max(1, PROVIDER_THREADS))
+
+RATE_LIMITED_CLIENTS.set_function(lambda: len(rate_limiter))
+for _name, _limiter in providers.items():
+    QUEUE_DEPTH.set_function(lambda limiter=_limiter: limiter.waiting, provider=_name)
+    IN_FLIGHT.set_function(lambda limiter=_limiter: limiter.in_flight, provider=_name)
+
+
+def client_key(request: Request) -> str:
+    """Client IP, taken from X-Forwarded-For only as far as the trusted proxies go."""
+    if TRUSTED_PROXY_HOPS > 0:
+        hops = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+def check_rate(request: Request, cost: float = 1.0):
+    """Spend cost tokens from the caller's bucket or reject with 429."""
+    wait = rate_limiter.acquire(client_key(request), cost)
+    if wait:
+        REJECTED.inc(reason="rate_limited", provider="")
+        raise Rejected(429, "Too many analysis requests, slow down", wait)
+
+
+def rate_limit(request: Request):
+    """FastAPI dependency: one token per request."""
+    check_rate(request)
+
+
+def _limiters(names: Iterable[str]) -> List[ProviderLimiter]:
+    # A fixed order keeps two requests from each holding the slot the other waits for
+    return [providers[name] for name in sorted(set(names)) if name in providers]
+
+
+@asynccontextmanager
+async def admit(names: Iterable[str], urgency: int = DEFAULT_URGENCY):
+    """Hold a slot with every named provider for the duration of the block, queued by urgency."""
+    async with AsyncExitStack() as stack:
+        for limiter in _limiters(names):
+            await stack.enter_async_context(limiter.slot_async(urgency))
+        yield
+
+
+@contextmanager
+def admit_blocking(names: Iterable[str], urgency: int = DEFAULT_URGENCY):
+    """admit() for code on a worker thread of its own; the wait blocks that thread."""
+    with ExitStack() as stack:
+        for limiter in _limiters(names):
+            stack.enter_context(limiter.slot(urgency))
+        yield
+
+
+async def run(function: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking provider call (inside admit()) on the provider threads."""
+    return await anyio.to_thread.run_sync(partial(function, *args, **kwargs), limiter=provider_threads)
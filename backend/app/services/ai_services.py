@@ -1,17 +1,23 @@
 import os
 import base64
 import json
-import requests
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
-from groq import Groq
+import logging
+import numpy as np
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-load_dotenv()
+from ..utils.metrics import span, record_error
+from ..utils.severity import overall_severity
+
+logger = logging.getLogger(__name__)
 
 HF_TOKEN = os.getenv("HF_TOKEN")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-HF_API_URL = "https://router.huggingface.co/hf-inference/models/intfloat/multilingual-e5-small/pipeline/sentence-similarity"
+# Override to point at a self-hosted or stub inference server (see benchmarks/stubs.py)
+HF_INFERENCE_BASE_URL = os.getenv("HF_INFERENCE_BASE_URL", "https://router.huggingface.co/hf-inference/models")
+HF_API_URL = f"{HF_INFERENCE_BASE_URL}/intfloat/multilingual-e5-small/pipeline/sentence-similarity"
+HF_EMBEDDING_URL = f"{HF_INFERENCE_BASE_URL}/intfloat/multilingual-e5-small/pipeline/feature-extraction"
 
 SENTIMENT_REFERENCES = {
     "positive": [
@@ -35,6 +41,8 @@ SENTIMENT_REFERENCES = {
     ]
 }
 
+_reference_vectors: Optional[np.ndarray] = None  # normalized embeddings of the reference sentences
+
 URGENCY_KEYWORDS = {
     "high": ["emergency", "urgent", "dangerous", "life-threatening", "immediate", "critical", "severe", "flooding", "fire", "collapse", "accident"],
     "medium": ["broken", "damaged", "not working", "leaking", "blocked", "delayed", "problem", "issue"],
@@ -42,6 +50,76 @@ URGENCY_KEYWORDS = {
 }
 
 
+ANALYSIS_TIERS = ("fast", "standard", "deep")  # cheapest to most thorough
+# Force one tier for every grievance (e.g. "deep" for the previous always-full analysis)
+ANALYSIS_TIER = os.getenv("ANALYSIS_TIER")
+FAST_MAX_URGENCY = int(os.getenv("ANALYSIS_FAST_MAX_URGENCY", "4"))
+DEEP_MIN_URGENCY = int(os.getenv("ANALYSIS_DEEP_MIN_URGENCY", "8"))
+DEEP_MIN_IMAGES = int(os.getenv("ANALYSIS_DEEP_MIN_IMAGES", "3"))
+DEEP_CATEGORIES = {c.strip() for c in os.getenv("ANALYSIS_DEEP_CATEGORIES", "public-safety,healthcare").split(",") if c.strip()}
+
+
+def choose_tier(urgency: int, category: Optional[str] = None, image_count: int = 0) -> str:
+    """
+    Pick how much provider work a grievance gets from local signals only:
+    deep for urgent, safety-related or heavily documented complaints, fast for
+    low-urgency text-only ones, standard otherwise.
+    """
+    if ANALYSIS_TIER in ANALYSIS_TIERS:
+        return ANALYSIS_TIER
+    if urgency >= DEEP_MIN_URGENCY or category in DEEP_CATEGORIES or image_count >= DEEP_MIN_IMAGES:
+        return "deep"
+    if urgency <= FAST_MAX_URGENCY and not image_count:
+        return "fast"
+    return "standard"
+
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _client(name: str, factory: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def groq_client():
+    """Shared Groq client; the SDK is imported on first use to keep it out of startup."""
+    def build():
+        from groq import Groq
+        return Groq(api_key=GROQ_API_KEY)
+    return _client("groq", build)
+
+
+def hf_session():
+    """Shared HTTP session for the HF pipeline endpoints, so calls reuse connections."""
+    def build():
+        import requests
+        return requests.Session()
+    return _client("hf_session", build)
+
+
+def hf_client():
+    """Shared HuggingFace InferenceClient, created on first use."""
+    def build():
+        from huggingface_hub import InferenceClient
+        return InferenceClient(token=HF_TOKEN)
+    return _client("hf", build)
+
+
+def providers_for(images: Optional[List[str]] = None, tier: str = "deep") -> List[str]:
+    """Configured external providers an analysis of text (and images) at this tier will call."""
+    providers = ["hf"] if HF_TOKEN else []
+    if images and GROQ_API_KEY and tier != "fast":
+        providers.append("groq")
+    return providers
+
+
 def analyze_sentiment(text: str) -> Dict[str, Any]:
     """
     Analyze sentiment of text using HuggingFace multilingual-e5-small model.
@@ -62,18 +140,25 @@ def analyze_sentiment(text: str) -> Dict[str, Any]:
                     "sentences": reference_sentences
                 }
             }
-            response = requests.post(HF_API_URL, headers=headers, json=payload, timeout=30)
+            with span("hf.sentence_similarity"):
+                response = hf_session().post(HF_API_URL, headers=headers, json=payload, timeout=30)
 
             if response.status_code == 200:
                 scores = response.json()
                 avg_score = sum(scores) / len(scores) if scores else 0
                 sentiment_scores[sentiment] = avg_score
             else:
+                record_error("hf.sentence_similarity")
                 sentiment_scores[sentiment] = 0.0
         except Exception as e:
-            print(f"Error analyzing sentiment for {sentiment}: {e}")
+            logger.warning("Error analyzing sentiment for %s: %s", sentiment, e)
             sentiment_scores[sentiment] = 0.0
 
+    return _sentiment_result(sentiment_scores)
+
+
+def _sentiment_result(sentiment_scores: Dict[str, float]) -> Dict[str, Any]:
+    """Pick the sentiment whose reference sentences are most similar on average."""
     if not sentiment_scores or all(v == 0 for v in sentiment_scores.values()):
         return {
             "sentiment": "neutral",
@@ -95,6 +180,68 @@ def analyze_sentiment(text: str) -> Dict[str, Any]:
     }
 
 
+def analyze_sentiments(texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Batched analyze_sentiment: one feature-extraction call embeds all texts
+    (plus the reference sentences, once per process) and similarities are
+    computed locally, instead of three sentence-similarity calls per text.
+    Results are in input order.
+    """
+    global _reference_vectors
+    if not texts:
+        return []
+    if not HF_TOKEN:
+        return [{"error": "HF_TOKEN not configured", "sentiment": "neutral", "confidence": 0.0} for _ in texts]
+
+    references = [(s, ref) for s, refs in SENTIMENT_REFERENCES.items() for ref in refs]
+    inputs = list(texts) if _reference_vectors is not None else list(texts) + [ref for _, ref in references]
+    vectors = get_text_embeddings(inputs)
+    if vectors is None:
+        return [_sentiment_result({}) for _ in texts]
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    if _reference_vectors is None:
+        _reference_vectors = vectors[len(texts):]
+    similarities = vectors[:len(texts)] @ _reference_vectors.T
+
+    labels = np.array([s for s, _ in references])
+    results = []
+    for row in similarities:
+        # Clamped like the similarity pipeline's scores, so confidence stays a share of a positive total
+        scores = {s: max(0.0, float(row[labels == s].mean())) for s in SENTIMENT_REFERENCES}
+        results.append(_sentiment_result(scores))
+    return results
+
+
+def get_text_embeddings(texts: List[str]) -> Optional[List[List[float]]]:
+    """
+    Get sentence embeddings from HuggingFace multilingual-e5-small.
+    Returns one vector per input text, or None if the service is unavailable.
+    """
+    if not HF_TOKEN or not texts:
+        return None
+
+    headers = {"Authorization": f"Bearer {HF_TOKEN}"}
+    # e5 models expect a task prefix; "query: " suits symmetric similarity
+    payload = {"inputs": [f"query: {t}" for t in texts]}
+
+    try:
+        with span("hf.feature_extraction"):
+            response = hf_session().post(HF_EMBEDDING_URL, headers=headers, json=payload, timeout=30)
+        if response.status_code != 200:
+            record_error("hf.feature_extraction")
+            logger.warning("Embedding request failed: %s", response.status_code)
+            return None
+        vectors = response.json()
+        if len(vectors) != len(texts):
+            return None
+        return vectors
+    except Exception as e:
+        logger.warning("Error getting embeddings: %s", e)
+        return None
+
+
 def calculate_urgency(text: str) -> int:
     """Calculate urgency score (1-10) based on keywords in text."""
     text_lower = text.lower()
@@ -119,35 +266,38 @@ def calculate_urgency(text: str) -> int:
         return 4
 
 
-def analyze_image_with_blip(image_base64: str) -> str:
+CAPTION_MODELS = [
+    "Salesforce/blip-image-captioning-large",
+    "Salesforce/blip-image-captioning-base",
+    "nlpconnect/vit-gpt2-image-captioning",
+]
+
+
+def analyze_image_with_blip(image_base64: str, attempts: Optional[int] = None) -> str:
     """
-    Get image caption using HuggingFace BLIP model.
+    Get image caption using HuggingFace BLIP model, trying up to `attempts`
+    of CAPTION_MODELS in order (all by default).
     Falls back to empty string if service unavailable.
     """
     if not HF_TOKEN:
         return ""
 
     try:
-        from huggingface_hub import InferenceClient
-
         # Convert base64 to bytes
         if image_base64.startswith("data:"):
             image_base64 = image_base64.split(",")[1]
 
         image_bytes = base64.b64decode(image_base64)
 
-        client = InferenceClient(token=HF_TOKEN)
+        client = hf_client()
 
         # Try multiple models
-        models = [
-            "Salesforce/blip-image-captioning-large",
-            "Salesforce/blip-image-captioning-base",
-            "nlpconnect/vit-gpt2-image-captioning",
-        ]
-
-        for model in models:
+        for model in CAPTION_MODELS[:attempts]:
             try:
-                result = client.image_to_text(image_bytes, model=model)
+                # A full URL makes the client call that endpoint directly
+                target = f"{HF_INFERENCE_BASE_URL}/{model}" if "HF_INFERENCE_BASE_URL" in os.environ else model
+                with span(f"hf.image_to_text:{model}"):
+                    result = client.image_to_text(image_bytes, model=target)
                 if result:
                     return result
             except Exception:
@@ -155,37 +305,11 @@ def analyze_image_with_blip(image_base64: str) -> str:
 
         return ""
     except Exception as e:
-        print(f"BLIP analysis error: {e}")
+        logger.warning("BLIP analysis error: %s", e)
         return ""
 
 
-def analyze_image_with_llm(image_description: str, grievance_context: str = "") -> Dict[str, Any]:
-    """
-    Use Groq LLM to analyze an image description in the context of grievance reporting.
-    Generates technical, professional analysis for municipal administration.
-    """
-    if not GROQ_API_KEY:
-        return {
-            "description": image_description,
-            "key_observations": [],
-            "identified_problems": [],
-            "affected_areas": [],
-            "recommended_actions": [],
-            "severity": "medium",
-            "severity_reason": "Unable to perform detailed analysis"
-        }
-
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-
-        prompt = f"""You are a Senior Municipal Engineer analyzing evidence from a citizen grievance report for official documentation.
-
-Image Evidence: "{image_description}"
-{f'Complaint Details: {grievance_context}' if grievance_context else ''}
-
-Provide a TECHNICAL and PROFESSIONAL analysis in JSON format. Use engineering/municipal terminology:
-
-{{
+IMAGE_ANALYSIS_FORMAT = """{
     "description": "Technical description (3-4 sentences) using proper engineering terminology. Include: type of infrastructure affected, visible damage assessment, potential structural/safety implications, and estimated impact radius.",
     "key_observations": [
         "Technical observation with specific details (e.g., 'Asphalt surface degradation approximately 2-3 sq meters')",
@@ -208,48 +332,225 @@ Provide a TECHNICAL and PROFESSIONAL analysis in JSON format. Use engineering/mu
     ],
     "severity": "low/medium/high/critical",
     "severity_reason": "Technical justification citing safety codes, structural integrity concerns, or public health standards"
-}}
+}"""
+
+TERMINOLOGY_HINT = "Use terminology like: structural integrity, load-bearing capacity, drainage coefficient, surface degradation, utility infrastructure, public right-of-way, municipal code violation, remediation protocol, preventive maintenance, etc."
+
+# Captions packed into one completion by analyze_images_with_llm
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "5"))
+# "aggregated": one completion per grievance covering all its images; "per_image": one per image
+IMAGE_ANALYSIS_MODE = os.getenv("IMAGE_ANALYSIS_MODE", "aggregated")
+
+
+def _fallback_image_analysis(image_description: str, reason: str) -> Dict[str, Any]:
+    return {
+        "description": image_description,
+        "key_observations": [],
+        "identified_problems": [],
+        "affected_areas": [],
+        "recommended_actions": [],
+        "severity": "medium",
+        "severity_reason": reason
+    }
+
 
-Use terminology like: structural integrity, load-bearing capacity, drainage coefficient, surface degradation, utility infrastructure, public right-of-way, municipal code violation, remediation protocol, preventive maintenance, etc.
+def _parse_llm_json(result_text: str) -> Any:
+    result_text = result_text.strip()
+    if "```json" in result_text:
+        result_text = result_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in result_text:
+        result_text = result_text.split("```")[1].split("```")[0].strip()
+    return json.loads(result_text)
+
+
+def _image_analysis_fields(result: Dict[str, Any], image_description: str) -> Dict[str, Any]:
+    return {
+        "description": result.get("description", image_description),
+        "key_observations": result.get("key_observations", []),
+        "identified_problems": result.get("identified_problems", []),
+        "affected_areas": result.get("affected_areas", []),
+        "recommended_actions": result.get("recommended_actions", []),
+        "severity": result.get("severity", "medium"),
+        "severity_reason": result.get("severity_reason", "")
+    }
+
+
+def analyze_image_with_llm(image_description: str, grievance_context: str = "") -> Dict[str, Any]:
+    """
+    Use Groq LLM to analyze an image description in the context of grievance reporting.
+    Generates technical, professional analysis for municipal administration.
+    """
+    if not GROQ_API_KEY:
+        return _fallback_image_analysis(image_description, "Unable to perform detailed analysis")
+
+    try:
+        client = groq_client()
+
+        prompt = f"""You are a Senior Municipal Engineer analyzing evidence from a citizen grievance report for official documentation.
+
+Image Evidence: "{image_description}"
+{f'Complaint Details: {grievance_context}' if grievance_context else ''}
+
+Provide a TECHNICAL and PROFESSIONAL analysis in JSON format. Use engineering/municipal terminology:
+
+{IMAGE_ANALYSIS_FORMAT}
+
+{TERMINOLOGY_HINT}
 
 Respond ONLY with valid JSON."""
 
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=800,
-            temperature=0.3
-        )
+        with span("groq.chat"):
+            response = client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=800,
+                temperature=0.3
+            )
 
-        result_text = response.choices[0].message.content.strip()
+        result = _parse_llm_json(response.choices[0].message.content)
+        return _image_analysis_fields(result, image_description)
+    except Exception as e:
+        logger.warning("LLM analysis error: %s", e)
+        return _fallback_image_analysis(image_description, "Analysis based on image caption")
 
-        # Parse JSON
-        if "```json" in result_text:
-            result_text = result_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in result_text:
-            result_text = result_text.split("```")[1].split("```")[0].strip()
 
-        result = json.loads(result_text)
-        return {
-            "description": result.get("description", image_description),
-            "key_observations": result.get("key_observations", []),
-            "identified_problems": result.get("identified_problems", []),
-            "affected_areas": result.get("affected_areas", []),
-            "recommended_actions": result.get("recommended_actions", []),
-            "severity": result.get("severity", "medium"),
-            "severity_reason": result.get("severity_reason", "")
-        }
+def analyze_images_with_llm(items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Analyze several (image description, grievance context) pairs in one Groq
+    completion that returns a JSON list with one analysis per item, in order.
+    Items missing from the reply fall back individually.
+    """
+    if len(items) <= 1 or not GROQ_API_KEY:
+        return [analyze_image_with_llm(description, context) for description, context in items]
+
+    evidence = "\n".join(
+        f'{i}. Image Evidence: "{description}"' + (f"\n   Complaint Details: {context}" if context else "")
+        for i, (description, context) in enumerate(items, start=1)
+    )
+    prompt = f"""You are a Senior Municipal Engineer analyzing evidence from citizen grievance reports for official documentation.
+
+Number of images: {len(items)}
+{evidence}
+
+For EACH image, in the same order, provide a TECHNICAL and PROFESSIONAL analysis. Respond with a JSON object {{"results": [...]}} whose list has exactly {len(items)} entries, each with an "index" (1-based) and these fields:
+
+{IMAGE_ANALYSIS_FORMAT}
+
+{TERMINOLOGY_HINT}
+
+Respond ONLY with valid JSON."""
+
+    results: Dict[int, Dict[str, Any]] = {}
+    try:
+        client = groq_client()
+        with span("groq.chat_batch"):
+            response = client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=min(700 * len(items), 8000),
+                temperature=0.3
+            )
+        parsed = _parse_llm_json(response.choices[0].message.content)
+        entries = parsed.get("results", []) if isinstance(parsed, dict) else parsed
+        for position, entry in enumerate(entries or [], start=1):
+            if isinstance(entry, dict):
+                results[int(entry.get("index", position))] = entry
     except Exception as e:
-        print(f"LLM analysis error: {e}")
-        return {
-            "description": image_description,
-            "key_observations": [],
-            "identified_problems": [],
-            "affected_areas": [],
-            "recommended_actions": [],
-            "severity": "medium",
-            "severity_reason": "Analysis based on image caption"
-        }
+        logger.warning("Batched LLM analysis error: %s", e)
+
+    return [
+        _image_analysis_fields(results[i], description) if i in results
+        else _fallback_image_analysis(description, "Analysis based on image caption")
+        for i, (description, _) in enumerate(items, start=1)
+    ]
+
+
+def analyze_grievance_images_with_llm(
+    image_descriptions: List[str], grievance_context: str = ""
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Analyze all images of one grievance in a single Groq completion: the
+    complaint and instructions are sent once, and the reply has one analysis
+    per image (same fields as analyze_image_with_llm) plus a combined
+    severity assessment. Returns (per-image analyses, combined or None).
+    """
+    if len(image_descriptions) <= 1 or not GROQ_API_KEY:
+        return [analyze_image_with_llm(d, grievance_context) for d in image_descriptions], None
+
+    evidence = "\n".join(f'{i}. Image Evidence: "{d}"' for i, d in enumerate(image_descriptions, start=1))
+    prompt = f"""You are a Senior Municipal Engineer analyzing evidence from a citizen grievance report for official documentation.
+
+{f'Complaint Details: {grievance_context}' if grievance_context else ''}
+Number of images: {len(image_descriptions)}
+{evidence}
+
+Provide a TECHNICAL and PROFESSIONAL analysis of EACH image, in the same order, and a combined assessment of the whole complaint. Respond with a JSON object {{"results": [...], "overall": {{"severity": "low/medium/high/critical", "severity_reason": "..."}}}} whose "results" list has exactly {len(image_descriptions)} entries, each with an "index" (1-based) and these fields:
+
+{IMAGE_ANALYSIS_FORMAT}
+
+Keep per-image descriptions to what that image shows; put conclusions that need several images in "overall".
+
+{TERMINOLOGY_HINT}
+
+Respond ONLY with valid JSON."""
+
+    results: Dict[int, Dict[str, Any]] = {}
+    combined = None
+    try:
+        client = groq_client()
+        with span("groq.chat_grievance"):
+            response = client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=min(600 * len(image_descriptions) + 200, 6000),
+                temperature=0.3
+            )
+        parsed = _parse_llm_json(response.choices[0].message.content)
+        for position, entry in enumerate(parsed.get("results") or [], start=1):
+            if isinstance(entry, dict):
+                results[int(entry.get("index", position))] = entry
+        overall = parsed.get("overall")
+        if isinstance(overall, dict) and overall.get("severity"):
+            combined = {"severity": overall["severity"], "severity_reason": overall.get("severity_reason", "")}
+    except Exception as e:
+        logger.warning("Grievance LLM analysis error: %s", e)
+
+    analyses = [
+        _image_analysis_fields(results[i], d) if i in results
+        else _fallback_image_analysis(d, "Analysis based on image caption")
+        for i, d in enumerate(image_descriptions, start=1)
+    ]
+    return analyses, combined
+
+
+MANUAL_REVIEW_ANALYSIS = {
+    "description": "Image uploaded as supporting evidence",
+    "key_observations": ["Visual evidence provided by citizen"],
+    "identified_problems": ["Issue documented in uploaded image"],
+    "affected_areas": ["To be determined by manual review"],
+    "recommended_actions": ["Manual inspection of uploaded image recommended"],
+    "severity": "medium",
+    "severity_reason": "Automated image analysis temporarily unavailable - manual review needed"
+}
+
+
+def describe_image(image_base64: str, grievance_context: str = "",
+                   caption_attempts: Optional[int] = None) -> Optional[str]:
+    """
+    The text the LLM analyzes for an image: its BLIP caption, or a placeholder
+    if captioning failed but there is grievance context. None if neither.
+    """
+    logger.info("Getting image caption with BLIP...")
+    with span("image.caption"):
+        image_caption = analyze_image_with_blip(image_base64, caption_attempts)
+
+    if image_caption:
+        logger.info("BLIP caption: %s", image_caption)
+        return image_caption
+    logger.info("Image captioning unavailable, using context-based analysis...")
+    if grievance_context:
+        return "Image related to citizen grievance (visual analysis temporarily unavailable)"
+    return None
 
 
 def analyze_image(image_base64: str, grievance_context: str = "") -> Dict[str, Any]:
@@ -258,74 +559,106 @@ def analyze_image(image_base64: str, grievance_context: str = "") -> Dict[str, A
     Returns comprehensive analysis with key observations, problems, and recommendations.
     If image captioning fails, uses context-based analysis from the grievance description.
     """
-    # Step 1: Try to get image description using BLIP
-    print("Getting image caption with BLIP...")
-    image_caption = analyze_image_with_blip(image_base64)
+    description = describe_image(image_base64, grievance_context)
+    if description is None:
+        return dict(MANUAL_REVIEW_ANALYSIS)
+    logger.info("Analyzing with LLM...")
+    return analyze_image_with_llm(description, grievance_context)
 
-    if image_caption:
-        print(f"BLIP caption: {image_caption}")
-        # Step 2: Use LLM to expand on the caption
-        print("Analyzing with LLM...")
-        analysis = analyze_image_with_llm(image_caption, grievance_context)
-        return analysis
-    else:
-        # Fallback: Generate analysis based on grievance context alone
-        print("Image captioning unavailable, using context-based analysis...")
-        if grievance_context:
-            return analyze_image_with_llm(
-                "Image related to citizen grievance (visual analysis temporarily unavailable)",
-                grievance_context
-            )
-        else:
-            return {
-                "description": "Image uploaded as supporting evidence",
-                "key_observations": ["Visual evidence provided by citizen"],
-                "identified_problems": ["Issue documented in uploaded image"],
-                "affected_areas": ["To be determined by manual review"],
-                "recommended_actions": ["Manual inspection of uploaded image recommended"],
-                "severity": "medium",
-                "severity_reason": "Automated image analysis temporarily unavailable - manual review needed"
-            }
+
+def image_error(image_index: int, error: str) -> Dict[str, Any]:
+    """Entry for an image whose analysis failed."""
+    return {
+        "image_index": image_index,
+        "error": error,
+        "description": "",
+        "identified_problems": [],
+        "severity": "unknown"
+    }
 
 
-def analyze_grievance(text: str, images: Optional[List[str]] = None) -> Dict[str, Any]:
+def analyze_grievance_images(
+    images: List[str], grievance_context: str = "", tier: str = "deep"
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Caption every image, then analyze all captions in one LLM call.
+    Returns per-image analyses (with image_index, in input order) and the
+    combined assessment, if the model gave one. Below the deep tier only the
+    first captioning model is tried; the fast tier keeps the caption and
+    skips the LLM.
+    """
+    caption_attempts = None if tier == "deep" else 1
+    analyses: List[Optional[Dict[str, Any]]] = [None] * len(images)
+    described: List[Tuple[int, str]] = []
+    for idx, image_base64 in enumerate(images):
+        try:
+            description = describe_image(image_base64, grievance_context, caption_attempts)
+        except Exception as e:
+            analyses[idx] = image_error(idx, str(e))
+            continue
+        if description is None:
+            analyses[idx] = dict(MANUAL_REVIEW_ANALYSIS)
+        else:
+            described.append((idx, description))
+
+    combined = None
+    if described and tier == "fast":
+        for idx, description in described:
+            analyses[idx] = _fallback_image_analysis(description, "Quick analysis; run a deep analysis for details")
+    elif described:
+        logger.info("Analyzing %d image(s) with LLM...", len(described))
+        results, combined = analyze_grievance_images_with_llm([d for _, d in described], grievance_context)
+        for (idx, _), analysis in zip(described, results):
+            analyses[idx] = analysis
+    for idx, analysis in enumerate(analyses):
+        analysis["image_index"] = idx
+    return analyses, combined
+
+
+def analyze_grievance(text: str, images: Optional[List[str]] = None, tier: Optional[str] = None,
+                      category: Optional[str] = None) -> Dict[str, Any]:
     """
     Analyze a complete grievance including text and images.
     Returns combined analysis with sentiment, urgency, and image descriptions.
+
+    The tier (chosen by choose_tier unless given) sets how much provider work
+    is done: deep runs the full sentence-similarity sentiment and every
+    captioning fallback; standard and fast score sentiment with one embedding
+    call and try one captioning model; fast also skips the image LLM.
     """
-    text_analysis = analyze_sentiment(text)
-    urgency_score = calculate_urgency(text)
+    with span("urgency"):
+        urgency_score = calculate_urgency(text)
+    if tier not in ANALYSIS_TIERS:
+        tier = choose_tier(urgency_score, category, len(images or []))
+
+    with span("sentiment"):
+        text_analysis = analyze_sentiment(text) if tier == "deep" else analyze_sentiments([text])[0]
 
     text_analysis["urgency_score"] = urgency_score
 
     image_analyses = []
-    if images:
+    combined = None
+    if images and (IMAGE_ANALYSIS_MODE == "aggregated" or tier != "deep"):
+        with span("image.analysis"):
+            image_analyses, combined = analyze_grievance_images(images, text, tier)
+    elif images:
         for idx, image_base64 in enumerate(images):
             try:
                 # Pass grievance text as context for better image analysis
-                analysis = analyze_image(image_base64, grievance_context=text)
+                with span("image.analysis"):
+                    analysis = analyze_image(image_base64, grievance_context=text)
                 analysis["image_index"] = idx
                 image_analyses.append(analysis)
             except Exception as e:
-                image_analyses.append({
-                    "image_index": idx,
-                    "error": str(e),
-                    "description": "",
-                    "identified_problems": [],
-                    "severity": "unknown"
-                })
-
-    overall_severity = "medium"
-    if image_analyses:
-        severities = [img.get("severity", "medium") for img in image_analyses]
-        if "high" in severities:
-            overall_severity = "high"
-        elif all(s == "low" for s in severities):
-            overall_severity = "low"
+                image_analyses.append(image_error(idx, str(e)))
 
     return {
         "text_analysis": text_analysis,
         "image_analyses": image_analyses,
         "overall_urgency": urgency_score,
-        "overall_severity": overall_severity
+        "overall_severity": overall_severity(
+            (img.get("severity") for img in image_analyses), assessed=combined and combined["severity"]
+        ),
+        "severity_reason": combined["severity_reason"] if combined else None,
+        "analysis_tier": tier
     }
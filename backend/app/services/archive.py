@@ -0,0 +1,323 @@
+"""
+Hot/cold storage for resolved grievances.
+
+Grievances resolved more than ARCHIVE_AFTER_DAYS ago are moved out of the
+`grievances` table into `archived_grievances` in a separate SQLite file
+(ARCHIVE_DATABASE_URL, next to the main database by default). Their
+description, images and image analyses are compressed (utils/compression.py),
+and only the columns dashboards filter or count on stay plain. The hot table
+keeps open and recent work, so list, search and analytics scans stay small.
+
+Lookups by id or ticket id fall back to the archive and return a read-only
+copy; `restore` moves a grievance back. Status events and resolution sketches
+stay in the main database, so history and time-to-resolution analytics cover
+archived grievances unchanged.
+
+Each batch is written to the archive before it is deleted from the main
+database, so a crash in between leaves a grievance in both places (the hot
+copy wins, and the next run overwrites the archived one) rather than in
+neither.
+"""
+import base64
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..database import ArchiveBase, ArchiveSessionLocal, current_tenant, tenant_engines
+from ..models import ArchivedGrievance, Grievance, GrievanceEmbedding, ImageAnalysis, StatusEvent
+from ..utils.compression import CODEC, compress, compress_text, decompress, decompress_text
+from ..utils.metrics import counter, span
+from . import changefeed, dedup, vector_index
+from .resolution import RESOLVED
+from .row_cache import row_caches
+from .track_cache import track_cache
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+# Grievance columns kept in the compressed record rather than as archive columns
+RECORD_FIELDS = (
+    "sentiment", "sentiment_confidence", "analysis_tier", "cluster_id", "latitude", "longitude",
+    "geohash", "updated_at", "version",
+)
+DATETIME_FIELDS = {"updated_at"}
+ANALYSIS_FIELDS = (
+    "image_index", "severity", "severity_reason", "description", "identified_problems",
+    "recommended_actions", "error",
+)
+
+MOVED = counter("archive_grievances_total", "Grievances moved between the hot table and the archive", ("direction",))
+
+logger = logging.getLogger(__name__)
+
+_schema_lock = threading.Lock()
+_schema_ready = set()  # tenants whose archive tables exist
+
+
+def archive_session() -> Session:
+    """Session on the current tenant's archive database, creating its tables on first use."""
+    tenant = current_tenant.get()
+    if tenant not in _schema_ready:
+        with _schema_lock:
+            if tenant not in _schema_ready:
+                ArchiveBase.metadata.create_all(bind=tenant_engines.archive_engine(tenant))
+                _schema_ready.add(tenant)
+    return ArchiveSessionLocal()
+
+
+def _resolved_at():
+    """Latest resolution time per grievance, from its status events (index on grievance_id, changed_at)."""
+    last_resolved = (
+        select(func.max(StatusEvent.changed_at))
+        .where(StatusEvent.grievance_id == Grievance.id, StatusEvent.to_status == RESOLVED)
+        .correlate(Grievance)
+        .scalar_subquery()
+    )
+    return func.coalesce(last_resolved, Grievance.updated_at, Grievance.created_at)
+
+
+def _candidates(db: Session, cutoff: datetime):
+    resolved_at = _resolved_at().label("resolved_at")
+    return (
+        db.query(Grievance, resolved_at)
+        .filter(func.lower(Grievance.status) == RESOLVED, resolved_at < cutoff)
+        .order_by(Grievance.id)
+    )
+
+
+def _to_archive(grievance: Grievance, resolved_at: datetime,
+                embedding: Optional[GrievanceEmbedding]) -> ArchivedGrievance:
+    record = {field: getattr(grievance, field) for field in RECORD_FIELDS}
+    record["analyses"] = [{field: getattr(a, field) for field in ANALYSIS_FIELDS} for a in grievance.analyses]
+    if embedding is not None:
+        record["embedding"] = {"model": embedding.model, "vector": base64.b64encode(embedding.vector).decode()}
+    return ArchivedGrievance(
+        id=grievance.id,
+        ticket_id=grievance.ticket_id,
+        citizen_id=grievance.citizen_id,
+        title=grievance.title,
+        category=grievance.category,
+        department=grievance.department,
+        priority=grievance.priority,
+        status=grievance.status,
+        location=grievance.location,
+        overall_severity=grievance.overall_severity,
+        urgency_score=grievance.urgency_score,
+        created_at=grievance.created_at,
+        resolved_at=resolved_at,
+        archived_at=datetime.utcnow(),
+        codec=CODEC,
+        description_text=compress_text(grievance.description_text),
+        images=compress_text(grievance.images),
+        image_analyses=compress_text(grievance.image_analyses),
+        record=compress(orjson.dumps(record)),
+    )
+
+
+def _record(row: ArchivedGrievance) -> dict:
+    return orjson.loads(decompress(row.record, row.codec))
+
+
+def as_grievance(row: ArchivedGrievance) -> Grievance:
+    """A detached Grievance (with its image analyses) rebuilt from an archive row."""
+    record = _record(row)
+    grievance = Grievance(
+        id=row.id,
+        ticket_id=row.ticket_id,
+        citizen_id=row.citizen_id,
+        title=row.title,
+        category=row.category,
+        department=row.department,
+        priority=row.priority,
+        status=row.status,
+        location=row.location,
+        overall_severity=row.overall_severity,
+        urgency_score=row.urgency_score,
+        created_at=row.created_at,
+        description_text=decompress_text(row.description_text, row.codec),
+        images=decompress_text(row.images, row.codec),
+        image_analyses=decompress_text(row.image_analyses, row.codec),
+        **{
+            field: datetime.fromisoformat(record[field]) if field in DATETIME_FIELDS and record.get(field)
+            else record.get(field)
+            for field in RECORD_FIELDS
+        },
+    )
+    grievance.analyses = [ImageAnalysis(grievance_id=row.id, **analysis) for analysis in record["analyses"]]
+    return grievance
+
+
+def _embedding(row: ArchivedGrievance) -> Optional[GrievanceEmbedding]:
+    stored = _record(row).get("embedding")
+    if not stored:
+        return None
+    return GrievanceEmbedding(grievance_id=row.id, model=stored["model"], vector=base64.b64decode(stored["vector"]))
+
+
+def _lookup(archive_db: Session, grievance_id: str) -> Optional[ArchivedGrievance]:
+    return (
+        archive_db.query(ArchivedGrievance)
+        .filter((ArchivedGrievance.id == grievance_id) | (ArchivedGrievance.ticket_id == grievance_id))
+        .first()
+    )
+
+
+def lookup(grievance_id: str) -> Optional[ArchivedGrievance]:
+    """The archived grievance with this id or ticket id, if any."""
+    archive_db = archive_session()
+    try:
+        row = _lookup(archive_db, grievance_id)
+        if row is not None:
+            archive_db.expunge(row)
+        return row
+    finally:
+        archive_db.close()
+
+
+def archive_resolved(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                     batch_size: int = ARCHIVE_BATCH_SIZE, limit: Optional[int] = None) -> int:
+    """Move grievances resolved more than older_than_days ago into the archive; returns how many moved."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    archive_db = archive_session()
+    try:
+        while limit is None or moved < limit:
+            size = batch_size if limit is None else min(batch_size, limit - moved)
+            batch: List[Tuple[Grievance, datetime]] = _candidates(db, cutoff).limit(size).all()
+            if not batch:
+                break
+            ids = [grievance.id for grievance, _ in batch]
+            tickets = [grievance.ticket_id for grievance, _ in batch]
+            embeddings = {
+                e.grievance_id: e for e in
+                db.query(GrievanceEmbedding).filter(GrievanceEmbedding.grievance_id.in_(ids))
+            }
+
+            with span("archive.write"):
+                for grievance, resolved_at in batch:
+                    archive_db.merge(_to_archive(grievance, resolved_at, embeddings.get(grievance.id)))
+                archive_db.commit()
+
+            with span("archive.delete"):
+                db.info["grievance_move"] = "archive"
+                try:
+                    for grievance, _ in batch:
+                        vector_index.remove_grievance(db, grievance.id)
+                        db.delete(grievance)
+                    db.commit()
+                finally:
+                    db.info.pop("grievance_move", None)
+
+            for grievance_id in ids:
+                dedup.duplicate_indexes.of(db).remove(grievance_id)
+                row_caches.of(db).invalidate(grievance_id)
+            # Views are now served from the archive copy
+            track_cache.invalidate(*ids, *tickets, tenant=current_tenant.get())
+            moved += len(batch)
+            MOVED.inc(len(batch), direction="archive")
+            logger.info("Archived %d grievances (%d so far)", len(batch), moved)
+    finally:
+        archive_db.close()
+    return moved
+
+
+def count_candidates(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    return _candidates(db, cutoff).order_by(None).count()
+
+
+def restore(db: Session, grievance_id: str) -> Optional[Grievance]:
+    """Move an archived grievance back into the hot table; None if it is not archived."""
+    archive_db = archive_session()
+    try:
+        row = _lookup(archive_db, grievance_id)
+        if row is None:
+            return None
+        hot = db.query(Grievance).filter(Grievance.id == row.id).first()
+        if hot is not None:
+            # Left behind by an archival run that stopped between its two commits
+            archive_db.delete(row)
+            archive_db.commit()
+            track_cache.invalidate(hot.id, hot.ticket_id, tenant=current_tenant.get())
+            return hot
+        grievance = as_grievance(row)
+        # A new version, so cached rows and ETags from before the archival are not reused
+        grievance.version = (grievance.version or 1) + 1
+        embedding = _embedding(row)
+
+        db.info["grievance_move"] = "restore"
+        try:
+            db.add(grievance)
+            if embedding is not None:
+                db.merge(embedding)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.info.pop("grievance_move", None)
+
+        archive_db.delete(row)
+        archive_db.commit()
+    finally:
+        archive_db.close()
+
+    db.refresh(grievance)
+    track_cache.invalidate(grievance.id, grievance.ticket_id, tenant=current_tenant.get())
+    duplicate_index, index = dedup.duplicate_indexes.of(db), vector_index.vector_indexes.of(db)
+    if duplicate_index.loaded and (grievance.status or "").lower() != RESOLVED:
+        duplicate_index.add(
+            grievance.id, dedup.compute_signature(grievance.description_text, grievance.location),
+            grievance.cluster_id, grievance.created_at,
+        )
+    if embedding is not None and index.loaded and embedding.model == vector_index.MODEL_NAME:
+        index.add(grievance.id, np.frombuffer(embedding.vector, dtype=np.float32),
+                  grievance.category, grievance.department)
+    MOVED.inc(direction="restore")
+    return grievance
+
+
+def delete(db: Session, grievance_id: str) -> bool:
+    """Remove an archived grievance for good; False if it is not archived."""
+    archive_db = archive_session()
+    try:
+        row = _lookup(archive_db, grievance_id)
+        if row is None:
+            return False
+        deleted = as_grievance(row)
+        archive_db.delete(row)
+        archive_db.commit()
+    finally:
+        archive_db.close()
+    # Dashboard totals include the archive, so the delete has to move the change log head
+    # (and with it the dashboard ETags) of the main database
+    changefeed.record_delete(db, deleted)
+    db.commit()
+    # Nor do the session hooks that drop cached ticket views see it
+    track_cache.invalidate(deleted.id, deleted.ticket_id, tenant=current_tenant.get())
+    return True
+
+
+def counts(column: str) -> Dict[Optional[str], int]:
+    """Archived grievances per value of a plain column (e.g. "department"), for dashboard totals."""
+    attribute = getattr(ArchivedGrievance, column)
+    archive_db = archive_session()
+    try:
+        return dict(archive_db.query(attribute, func.count()).group_by(attribute).all())
+    finally:
+        archive_db.close()
+
+
+def total() -> int:
+    archive_db = archive_session()
+    try:
+        return archive_db.query(func.count(ArchivedGrievance.id)).scalar()
+    finally:
+        archive_db.close()
@@ -0,0 +1,160 @@
+"""
+Bulk analysis for POST /api/analyze-batch (call-centre uploads).
+
+Texts are scored for sentiment in chunks of SENTIMENT_BATCH_SIZE with one
+embedding call per chunk (see ai_services.analyze_sentiments), and image
+captions are analyzed LLM_BATCH_SIZE at a time in a single completion. Each
+item is yielded as soon as its own work is done, tagged with its input index,
+so a client can render results while the rest of the batch is still running.
+
+Failures stay per item: an invalid text, a provider error or an admission
+rejection only marks the items it affects.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from . import admission
+from .ai_services import (
+    LLM_BATCH_SIZE,
+    MANUAL_REVIEW_ANALYSIS,
+    analyze_images_with_llm,
+    analyze_sentiments,
+    calculate_urgency,
+    describe_image,
+    image_error,
+    providers_for,
+)
+from ..utils.metrics import counter, span
+from ..utils.severity import overall_severity
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "32"))
+CAPTION_WORKERS = int(os.getenv("BATCH_CAPTION_WORKERS", "4"))
+ITEMS_PER_TOKEN = 10  # a batch draws one rate-limit token per this many items
+
+ITEMS = counter("batch_items_total", "Items processed by the batch analysis endpoint", ("result",))
+
+
+def rate_limit_cost(count: int) -> float:
+    return min(admission.RATE_LIMIT_BURST, -(-count // ITEMS_PER_TOKEN))
+
+
+class _Item:
+    __slots__ = ("index", "text", "images", "urgency", "text_analysis", "image_analyses", "open_images")
+
+    def __init__(self, index: int, text: str, images: Optional[List[str]]):
+        self.index = index
+        self.text = text
+        self.images = images or []
+        self.urgency = calculate_urgency(text)
+        self.text_analysis: Optional[Dict[str, Any]] = None
+        self.image_analyses: List[Optional[Dict[str, Any]]] = [None] * len(self.images)
+        self.open_images = len(self.images)
+
+    @property
+    def done(self) -> bool:
+        return self.text_analysis is not None and self.open_images == 0
+
+    def result(self) -> Dict[str, Any]:
+        self.text_analysis["urgency_score"] = self.urgency
+        return {
+            "index": self.index,
+            "text_analysis": self.text_analysis,
+            "image_analyses": self.image_analyses,
+            "overall_urgency": self.urgency,
+            "overall_severity": overall_severity(img.get("severity") for img in self.image_analyses),
+        }
+
+
+def _score_sentiments(chunk: List[_Item]):
+    try:
+        with admission.admit_blocking(providers_for(), urgency=max(item.urgency for item in chunk)):
+            with span("batch.sentiment"):
+                results = analyze_sentiments([item.text for item in chunk])
+    except admission.Rejected as e:
+        results = [{"error": e.detail, "sentiment": "neutral", "confidence": 0.0} for _ in chunk]
+    for item, result in zip(chunk, results):
+        item.text_analysis = result
+
+
+def _analyze_images(window: List[Tuple[_Item, int]], pool: ThreadPoolExecutor):
+    """Caption a window of images in parallel, then analyze all captions in one LLM call."""
+    def caption(entry):
+        item, image_index = entry
+        with admission.admit_blocking(providers_for(), urgency=item.urgency):
+            return describe_image(item.images[image_index], item.text)
+
+    descriptions: List[Optional[str]] = []
+    for entry, future in [(entry, pool.submit(caption, entry)) for entry in window]:
+        try:
+            descriptions.append(future.result())
+        except admission.Rejected as e:
+            item, image_index = entry
+            item.image_analyses[image_index] = image_error(image_index, e.detail)
+            descriptions.append(None)
+        except Exception as e:
+            item, image_index = entry
+            item.image_analyses[image_index] = image_error(image_index, str(e))
+            descriptions.append(None)
+
+    to_llm = [(entry, description) for entry, description in zip(window, descriptions)
+              if description is not None]
+    analyses: List[Dict[str, Any]] = []
+    if to_llm:
+        urgency = max(item.urgency for (item, _), _ in to_llm)
+        try:
+            with admission.admit_blocking(["groq"], urgency=urgency):
+                with span("batch.image_llm"):
+                    analyses = analyze_images_with_llm([(d, item.text) for (item, _), d in to_llm])
+        except admission.Rejected as e:
+            analyses = [image_error(image_index, e.detail) for (_, image_index), _ in to_llm]
+    for ((item, image_index), _), analysis in zip(to_llm, analyses):
+        analysis["image_index"] = image_index
+        item.image_analyses[image_index] = analysis
+
+    for item, image_index in window:
+        if item.image_analyses[image_index] is None:
+            item.image_analyses[image_index] = dict(MANUAL_REVIEW_ANALYSIS, image_index=image_index)
+        item.open_images -= 1
+
+
+def analyze_batch(entries: List[Tuple[str, Optional[List[str]]]]) -> Iterator[Dict[str, Any]]:
+    """Yield one result per (text, images) entry as it completes, then a summary."""
+    items: List[_Item] = []
+    failed = 0
+    for index, (text, images) in enumerate(entries):
+        if not text or len(text.strip()) < 10:
+            failed += 1
+            ITEMS.inc(result="invalid")
+            yield {"index": index, "error": "Text must be at least 10 characters"}
+        else:
+            items.append(_Item(index, text, images))
+
+    def finished(candidates):
+        for item in candidates:
+            if item.done:
+                ITEMS.inc(result="ok")
+                yield item.result()
+
+    for start in range(0, len(items), SENTIMENT_BATCH_SIZE):
+        chunk = items[start:start + SENTIMENT_BATCH_SIZE]
+        _score_sentiments(chunk)
+        yield from finished(item for item in chunk if not item.images)
+
+    pending = [(item, i) for item in items for i in range(len(item.images))]
+    if pending:
+        with ThreadPoolExecutor(max_workers=CAPTION_WORKERS) as pool:
+            for start in range(0, len(pending), LLM_BATCH_SIZE):
+                window = pending[start:start + LLM_BATCH_SIZE]
+                _analyze_images(window, pool)
+                yield from finished({id(item): item for item, _ in window}.values())
+
+    yield {"summary": {"items": len(entries), "analyzed": len(items), "invalid": failed}}
+
+
+def ndjson(results: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    for result in results:
+        yield orjson.dumps(result) + b"\n"
@@ -0,0 +1,315 @@
+"""
+Grievance change feed for live dashboards.
+
+Every ORM flush that creates, updates or deletes a grievance also inserts a
+ChangeLog row in the same transaction, so the log can never disagree with
+the data. Clients sync incrementally with `GET /api/grievances/changes?since=<seq>`
+or stay connected to the SSE stream: one poller per process reads new log
+rows and fans them out to all connected streams, so N dashboards cost one
+small indexed query per change instead of N full list reads per refresh.
+
+A `since` cursor is only safe if seq order is commit order: otherwise a
+transaction holding a lower seq could commit after a reader has moved past
+it, and that change would be skipped (and the head seq behind the dashboard
+ETags would not move). SQLite allows one writer at a time, which gives this
+for free. On PostgreSQL, a transaction that logs a change first takes a
+transaction-level advisory lock, so change-logging transactions commit one
+at a time just as on SQLite. Other databases are refused when a change is
+logged.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+import orjson
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.orm import Session
+
+from ..database import PerTenant, SessionLocal, current_tenant
+from ..models import ChangeLog, Grievance
+from ..utils.metrics import counter, gauge
+
+POLL_INTERVAL = float(os.getenv("CHANGEFEED_POLL_INTERVAL", "1.0"))
+HEARTBEAT_INTERVAL = float(os.getenv("CHANGEFEED_HEARTBEAT_INTERVAL", "15"))
+QUEUE_SIZE = int(os.getenv("CHANGEFEED_QUEUE_SIZE", "1000"))
+PAGE_SIZE = 500
+WRITER_LOCK_KEY = 0x6772766C  # PostgreSQL advisory lock serializing change log writers
+
+# Fields a dashboard needs to update a row and its counters without refetching
+SUMMARY_FIELDS = (
+    "id", "ticket_id", "title", "category", "location", "status", "priority", "department",
+    "urgency_score", "overall_severity", "cluster_id", "created_at",
+)
+IGNORED_FIELDS = {"version"}
+
+CHANGES_WRITTEN = counter("changefeed_changes_total", "Grievance changes written to the change log", ("op",))
+CHANGES_SENT = counter("changefeed_events_sent_total", "Change events delivered to stream subscribers")
+DROPPED = counter("changefeed_subscribers_dropped_total", "Streams closed because the client fell behind")
+
+logger = logging.getLogger(__name__)
+
+
+def _summary(grievance: Grievance) -> Dict[str, object]:
+    return {field: getattr(grievance, field) for field in SUMMARY_FIELDS}
+
+
+def _lock_writers(session: Session):
+    """Hold the change log write lock until this transaction ends, so seq order is commit order."""
+    if session.info.get("changefeed_locked"):
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": WRITER_LOCK_KEY})
+    elif dialect != "sqlite":
+        raise RuntimeError(f"The change feed needs SQLite or PostgreSQL to keep seq order in commit order, "
+                           f"not {dialect}")
+    session.info["changefeed_locked"] = True
+
+
+def _record(session: Session, grievance: Grievance, op: str, changed: Optional[dict] = None):
+    _lock_writers(session)
+    data = {"grievance": _summary(grievance)}
+    if changed is not None:
+        data["changed"] = sorted(changed)
+        # Old values only for summary fields, so counters can move a row between buckets
+        data["previous"] = {k: v for k, v in changed.items() if k in SUMMARY_FIELDS}
+    session.add(ChangeLog(grievance_id=grievance.id, op=op, data=orjson.dumps(data).decode()))
+    session.info["changefeed_pending"] = True
+    CHANGES_WRITTEN.inc(op=op)
+
+
+def record_delete(session: Session, grievance: Grievance):
+    """
+    Log the delete of a grievance the flush hook cannot see because it is no
+    longer in the hot table (archive.delete); it is published on commit.
+    """
+    _record(session, grievance, "delete")
+
+
+@event.listens_for(Session, "before_flush")
+def _log_changes(session, flush_context, instances):
+    # services/archive.py labels the rows it moves: "archive" instead of delete, "restore" instead of create
+    moved = session.info.get("grievance_move")
+    for obj in list(session.new):
+        if isinstance(obj, Grievance):
+            if obj.created_at is None:
+                obj.created_at = datetime.utcnow()
+            _record(session, obj, "restore" if moved == "restore" else "create")
+
+    for obj in list(session.dirty):
+        if not isinstance(obj, Grievance) or not session.is_modified(obj, include_collections=False):
+            continue
+        state = inspect(obj)
+        changed = {}
+        for attr in state.mapper.column_attrs:
+            if attr.key in IGNORED_FIELDS:
+                continue
+            history = state.attrs[attr.key].history
+            if history.has_changes():
+                changed[attr.key] = history.deleted[0] if history.deleted else None
+        if changed:
+            _record(session, obj, "update", changed)
+
+    for obj in list(session.deleted):
+        if isinstance(obj, Grievance):
+            _record(session, obj, "archive" if moved == "archive" else "delete")
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_feed(session):
+    session.info.pop("changefeed_locked", None)
+    if session.info.pop("changefeed_pending", False):
+        change_feeds.get(session.info.get("tenant")).notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("changefeed_locked", None)
+    session.info.pop("changefeed_pending", None)
+
+
+def _as_event(row: ChangeLog) -> Dict[str, object]:
+    data = orjson.loads(row.data) if row.data else {}
+    return {
+        "seq": row.seq,
+        "op": row.op,
+        "grievance_id": row.grievance_id,
+        "changed_at": row.changed_at.isoformat() if row.changed_at else None,
+        **data,
+    }
+
+
+def read_changes(db: Session, since: int, limit: int = PAGE_SIZE) -> List[Dict[str, object]]:
+    rows = (
+        db.query(ChangeLog)
+        .filter(ChangeLog.seq > since)
+        .order_by(ChangeLog.seq)
+        .limit(limit)
+        .all()
+    )
+    return [_as_event(row) for row in rows]
+
+
+def head_seq(db: Session) -> int:
+    return db.query(func.max(ChangeLog.seq)).scalar() or 0
+
+
+def _read_changes_blocking(since: int, limit: int = PAGE_SIZE) -> List[Dict[str, object]]:
+    db = SessionLocal()
+    try:
+        return read_changes(db, since, limit)
+    finally:
+        db.close()
+
+
+def _head_seq_blocking() -> int:
+    db = SessionLocal()
+    try:
+        return head_seq(db)
+    finally:
+        db.close()
+
+
+CLOSED = object()  # queued to a subscriber whose stream should end
+
+
+class ChangeFeed:
+    """One poller per process and tenant, fanning change events out to subscriber queues."""
+
+    def __init__(self, tenant: Optional[str] = None, poll_interval: float = POLL_INTERVAL,
+                 queue_size: int = QUEUE_SIZE):
+        self.tenant = tenant
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.last_seq = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(self) -> asyncio.Queue:
+        """
+        Register a stream. Returns once the poller has fixed its starting seq,
+        so a catch-up read made afterwards cannot leave a gap before live events.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake, self._ready = asyncio.Event(), asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def notify(self):
+        """Wake the poller now instead of at the next interval. Safe from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+
+    def close(self):
+        """End every open stream (on shutdown)."""
+        for queue in list(self._subscribers):
+            self._drop(queue)
+
+    def _drop(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(CLOSED)
+
+    def _publish(self, change: Dict[str, object]):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(change)
+                CHANGES_SENT.inc()
+            except asyncio.QueueFull:
+                # The client reconnects with Last-Event-ID and catches up from the log
+                DROPPED.inc()
+                self._drop(queue)
+
+    async def _run(self):
+        current_tenant.set(self.tenant)  # the task's own context: reads below go to this tenant's database
+        try:
+            self.last_seq = await asyncio.to_thread(_head_seq_blocking)
+            self._ready.set()
+            while self._subscribers:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    changes = await asyncio.to_thread(_read_changes_blocking, self.last_seq)
+                except Exception as e:
+                    logger.warning("Change feed poll failed: %s", e)
+                    continue
+                for change in changes:
+                    self._publish(change)
+                    self.last_seq = change["seq"]
+                if len(changes) == PAGE_SIZE:
+                    self._wake.set()
+        except Exception as e:
+            logger.warning("Change feed stopped: %s", e)
+            self.close()
+        finally:
+            self._ready.set()
+
+
+change_feeds: PerTenant[ChangeFeed] = PerTenant(ChangeFeed)
+gauge("changefeed_subscribers", "Connected change stream clients").set_function(
+    lambda: sum(feed.subscriber_count for feed in change_feeds.created().values()))
+
+
+def close_all():
+    """End every open stream of every tenant (on shutdown)."""
+    for feed in change_feeds.created().values():
+        feed.close()
+
+
+def format_event(change: Dict[str, object]) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (change["seq"], orjson.dumps(change))
+
+
+async def stream_changes(since: Optional[int]):
+    """SSE body: replay the log after `since`, then push live changes with heartbeats."""
+    change_feed = change_feeds.current()
+    queue = await change_feed.subscribe()
+    try:
+        last = change_feed.last_seq if since is None else since
+        while since is not None:
+            changes = await asyncio.to_thread(_read_changes_blocking, last)
+            for change in changes:
+                yield format_event(change)
+                last = change["seq"]
+            if len(changes) < PAGE_SIZE:
+                break
+        yield b"retry: 3000\nevent: ready\ndata: %s\n\n" % orjson.dumps({"seq": last})
+
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if change is CLOSED:
+                break
+            if change["seq"] <= last:
+                continue
+            yield format_event(change)
+            last = change["seq"]
+    finally:
+        change_feed.unsubscribe(queue)
@@ -0,0 +1,165 @@
+"""
+Local category classifier for grievances.
+
+Hashed TF-IDF features (word unigrams and bigrams) feed a multinomial
+logistic regression. The whole model is a few NumPy arrays stored in an
+.npz file, so prediction is a sparse dot product with no network call.
+Train or retrain it with `python -m app.scripts.train_classifier train`.
+"""
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils.departments import CATEGORY_DEPARTMENTS, DEFAULT_DEPARTMENT
+from .dedup import normalize_tokens
+from ..utils.metrics import span
+
+MODEL_PATH = os.getenv(
+    "CLASSIFIER_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "category_model.npz"),
+)
+MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.5"))
+N_FEATURES = 1 << 13
+
+
+def hashed_terms(text: str, n_features: int = N_FEATURES) -> Dict[int, float]:
+    """Sublinear term frequencies of hashed unigrams and bigrams."""
+    tokens = normalize_tokens(text)
+    counts: Dict[int, float] = {}
+    for term in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        index = zlib.crc32(term.encode("utf-8")) % n_features
+        counts[index] = counts.get(index, 0.0) + 1.0
+    return {i: 1.0 + np.log(c) for i, c in counts.items()}
+
+
+class CategoryClassifier:
+    """Multinomial logistic regression over hashed TF-IDF features."""
+
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray, idf: np.ndarray):
+        self.labels = list(labels)
+        self.weights = weights  # (n_labels, n_features)
+        self.bias = bias        # (n_labels,)
+        self.idf = idf          # (n_features,)
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        terms = hashed_terms(text, len(self.idf))
+        if not terms:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter(terms.keys(), dtype=np.int64, count=len(terms))
+        values = np.fromiter(terms.values(), dtype=np.float32, count=len(terms)) * self.idf[indices]
+        return indices, values / (np.linalg.norm(values) or 1.0)
+
+    def _dense(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), len(self.idf)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, values = self._vectorize(text)
+            matrix[row, indices] = values
+        return matrix
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        indices, values = self._vectorize(text)
+        logits = self.weights[:, indices] @ values + self.bias
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probabilities = self.predict_proba(text)
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    def predict_batch(self, texts: Sequence[str], batch_size: int = 1024) -> List[Tuple[str, float]]:
+        results = []
+        for start in range(0, len(texts), batch_size):
+            logits = self._dense(texts[start:start + batch_size]) @ self.weights.T + self.bias
+            logits -= logits.max(axis=1, keepdims=True)
+            probabilities = np.exp(logits)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            best = probabilities.argmax(axis=1)
+            results.extend(
+                (self.labels[b], float(probabilities[i, b])) for i, b in enumerate(best)
+            )
+        return results
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], epochs: int = 20,
+              learning_rate: float = 10.0, l2: float = 1e-4, batch_size: int = 256,
+              n_features: int = N_FEATURES, seed: int = 0) -> "CategoryClassifier":
+        """Fit with mini-batch gradient descent on the softmax cross-entropy."""
+        label_names = sorted(set(labels))
+        y = np.array([label_names.index(label) for label in labels])
+
+        document_frequency = np.zeros(n_features, dtype=np.float32)
+        for text in texts:
+            document_frequency[list(hashed_terms(text, n_features))] += 1
+        idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        model = cls(label_names, np.zeros((len(label_names), n_features), dtype=np.float32),
+                    np.zeros(len(label_names), dtype=np.float32), idf)
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                x = model._dense([texts[i] for i in batch])
+                logits = x @ model.weights.T + model.bias
+                logits -= logits.max(axis=1, keepdims=True)
+                probabilities = np.exp(logits)
+                probabilities /= probabilities.sum(axis=1, keepdims=True)
+                probabilities[np.arange(len(batch)), y[batch]] -= 1.0
+                grad_w = probabilities.T @ x / len(batch) + l2 * model.weights
+                grad_b = probabilities.mean(axis=0)
+                model.weights -= learning_rate * grad_w
+                model.bias -= learning_rate * grad_b
+        return model
+
+    def save(self, path: str = MODEL_PATH):
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, labels=np.array(self.labels, dtype=str),
+                            weights=self.weights.astype(np.float32),
+                            bias=self.bias.astype(np.float32), idf=self.idf.astype(np.float32))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "CategoryClassifier":
+        with np.load(path) as data:
+            return cls([str(label) for label in data["labels"]], data["weights"],
+                       data["bias"], data["idf"])
+
+
+_classifier: Optional[CategoryClassifier] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_classifier() -> Optional[CategoryClassifier]:
+    """Load the trained model once; None if no model has been trained yet."""
+    global _classifier, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                if os.path.exists(MODEL_PATH):
+                    _classifier = CategoryClassifier.load(MODEL_PATH)
+                _loaded = True
+    return _classifier
+
+
+def predict_category(text: str, min_confidence: float = MIN_CONFIDENCE) -> Optional[Dict[str, object]]:
+    """
+    Predict category and department for a grievance text.
+    Returns None when no model is available or the prediction is not confident enough.
+    """
+    classifier = get_classifier()
+    if classifier is None:
+        return None
+    with span("classifier"):
+        category, confidence = classifier.predict(text)
+    if confidence < min_confidence:
+        return None
+    return {
+        "category": category,
+        "department": CATEGORY_DEPARTMENTS.get(category, DEFAULT_DEPARTMENT),
+        "confidence": round(confidence, 3),
+    }
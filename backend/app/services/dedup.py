@@ -0,0 +1,269 @@
+"""
+Near-duplicate grievance detection.
+
+Each grievance is reduced to a MinHash signature over its normalized
+description and location. Signatures are banded into an in-memory LSH index
+so that a new submission can be checked against every stored grievance with
+a handful of dictionary lookups instead of a table scan.
+
+Only open grievances from the last DEDUP_WINDOW_DAYS can be duplicated, so
+only those are indexed: entries are dropped as they age out of the window,
+and as soon as a lookup finds their cluster resolved. The index is built once
+per process and then topped up every DEDUP_REFRESH_SECONDS with grievances
+created since, which picks up rows written by other workers and by
+/grievances/submit.
+"""
+import heapq
+import os
+import re
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+
+from ..database import PerTenant
+from ..models import Grievance
+from ..utils.metrics import span
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows per band
+ROWS_PER_BAND = NUM_PERM // BANDS
+DUPLICATE_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DEDUP_WINDOW_DAYS", "7"))
+DEDUP_REFRESH_SECONDS = float(os.getenv("DEDUP_REFRESH_SECONDS", "5"))
+REFRESH_OVERLAP = timedelta(seconds=60)  # re-read recent rows so ones committed late are not missed
+REUSE_ANALYSIS = os.getenv("DEDUP_REUSE_ANALYSIS", "false").lower() in ("1", "true", "yes")
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_rng = random.Random(2024)  # fixed seed so signatures stay stable across restarts
+# a, b < 2**32 and crc32 < 2**32, so a * h + b fits in uint64 without wrapping
+_PERMUTATIONS = np.array(
+    [(_rng.randint(1, _MAX_HASH), _rng.randint(0, _MAX_HASH)) for _ in range(NUM_PERM)],
+    dtype=np.uint64,
+)
+_A, _B = _PERMUTATIONS[:, :1], _PERMUTATIONS[:, 1:]
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "of", "in", "on",
+    "at", "to", "for", "and", "or", "it", "this", "that", "there", "here", "my",
+    "our", "we", "i", "me", "please", "has", "have", "had", "from", "with", "near",
+}
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Lowercase, strip punctuation and drop stopwords."""
+    words = re.sub(r"[^a-z0-9\u0900-\u097f]+", " ", (text or "").lower()).split()
+    return [w for w in words if w not in STOPWORDS]
+
+
+def shingles(description: str, location: str) -> Set[str]:
+    """Word unigrams and bigrams of the description plus location tokens."""
+    tokens = normalize_tokens(description)
+    result = set(tokens)
+    result.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    result.update(f"loc:{t}" for t in normalize_tokens(location))
+    return result
+
+
+def compute_signature(description: str, location: str) -> Tuple[int, ...]:
+    """MinHash signature of a grievance's description and location."""
+    items = shingles(description, location)
+    if not items:
+        return tuple([_MAX_HASH] * NUM_PERM)
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in items), dtype=np.uint64, count=len(items))
+    # One row per permutation, one column per shingle
+    minima = ((_A * hashes + _B) % np.uint64(_PRIME)).min(axis=1) & np.uint64(_MAX_HASH)
+    return tuple(minima.tolist())
+
+
+def estimate_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _window_start() -> datetime:
+    return datetime.utcnow() - timedelta(days=DUPLICATE_WINDOW_DAYS)
+
+
+def _is_open():
+    return or_(Grievance.status.is_(None), func.lower(Grievance.status) != "resolved")
+
+
+class DuplicateIndex:
+    """Incremental MinHash/LSH index of open, recent grievance signatures."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._buckets: List[Dict[Tuple[int, ...], Set[str]]] = [{} for _ in range(BANDS)]
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._clusters: Dict[str, str] = {}
+        self._created: Dict[str, datetime] = {}
+        self._expiry: List[Tuple[datetime, str]] = []  # heap of (created_at, id), oldest first
+        self._since: Optional[datetime] = None  # the next refresh reads rows created from here on
+        self._refreshed_at = 0.0
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @staticmethod
+    def _bands(signature: Tuple[int, ...]):
+        for band in range(BANDS):
+            start = band * ROWS_PER_BAND
+            yield band, signature[start:start + ROWS_PER_BAND]
+
+    def add(self, grievance_id: str, signature: Tuple[int, ...], cluster_id: Optional[str] = None,
+            created_at: Optional[datetime] = None):
+        with self._lock:
+            self._add(grievance_id, signature, cluster_id, created_at)
+
+    def _add(self, grievance_id, signature, cluster_id, created_at):
+        created_at = created_at or datetime.utcnow()
+        if created_at < _window_start():
+            return
+        self._remove(grievance_id)
+        self._signatures[grievance_id] = signature
+        self._clusters[grievance_id] = cluster_id or grievance_id
+        self._created[grievance_id] = created_at
+        heapq.heappush(self._expiry, (created_at, grievance_id))
+        for band, key in self._bands(signature):
+            self._buckets[band].setdefault(key, set()).add(grievance_id)
+
+    def remove(self, grievance_id: str):
+        with self._lock:
+            self._remove(grievance_id)
+
+    def _remove(self, grievance_id):
+        signature = self._signatures.pop(grievance_id, None)
+        self._clusters.pop(grievance_id, None)
+        self._created.pop(grievance_id, None)
+        if signature is None:
+            return
+        for band, key in self._bands(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                bucket.discard(grievance_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def _prune(self):
+        """Drop entries that have aged out of the duplicate window."""
+        cutoff = _window_start()
+        while self._expiry and self._expiry[0][0] < cutoff:
+            created_at, grievance_id = heapq.heappop(self._expiry)
+            if self._created.get(grievance_id) == created_at:
+                self._remove(grievance_id)
+
+    def set_cluster(self, grievance_id: str, cluster_id: str):
+        with self._lock:
+            if grievance_id in self._signatures:
+                self._clusters[grievance_id] = cluster_id
+
+    def cluster_of(self, grievance_id: str) -> Optional[str]:
+        return self._clusters.get(grievance_id)
+
+    def query(self, signature: Tuple[int, ...], threshold: float = DUPLICATE_THRESHOLD) -> List[Tuple[str, float]]:
+        """Return (grievance_id, similarity) pairs above threshold, best first."""
+        with self._lock:
+            self._prune()
+            candidates: Set[str] = set()
+            for band, key in self._bands(signature):
+                bucket = self._buckets[band].get(key)
+                if bucket:
+                    candidates.update(bucket)
+            matches = []
+            for grievance_id in candidates:
+                similarity = estimate_similarity(signature, self._signatures[grievance_id])
+                if similarity >= threshold:
+                    matches.append((grievance_id, similarity))
+        matches.sort(key=lambda m: m[1], reverse=True)
+        return matches
+
+    @staticmethod
+    def _rows(db, since: datetime):
+        return db.query(
+            Grievance.id, Grievance.description_text, Grievance.location, Grievance.cluster_id, Grievance.created_at
+        ).filter(_is_open(), Grievance.created_at >= since)
+
+    def load(self, db):
+        """Build the index from the open grievances in the window (once per process)."""
+        with self._lock:
+            if self.loaded:
+                return
+            started = datetime.utcnow()
+            for grievance_id, description, location, cluster_id, created_at in \
+                    self._rows(db, _window_start()).yield_per(1000):
+                self._add(grievance_id, compute_signature(description, location), cluster_id, created_at)
+            self._since = started - REFRESH_OVERLAP
+            self._refreshed_at = time.monotonic()
+            self.loaded = True
+
+    def refresh(self, db):
+        """Index grievances created since the last load or refresh, at most every DEDUP_REFRESH_SECONDS."""
+        if time.monotonic() - self._refreshed_at < DEDUP_REFRESH_SECONDS:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # another request is already refreshing
+        try:
+            started = datetime.utcnow()
+            rows = [row for row in self._rows(db, max(self._since, _window_start()))
+                    if row.id not in self._signatures]
+            signed = [(row.id, compute_signature(row.description_text, row.location), row.cluster_id, row.created_at)
+                      for row in rows]
+            with self._lock:
+                for grievance_id, signature, cluster_id, created_at in signed:
+                    if grievance_id not in self._signatures:
+                        self._add(grievance_id, signature, cluster_id, created_at)
+            self._since = started - REFRESH_OVERLAP
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+
+duplicate_indexes: PerTenant[DuplicateIndex] = PerTenant(lambda tenant: DuplicateIndex())
+
+
+def find_duplicate(db, description: str, location: str):
+    """
+    Look for an open grievance that the new submission duplicates.
+    Returns (signature, head_grievance, similarity); head is None when no duplicate is found.
+    """
+    duplicate_index = duplicate_indexes.of(db)
+    if not duplicate_index.loaded:
+        duplicate_index.load(db)
+    else:
+        duplicate_index.refresh(db)
+
+    with span("dedup.lookup"):
+        signature = compute_signature(description, location)
+        matches = duplicate_index.query(signature)
+    if not matches:
+        return signature, None, 0.0
+
+    head_ids = {grievance_id: duplicate_index.cluster_of(grievance_id) or grievance_id for grievance_id, _ in matches}
+    heads = {
+        head.id: head
+        for head in db.query(Grievance).filter(
+            Grievance.id.in_(set(head_ids.values())),
+            _is_open(),
+            or_(Grievance.created_at.is_(None), Grievance.created_at >= _window_start()),
+        )
+    }
+    # Candidates whose cluster is resolved or out of the window can never match again
+    for grievance_id, head_id in head_ids.items():
+        if head_id not in heads:
+            duplicate_index.remove(grievance_id)
+
+    for grievance_id, similarity in matches:
+        head = heads.get(head_ids[grievance_id])
+        if head is not None:
+            return signature, head, similarity
+    return signature, None, 0.0
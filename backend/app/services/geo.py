@@ -0,0 +1,160 @@
+"""
+Location normalization and geohash helpers.
+
+Free-text grievance locations ("Sector 12", "Near Hospital", or the
+"lat, lng" / address strings produced by the frontend map picker) are
+resolved to coordinates with an offline gazetteer and encoded as a geohash.
+Geohash prefixes are grid cells, so range queries on the indexed geohash
+column answer "how many complaints in this cell/viewport" without a scan.
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "gazetteer.json"),
+)
+GEOHASH_PRECISION = 9  # ~5m cells; coarser cells are prefixes of this
+MAX_COVERING_CELLS = 64
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+_COORDINATES = re.compile(r"(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)")
+
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Return (south, west, north, east) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    south, west, north, east = geohash_bounds(geohash)
+    return (south + north) / 2, (west + east) / 2
+
+
+def covering_cells(south: float, west: float, north: float, east: float, precision: int) -> List[str]:
+    """
+    Geohash cells covering a bounding box. Falls back to coarser cells if the box
+    would need more than MAX_COVERING_CELLS at the requested precision.
+    """
+    while precision > 1:
+        s, w, n, e = geohash_bounds(geohash_encode(south, west, precision))
+        lat_step, lng_step = n - s, e - w
+        rows = int((north - s) / lat_step) + 1
+        cols = int((east - w) / lng_step) + 1
+        if rows * cols <= MAX_COVERING_CELLS:
+            break
+        precision -= 1
+
+    s, w, n, e = geohash_bounds(geohash_encode(south, west, precision))
+    lat_step, lng_step = n - s, e - w
+    cells = []
+    lat = s + lat_step / 2
+    while lat - lat_step / 2 <= north:
+        lng = w + lng_step / 2
+        while lng - lng_step / 2 <= east:
+            cells.append(geohash_encode(min(lat, 90.0), min(lng, 180.0), precision))
+            lng += lng_step
+        lat += lat_step
+    return sorted(set(cells))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+
+
+class Gazetteer:
+    """Offline place-name lookup loaded from a JSON file of {name, aliases, lat, lng}."""
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._names: Optional[Dict[str, Tuple[float, float]]] = None
+        self._by_length: List[str] = []
+
+    def load(self):
+        with self._lock:
+            if self._names is not None:
+                return
+            names = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    for place in json.load(f):
+                        point = (float(place["lat"]), float(place["lng"]))
+                        for name in [place["name"]] + place.get("aliases", []):
+                            names[_normalize(name)] = point
+            # Longest names first so "sector 12" wins over "sector 1"
+            self._by_length = sorted(names, key=len, reverse=True)
+            self._names = names
+
+    def lookup(self, text: str) -> Optional[Tuple[float, float]]:
+        if self._names is None:
+            self.load()
+        normalized = _normalize(text)
+        if not normalized:
+            return None
+        if normalized in self._names:
+            return self._names[normalized]
+        padded = f" {normalized} "
+        for name in self._by_length:
+            if f" {name} " in padded:
+                return self._names[name]
+        return None
+
+
+gazetteer = Gazetteer()
+
+
+def normalize_location(text: str) -> Optional[Dict[str, object]]:
+    """
+    Resolve a free-text location to coordinates and a geohash.
+    Explicit "lat, lng" coordinates take precedence over gazetteer names.
+    """
+    match = _COORDINATES.search(text or "")
+    if match:
+        lat, lng = float(match.group(1)), float(match.group(2))
+        if -90 <= lat <= 90 and -180 <= lng <= 180:
+            return {"latitude": lat, "longitude": lng,
+                    "geohash": geohash_encode(lat, lng), "source": "coordinates"}
+
+    point = gazetteer.lookup(text)
+    if point:
+        lat, lng = point
+        return {"latitude": lat, "longitude": lng,
+                "geohash": geohash_encode(lat, lng), "source": "gazetteer"}
+    return None
@@ -0,0 +1,189 @@
+"""
+Idempotency-Key support for POST /api/grievances.
+
+Mobile clients time out while the AI analysis runs and retry; without this
+every retry would create another citizen and grievance and pay for the
+analysis again. The first request with a key claims it by inserting an
+in_progress row (the primary key makes the claim atomic, across workers
+too) and runs normally; its response is stored on the row. Then:
+
+- A retry after completion replays the stored response (with
+  Idempotent-Replayed: true) without running anything.
+- A retry while the original is still running waits for it, on an
+  in-process event when the original runs in the same worker, otherwise by
+  polling the row, and replays its response. If it is still running after
+  IDEMPOTENCY_WAIT_SECONDS the retry gets 409 with Retry-After. The wait is
+  on the event loop, so waiting retries hold no threadpool threads; only the
+  short database calls run there.
+- If the original fails, its claim is released so a retry runs afresh. If
+  its worker dies, the claim's lease (IDEMPOTENCY_LOCK_SECONDS) runs out
+  and the next retry takes over.
+- Reusing a key with a different body is an error (422).
+
+Keys are kept for IDEMPOTENCY_TTL_SECONDS; expired rows are swept now and
+then by the claims themselves.
+"""
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import IdempotencyKey
+from ..utils.metrics import counter
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "25"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+MAX_KEY_LENGTH = 255
+CLEANUP_EVERY = 500  # claims between sweeps of expired keys
+POLL_INTERVALS = (0.05, 0.1, 0.25, 0.5, 1.0)  # waiting on another worker, then every second
+
+IN_PROGRESS, COMPLETED = "in_progress", "completed"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+REQUESTS = counter("idempotency_requests_total", "Requests with an Idempotency-Key by outcome", ("result",))
+
+logger = logging.getLogger(__name__)
+
+_inflight: Dict[Tuple[Optional[str], str], anyio.Event] = {}  # (tenant, key) -> set when its owner finishes
+_claims = 0
+
+
+def fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def _claim(engine, key: str, digest: str, now: datetime):
+    """True if this request now owns the key, None to try again, else the existing row."""
+    global _claims
+    _claims += 1
+    if _claims % CLEANUP_EVERY == 0:
+        with engine.begin() as conn:
+            conn.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+    lease = {
+        "fingerprint": digest, "state": IN_PROGRESS, "created_at": now,
+        "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+        "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+    }
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(IdempotencyKey).values(key=key, **lease))
+        return True
+    except IntegrityError:
+        pass
+
+    with engine.begin() as conn:
+        row = conn.execute(select(IdempotencyKey.__table__).where(IdempotencyKey.key == key)).first()
+        if row is None:
+            return None  # released between the insert and the read
+        if row.expires_at >= now and not (row.state == IN_PROGRESS and row.locked_until < now):
+            return row
+        # Expired key, or an owner that died mid-request: take it over unless another retry just did
+        taken = conn.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key,
+                   or_(IdempotencyKey.expires_at < now,
+                       and_(IdempotencyKey.state == IN_PROGRESS, IdempotencyKey.locked_until < now)))
+            .values(status_code=None, response=None, **lease)
+        ).rowcount
+    if taken:
+        REQUESTS.inc(result="taken_over" if row.state == IN_PROGRESS else "expired")
+        return True
+    return None
+
+
+def _replay(row) -> Response:
+    return Response(bytes(row.response), status_code=row.status_code, media_type="application/json",
+                    headers={REPLAYED_HEADER: "true"})
+
+
+async def _wait(event: Optional[anyio.Event], attempt: int, deadline: float):
+    remaining = max(0.0, deadline - time.monotonic())
+    if event is not None:
+        with anyio.move_on_after(remaining):
+            await event.wait()
+    else:
+        await anyio.sleep(min(POLL_INTERVALS[min(attempt, len(POLL_INTERVALS) - 1)], remaining))
+
+
+def _store(engine, key: str, response: JSONResponse):
+    with engine.begin() as conn:
+        conn.execute(
+            update(IdempotencyKey).where(IdempotencyKey.key == key)
+            .values(state=COMPLETED, status_code=response.status_code, response=bytes(response.body),
+                    locked_until=None)
+        )
+
+
+def _release(engine, key: str):
+    try:
+        with engine.begin() as conn:
+            conn.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key,
+                                                      IdempotencyKey.state == IN_PROGRESS))
+    except Exception as e:
+        logger.warning("Could not release Idempotency-Key %s: %s", key, e)
+
+
+async def execute(db: Session, key: str, body: bytes, handler: Callable[[], Awaitable[object]]):
+    """
+    Run handler() at most once per key and return its response, or replay /
+    wait for the response of the request that already holds the key.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    engine = db.get_bind()
+    digest = fingerprint(body)
+    slot = (db.info.get("tenant"), key)
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    attached = False
+
+    attempt = 0
+    while True:
+        claimed = await anyio.to_thread.run_sync(_claim, engine, key, digest, datetime.utcnow())
+        if claimed is True:
+            break
+        if claimed is not None:
+            if claimed.fingerprint != digest:
+                REQUESTS.inc(result="mismatch")
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if claimed.state == COMPLETED:
+                REQUESTS.inc(result="attached" if attached else "replayed")
+                return _replay(claimed)
+            attached = True
+        if time.monotonic() >= deadline:
+            REQUESTS.inc(result="conflict")
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed",
+                                headers={"Retry-After": "5"})
+        await _wait(_inflight.get(slot), attempt, deadline)
+        attempt += 1
+
+    # Only touched from the event loop, so no lock
+    event = _inflight[slot] = anyio.Event()
+    REQUESTS.inc(result="new")
+    completed = False
+    try:
+        result = await handler()
+        response = result if isinstance(result, JSONResponse) else JSONResponse(content=jsonable_encoder(result))
+        if 200 <= response.status_code < 300:
+            await anyio.to_thread.run_sync(_store, engine, key, response)
+            completed = True
+        return response
+    finally:
+        # Shielded: a client that disconnects must not leave the key claimed until its lease runs out
+        with anyio.CancelScope(shield=True):
+            if not completed:
+                # Failed (or rejected by admission control): free the key so a retry runs again
+                await anyio.to_thread.run_sync(_release, engine, key)
+            if _inflight.get(slot) is event:
+                del _inflight[slot]
+            event.set()
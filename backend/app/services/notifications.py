@@ -0,0 +1,367 @@
+"""
+SMS/email notifications to citizens when their grievance changes status.
+
+A before/after_flush hook writes the notification to notification_outbox in
+the same transaction as the status change, so a committed change always has
+its message and a rolled-back one never does. Requests never wait for a
+gateway. Delivery happens later, from a dispatcher thread in each API worker:
+
+- A message waits NOTIFY_COALESCE_SECONDS before its first attempt. Further
+  changes to the same grievance in the meantime update the pending row
+  instead of adding messages, so "in progress" followed quickly by "resolved"
+  reaches the citizen once. A change that ends where the citizen was last
+  told (pending -> in progress -> pending) is skipped.
+- Due messages are claimed in batches with a token and lease (one UPDATE),
+  so several workers can dispatch from the same table, and are handed to the
+  gateway as one batch, outside any database transaction.
+- Failures are retried with jittered exponential backoff up to
+  NOTIFY_MAX_ATTEMPTS, then marked failed.
+- Each tenant's outbox lives in its own database and has its own
+  dispatcher thread; they share one gateway.
+
+The gateway is chosen with NOTIFY_GATEWAY: "log" (default), "file" (JSON
+lines in NOTIFY_FILE_PATH), "none" (keep messages in the outbox), or
+"package.module:Class" for a real SMS/email provider.
+"""
+import importlib
+import itertools
+import logging
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import orjson
+from sqlalchemy import event, func, inspect, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..database import DB_PATH, PerTenant, TENANTS, tenant_engines
+from ..models import Citizen, Grievance, NotificationOutbox
+from ..utils.metrics import counter, gauge, histogram, span
+from .resolution import normalize_status
+
+NOTIFY_GATEWAY = os.getenv("NOTIFY_GATEWAY", "log")
+NOTIFY_FILE_PATH = os.getenv("NOTIFY_FILE_PATH", os.path.join(os.path.dirname(DB_PATH), "notifications.jsonl"))
+NOTIFY_CHANNELS = [c.strip() for c in os.getenv("NOTIFY_CHANNELS", "sms,email").split(",") if c.strip()]
+NOTIFY_COALESCE_SECONDS = float(os.getenv("NOTIFY_COALESCE_SECONDS", "30"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "100"))
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "5"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "5"))
+NOTIFY_RETRY_MAX_SECONDS = float(os.getenv("NOTIFY_RETRY_MAX_SECONDS", "900"))
+CLAIM_SECONDS = 120  # a worker that dies mid-batch releases its claim after this
+
+PENDING, SENT, SKIPPED, FAILED = "pending", "sent", "skipped", "failed"
+CONTACT_FIELDS = {"sms": "phone_number", "email": "email"}
+LAG_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0, 4 * 3600.0)
+
+ENQUEUED = counter("notifications_enqueued_total", "Notifications written to the outbox", ("channel",))
+COALESCED = counter("notifications_coalesced_total", "Status changes merged into an already pending notification", ("channel",))
+DELIVERIES = counter("notifications_total", "Notification delivery attempts by outcome", ("channel", "result"))
+LAG = histogram("notification_lag_seconds", "Time from the first status change to delivery", ("channel",), buckets=LAG_BUCKETS)
+PENDING_COUNT = gauge("notifications_pending", "Notifications waiting in the outbox", ("tenant",))
+OLDEST_PENDING = gauge("notifications_oldest_pending_seconds", "Age of the oldest undelivered notification", ("tenant",))
+
+logger = logging.getLogger(__name__)
+
+
+# ---- Outbox writes (same transaction as the status change) ----
+
+@event.listens_for(Session, "before_flush")
+def _collect_status_changes(session, flush_context, instances):
+    for obj in list(session.dirty):
+        if not isinstance(obj, Grievance):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        previous = normalize_status(history.deleted[0] if history.deleted else None)
+        status = normalize_status(obj.status)
+        if status and previous != status:
+            session.info.setdefault("notifications", []).append((obj.id, obj.citizen_id, previous, status))
+
+
+@event.listens_for(Session, "after_flush")
+def _write_outbox(session, flush_context):
+    changes = session.info.pop("notifications", None)
+    if not changes or not NOTIFY_CHANNELS:
+        return
+    connection = session.connection()
+    now = datetime.utcnow()
+    for grievance_id, citizen_id, previous, status in changes:
+        contact = connection.execute(
+            select(Citizen.phone_number, Citizen.email).where(Citizen.id == citizen_id)
+        ).first()
+        for channel in NOTIFY_CHANNELS:
+            field = CONTACT_FIELDS.get(channel)
+            if contact is None or field is None or not getattr(contact, field):
+                continue
+            merged = connection.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.grievance_id == grievance_id, NotificationOutbox.channel == channel,
+                       NotificationOutbox.state == PENDING)
+                .values(status=status, changes=NotificationOutbox.changes + 1)
+            ).rowcount
+            if merged:
+                COALESCED.inc(channel=channel)
+                continue
+            connection.execute(insert(NotificationOutbox).values(
+                grievance_id=grievance_id, channel=channel, state=PENDING, previous_status=previous,
+                status=status, changes=1, created_at=now,
+                available_at=now + timedelta(seconds=NOTIFY_COALESCE_SECONDS), attempts=0,
+            ))
+            ENQUEUED.inc(channel=channel)
+    session.info["notifications_written"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session):
+    if session.info.pop("notifications_written", False):
+        dispatchers.get(session.info.get("tenant")).notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_notifications(session):
+    session.info.pop("notifications", None)
+    session.info.pop("notifications_written", None)
+
+
+# ---- Gateways ----
+
+class Message:
+    __slots__ = ("outbox_id", "channel", "recipient", "subject", "body")
+
+    def __init__(self, outbox_id: int, channel: str, recipient: str, subject: str, body: str):
+        self.outbox_id = outbox_id
+        self.channel = channel
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+
+    def as_dict(self) -> Dict[str, object]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class Gateway:
+    """Delivers a batch; returns one entry per message: None if delivered, else the error."""
+
+    def send(self, messages: List[Message]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+
+class LogGateway(Gateway):
+    def send(self, messages):
+        for message in messages:
+            # No recipient: logs are not the place for citizens' phone numbers and addresses
+            logger.info("Notify %s (outbox #%d): %s", message.channel, message.outbox_id, message.body)
+        return [None] * len(messages)
+
+
+class FileGateway(Gateway):
+    """Appends one JSON line per message; a local stand-in for an SMS/email provider."""
+
+    def __init__(self, path: str = NOTIFY_FILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, messages):
+        sent_at = datetime.utcnow().isoformat()
+        lines = b"".join(orjson.dumps(dict(m.as_dict(), sent_at=sent_at)) + b"\n" for m in messages)
+        with self._lock, open(self.path, "ab") as out:
+            out.write(lines)
+        return [None] * len(messages)
+
+
+GATEWAYS = {"log": LogGateway, "file": FileGateway}
+
+
+def load_gateway(name: str = NOTIFY_GATEWAY) -> Optional[Gateway]:
+    """A registered gateway name, "module:Class" for a custom one, or None for "none"."""
+    if not name or name == "none":
+        return None
+    if ":" in name:
+        module, _, attribute = name.partition(":")
+        return getattr(importlib.import_module(module), attribute)()
+    return GATEWAYS[name]()
+
+
+def message_text(ticket_id: str, title: Optional[str], status: str):
+    subject = f"Grievance {ticket_id}: {status}"
+    body = f'Your grievance {ticket_id} ("{title or "untitled"}") is now {status}.'
+    return subject, body
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so a gateway outage is not retried in lockstep."""
+    delay = min(NOTIFY_RETRY_MAX_SECONDS, NOTIFY_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+# ---- Dispatcher ----
+
+class Dispatcher:
+    """Background thread that claims due outbox rows in batches and sends them through the gateway."""
+
+    def __init__(self, gateway: Optional[Gateway] = None, batch_size: int = NOTIFY_BATCH_SIZE,
+                 poll_interval: float = NOTIFY_POLL_INTERVAL, tenant: Optional[str] = None):
+        self.tenant = tenant
+        self.engine = tenant_engines.engine(tenant)
+        self.gateway = gateway
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._claims = itertools.count()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def notify(self):
+        self._wake.set()
+
+    def start(self):
+        if self.gateway is None:
+            self.gateway = load_gateway()
+        if self.gateway is None or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        name = "notifications" if self.tenant is None else f"notifications-{self.tenant}"
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                dispatched = self.dispatch_once()
+                self._update_gauges()
+            except Exception as e:
+                logger.warning("Notification dispatch failed: %s", e)
+                dispatched = 0
+            if dispatched < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _update_gauges(self):
+        with self.engine.connect() as conn:
+            count, oldest = conn.execute(
+                select(func.count(), func.min(NotificationOutbox.created_at))
+                .where(NotificationOutbox.state == PENDING)
+            ).one()
+        tenant = self.tenant or "default"
+        PENDING_COUNT.set(count, tenant=tenant)
+        OLDEST_PENDING.set((datetime.utcnow() - oldest).total_seconds() if oldest else 0, tenant=tenant)
+
+    def _claim(self, now: datetime) -> str:
+        token = f"{self.worker_id}:{next(self._claims)}"
+        due = (
+            select(NotificationOutbox.id)
+            .where(NotificationOutbox.state == PENDING, NotificationOutbox.available_at <= now,
+                   or_(NotificationOutbox.claimed_until.is_(None), NotificationOutbox.claimed_until < now))
+            .order_by(NotificationOutbox.available_at)
+            .limit(self.batch_size)
+        )
+        # One statement, so two workers can never claim the same row
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(due))
+                .values(claimed_by=token, claimed_until=now + timedelta(seconds=CLAIM_SECONDS))
+            )
+        return token
+
+    def dispatch_once(self) -> int:
+        """Send one batch of due messages; returns how many outbox rows it handled."""
+        now = datetime.utcnow()
+        token = self._claim(now)
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(NotificationOutbox.id, NotificationOutbox.channel, NotificationOutbox.status,
+                       NotificationOutbox.previous_status, NotificationOutbox.changes,
+                       NotificationOutbox.created_at, NotificationOutbox.attempts,
+                       Grievance.ticket_id, Grievance.title, Citizen.phone_number, Citizen.email)
+                .select_from(NotificationOutbox)
+                .outerjoin(Grievance, Grievance.id == NotificationOutbox.grievance_id)
+                .outerjoin(Citizen, Citizen.id == Grievance.citizen_id)
+                .where(NotificationOutbox.claimed_by == token)
+            ).all()
+        if not rows:
+            return 0
+
+        messages, skipped = [], []
+        for row in rows:
+            recipient = getattr(row, CONTACT_FIELDS.get(row.channel, ""), None) if row.ticket_id else None
+            if row.status == row.previous_status or not recipient:
+                skipped.append(row)
+            else:
+                subject, body = message_text(row.ticket_id, row.title, row.status)
+                messages.append((row, Message(row.id, row.channel, recipient, subject, body)))
+
+        errors: List[Optional[str]] = []
+        if messages:
+            try:
+                with span("notifications.send"):
+                    errors = self.gateway.send([message for _, message in messages])
+            except Exception as e:
+                errors = [str(e) or type(e).__name__] * len(messages)
+
+        finished = datetime.utcnow()
+        with self.engine.begin() as conn:
+            for row in skipped:
+                conn.execute(self._release(row).values(state=SKIPPED))
+                DELIVERIES.inc(channel=row.channel, result=SKIPPED)
+            for (row, _), error in zip(messages, errors):
+                if error is None:
+                    self._mark_sent(conn, row, finished)
+                    continue
+                attempts = row.attempts + 1
+                if attempts >= NOTIFY_MAX_ATTEMPTS:
+                    conn.execute(self._release(row).values(state=FAILED, attempts=attempts, last_error=error))
+                    DELIVERIES.inc(channel=row.channel, result=FAILED)
+                else:
+                    conn.execute(self._release(row).values(
+                        attempts=attempts, last_error=error,
+                        available_at=finished + timedelta(seconds=retry_delay(attempts)),
+                    ))
+                    DELIVERIES.inc(channel=row.channel, result="retry")
+        return len(rows)
+
+    @staticmethod
+    def _release(row):
+        return update(NotificationOutbox).where(NotificationOutbox.id == row.id).values(
+            claimed_by=None, claimed_until=None)
+
+    def _mark_sent(self, conn, row, finished: datetime):
+        sent = conn.execute(
+            self._release(row)
+            .where(NotificationOutbox.changes == row.changes)
+            .values(state=SENT, sent_at=finished, attempts=row.attempts + 1, last_error=None)
+        ).rowcount
+        if not sent:
+            # The status changed again while this batch was out; the citizen now knows row.status
+            conn.execute(self._release(row).values(previous_status=row.status, attempts=0, last_error=None))
+        DELIVERIES.inc(channel=row.channel, result=SENT)
+        LAG.observe((finished - row.created_at).total_seconds(), channel=row.channel)
+
+
+dispatchers: PerTenant[Dispatcher] = PerTenant(lambda tenant: Dispatcher(tenant=tenant))
+
+
+def start_dispatchers():
+    """One dispatcher per tenant (and the default database), all sending through one gateway."""
+    gateway = load_gateway()
+    for tenant in [None, *TENANTS]:
+        dispatcher = dispatchers.get(tenant)
+        dispatcher.gateway = dispatcher.gateway or gateway
+        dispatcher.start()
+
+
+def stop_dispatchers():
+    for dispatcher in dispatchers.created().values():
+        dispatcher.stop()
@@ -0,0 +1,195 @@
+"""
+Status history and time-to-resolution analytics.
+
+Every status transition is appended to status_events from a before_flush hook,
+so it commits atomically with the status change. When a grievance is resolved
+for the first time, the hours since submission are added to the t-digest for
+its (department, category, resolution month). Percentile queries merge the
+matching sketches, so their cost depends on the number of departments,
+categories and months, not on the number of grievances.
+
+Sketch updates run in after_flush, once the transaction already holds the
+database write lock, so concurrent resolutions cannot overwrite each other's
+read-modify-write.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from ..models import Grievance, ResolutionSketch, StatusEvent
+from ..utils.metrics import counter
+from ..utils.tdigest import TDigest
+
+SKETCH_COMPRESSION = 200
+RESOLVED = "resolved"
+GROUP_BY = ("department", "category", "month")
+
+TRANSITIONS = counter("status_transitions_total", "Recorded grievance status transitions", ("to_status",))
+
+
+def normalize_status(status: Optional[str]) -> Optional[str]:
+    """"Resolved", "in-progress" and "In Progress" all map to one spelling."""
+    if not status:
+        return None
+    return " ".join(str(status).lower().replace("-", " ").replace("_", " ").split())
+
+
+def month_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m")
+
+
+def _record(session: Session, grievance: Grievance, from_status, to_status, changed_at: datetime):
+    to_status = normalize_status(to_status)
+    session.add(StatusEvent(grievance_id=grievance.id, from_status=normalize_status(from_status),
+                            to_status=to_status, changed_at=changed_at))
+    TRANSITIONS.inc(to_status=to_status)
+    if to_status == RESOLVED:
+        session.info.setdefault("resolutions", []).append(
+            (grievance.id, grievance.department, grievance.category, grievance.created_at, changed_at)
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _log_transitions(session, flush_context, instances):
+    now = datetime.utcnow()
+    # A grievance restored from the archive kept its status_events; it is not a new submission
+    restoring = session.info.get("grievance_move") == "restore"
+    for obj in list(session.new):
+        if isinstance(obj, Grievance) and obj.status and not restoring:
+            if obj.created_at is None:
+                obj.created_at = now
+            _record(session, obj, None, obj.status, obj.created_at)
+
+    for obj in list(session.dirty):
+        if not isinstance(obj, Grievance):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        previous = history.deleted[0] if history.deleted else None
+        if normalize_status(previous) != normalize_status(obj.status):
+            _record(session, obj, previous, obj.status, now)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_sketches(session, flush_context):
+    resolutions = session.info.pop("resolutions", None)
+    if not resolutions:
+        return
+    connection = session.connection()
+    for grievance_id, department, category, created_at, resolved_at in resolutions:
+        # Only the first resolution counts; a reopened-and-resolved ticket keeps its original time
+        resolved_before = connection.execute(
+            select(func.count()).select_from(StatusEvent).where(
+                StatusEvent.grievance_id == grievance_id, StatusEvent.to_status == RESOLVED,
+            )
+        ).scalar()
+        if resolved_before > 1 or created_at is None:
+            continue
+        hours = max(0.0, (resolved_at - created_at).total_seconds() / 3600)
+        add_to_sketch(connection, department, category, month_key(resolved_at), [hours])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_resolutions(session):
+    session.info.pop("resolutions", None)
+
+
+def _sketch_key(department: Optional[str], category: Optional[str], month: str) -> Tuple[str, str, str]:
+    return department or "", category or "", month
+
+
+def add_to_sketch(connection, department: Optional[str], category: Optional[str], month: str,
+                  hours: Iterable[float]):
+    """Read-modify-write one sketch row on the given connection/transaction."""
+    department, category, month = _sketch_key(department, category, month)
+    key = and_(ResolutionSketch.department == department, ResolutionSketch.category == category,
+               ResolutionSketch.month == month)
+    row = connection.execute(select(ResolutionSketch.digest).where(key).with_for_update()).first()
+    digest = TDigest.from_bytes(row.digest) if row else TDigest(SKETCH_COMPRESSION)
+    for value in hours:
+        digest.add(value)
+    values = {"count": int(digest.count), "digest": digest.to_bytes(), "updated_at": datetime.utcnow()}
+    if row:
+        connection.execute(update(ResolutionSketch).where(key).values(**values))
+    else:
+        connection.execute(insert(ResolutionSketch).values(department=department, category=category,
+                                                           month=month, **values))
+
+
+def rebuild_sketches(connection) -> int:
+    """
+    Recompute every sketch from status_events (first resolution per grievance).
+    Returns the number of resolutions counted.
+    """
+    first_resolved = (
+        select(StatusEvent.grievance_id, func.min(StatusEvent.changed_at).label("resolved_at"))
+        .where(StatusEvent.to_status == RESOLVED)
+        .group_by(StatusEvent.grievance_id)
+        .subquery()
+    )
+    rows = connection.execute(
+        select(Grievance.department, Grievance.category, Grievance.created_at, first_resolved.c.resolved_at)
+        .join(first_resolved, first_resolved.c.grievance_id == Grievance.id)
+    )
+    digests: Dict[Tuple[str, str, str], TDigest] = {}
+    total = 0
+    for department, category, created_at, resolved_at in rows:
+        if created_at is None or resolved_at is None:
+            continue
+        key = _sketch_key(department, category, month_key(resolved_at))
+        digest = digests.get(key)
+        if digest is None:
+            digest = digests[key] = TDigest(SKETCH_COMPRESSION)
+        digest.add(max(0.0, (resolved_at - created_at).total_seconds() / 3600))
+        total += 1
+
+    connection.execute(delete(ResolutionSketch))
+    now = datetime.utcnow()
+    if digests:
+        connection.execute(insert(ResolutionSketch), [
+            {"department": d, "category": c, "month": m, "count": int(digest.count),
+             "digest": digest.to_bytes(), "updated_at": now}
+            for (d, c, m), digest in digests.items()
+        ])
+    return total
+
+
+def resolution_times(
+    db: Session,
+    department: Optional[str] = None,
+    category: Optional[str] = None,
+    since_month: Optional[str] = None,
+    until_month: Optional[str] = None,
+    group_by: Optional[str] = None,
+) -> List[Tuple[Optional[str], TDigest]]:
+    """Merged digests for the matching sketches, one per group (or a single overall group)."""
+    query = db.query(ResolutionSketch)
+    if department:
+        query = query.filter(ResolutionSketch.department == department)
+    if category:
+        query = query.filter(ResolutionSketch.category == category)
+    if since_month:
+        query = query.filter(ResolutionSketch.month >= since_month)
+    if until_month:
+        query = query.filter(ResolutionSketch.month <= until_month)
+
+    groups: Dict[Optional[str], TDigest] = {}
+    for sketch in query:
+        group = getattr(sketch, group_by) if group_by else None
+        merged = groups.get(group)
+        if merged is None:
+            merged = groups[group] = TDigest(SKETCH_COMPRESSION)
+        merged.merge(TDigest.from_bytes(sketch.digest))
+    return sorted(groups.items(), key=lambda item: item[0] or "")
+
+
+def status_history(db: Session, grievance_id: str) -> List[StatusEvent]:
+    return (
+        db.query(StatusEvent)
+        .filter(StatusEvent.grievance_id == grievance_id)
+        .order_by(StatusEvent.changed_at, StatusEvent.id)
+        .all()
+    )
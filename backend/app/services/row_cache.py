@@ -0,0 +1,142 @@
+"""
+Pre-serialized grievance rows for the list and detail endpoints.
+
+Each grievance's API representation is rendered once with orjson and kept
+as bytes, keyed by (id, version); the version column is bumped on every
+ORM update, so a stale entry is never served. The stored `images` and
+`image_analyses` columns are already JSON, so they are spliced in as raw
+fragments instead of being parsed and re-encoded. List responses are built
+by joining cached fragments, and only cache misses load full rows.
+
+Each tenant has its own cache (ROW_CACHE_MAX_BYTES each): ids and versions
+can coincide across tenant databases (e.g. seeded with the same --seed), so
+a shared cache could serve one municipality's row to another.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from fastapi import Response
+from sqlalchemy.orm import Session
+
+from ..database import PerTenant
+from ..models import Citizen, Grievance
+from ..utils.metrics import CACHE_REQUESTS, gauge, span
+
+ROW_CACHE_MAX_BYTES = int(os.getenv("ROW_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LOAD_CHUNK = 500  # ids per IN (...) when loading misses
+
+
+def render_grievance(grievance: Grievance, citizen: Citizen) -> bytes:
+    return orjson.dumps({
+        "id": grievance.id,
+        "ticket_id": grievance.ticket_id,
+        "title": grievance.title,
+        "description": grievance.description_text,
+        "category": grievance.category,
+        "location": grievance.location,
+        "status": grievance.status,
+        "priority": grievance.priority,
+        "department": grievance.department,
+        "citizen_name": citizen.full_name,
+        "citizen_phone": citizen.phone_number,
+        "citizen_email": citizen.email,
+        "images": orjson.Fragment(grievance.images) if grievance.images else [],
+        "sentiment": grievance.sentiment,
+        "sentiment_confidence": grievance.sentiment_confidence,
+        "urgency_score": grievance.urgency_score,
+        "image_analyses": orjson.Fragment(grievance.image_analyses) if grievance.image_analyses else [],
+        "created_at": grievance.created_at.isoformat() if grievance.created_at else None,
+    })
+
+
+class RowCache:
+    """LRU of rendered rows, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = ROW_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._rows: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, grievance_id: str, version: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._rows.get(grievance_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._rows.move_to_end(grievance_id)
+            return entry[1]
+
+    def put(self, grievance_id: str, version: int, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._rows.pop(grievance_id, None)
+            if old:
+                self.size -= len(old[1])
+            self._rows[grievance_id] = (version, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._rows.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate(self, grievance_id: str):
+        with self._lock:
+            old = self._rows.pop(grievance_id, None)
+            if old:
+                self.size -= len(old[1])
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self.size = 0
+
+
+row_caches: PerTenant[RowCache] = PerTenant(lambda tenant: RowCache())
+gauge("grievance_row_cache_bytes", "Bytes held by the pre-serialized row cache").set_function(
+    lambda: sum(cache.size for cache in row_caches.created().values()))
+
+
+def fetch_rendered(db: Session, keys: Sequence[Tuple[str, int]]) -> List[bytes]:
+    """
+    Rendered rows for (id, version) pairs, in the given order.
+    Misses are loaded in chunks, rendered and cached.
+    """
+    row_cache = row_caches.of(db)
+    rendered: Dict[str, bytes] = {}
+    misses = []
+    for grievance_id, version in keys:
+        body = row_cache.get(grievance_id, version)
+        if body is None:
+            misses.append(grievance_id)
+        else:
+            rendered[grievance_id] = body
+    CACHE_REQUESTS.inc(len(rendered), cache="grievance_rows", result="hit")
+    CACHE_REQUESTS.inc(len(misses), cache="grievance_rows", result="miss")
+
+    if misses:
+        with span("row_cache.render"):
+            for start in range(0, len(misses), LOAD_CHUNK):
+                rows = (
+                    db.query(Grievance, Citizen)
+                    .join(Citizen, Grievance.citizen_id == Citizen.id)
+                    .filter(Grievance.id.in_(misses[start:start + LOAD_CHUNK]))
+                    .all()
+                )
+                for grievance, citizen in rows:
+                    body = render_grievance(grievance, citizen)
+                    row_cache.put(grievance.id, grievance.version, body)
+                    rendered[grievance.id] = body
+
+    # A row deleted between the key query and the load is simply left out
+    return [rendered[grievance_id] for grievance_id, _ in keys if grievance_id in rendered]
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def list_response(rows: Sequence[bytes]) -> Response:
+    return json_response(b'{"grievances":[' + b",".join(rows) + b'],"total":%d}' % len(rows))
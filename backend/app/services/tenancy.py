@@ -0,0 +1,108 @@
+"""
+Routing requests to a municipality's own database.
+
+The tenant comes from the TENANT_HEADER request header (X-Tenant) or, when
+TENANT_DOMAIN is set, from the subdomain (pune.grievances.example.org ->
+"pune"). TenantMiddleware puts it in database.current_tenant for the rest of
+the request, so SessionLocal() anywhere below (endpoints, dependencies,
+background tasks) opens a session on that tenant's engine and in-memory
+state (vector and duplicate indexes, change feed, ticket cache) is looked up
+per tenant. Requests that name no tenant use the default database; a tenant
+that is not in TENANTS gets 404.
+
+for_each_tenant() is the cross-tenant path for state-level analytics: it
+runs a query against every tenant's database in parallel and returns the
+results by tenant, leaving the sums to the caller.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, TypeVar
+
+import orjson
+from sqlalchemy.orm import Session
+
+from ..database import TENANTS, SessionLocal, current_tenant
+
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant")
+TENANT_DOMAIN = os.getenv("TENANT_DOMAIN", "").lower().strip(".")  # e.g. grievances.example.org
+TENANT_AGGREGATE_WORKERS = int(os.getenv("TENANT_AGGREGATE_WORKERS", "8"))
+DEFAULT_TENANT = "default"  # how the default database is labelled in aggregates
+
+T = TypeVar("T")
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+def resolve(headers: Dict[bytes, bytes]) -> Optional[str]:
+    """The tenant named by the request, None for the default database; UnknownTenant otherwise."""
+    name = headers.get(TENANT_HEADER.lower().encode("latin-1"), b"").decode("latin-1").strip().lower()
+    if not name and TENANT_DOMAIN:
+        host = headers.get(b"host", b"").decode("latin-1").lower().rsplit(":", 1)[0]
+        if host.endswith("." + TENANT_DOMAIN):
+            name = host[:-len(TENANT_DOMAIN) - 1]
+    if not name:
+        return None
+    if name not in TENANTS:
+        raise UnknownTenant(name)
+    return name
+
+
+class TenantMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not TENANTS:
+            return await self.app(scope, receive, send)
+        try:
+            tenant = resolve(dict(scope["headers"]))
+        except UnknownTenant:
+            body = orjson.dumps({"detail": "Unknown tenant"})
+            await send({"type": "http.response.start", "status": 404, "headers": [
+                (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+            return await send({"type": "http.response.body", "body": body})
+
+        async def send_with_vary(message):
+            if message["type"] == "http.response.start":
+                # Responses differ by tenant header, so shared caches must key on it
+                message["headers"] = list(message.get("headers", [])) + [(b"vary", TENANT_HEADER.encode("latin-1"))]
+            await send(message)
+
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send_with_vary)
+        finally:
+            current_tenant.reset(token)
+
+
+def tenants() -> List[Optional[str]]:
+    """Every database this deployment serves: the default one, then each configured tenant."""
+    return [None, *TENANTS]
+
+
+def label(tenant: Optional[str]) -> str:
+    return DEFAULT_TENANT if tenant is None else tenant
+
+
+def for_each_tenant(query: Callable[[Session], T]) -> Dict[str, T]:
+    """
+    query(db) against every tenant's database, in parallel threads, keyed by
+    tenant label. Each call gets its own session with current_tenant set, so
+    helpers that open further sessions (e.g. the archive) stay on that tenant.
+    """
+    def run(tenant: Optional[str]) -> T:
+        token = current_tenant.set(tenant)
+        db = SessionLocal()
+        try:
+            return query(db)
+        finally:
+            db.close()
+            current_tenant.reset(token)
+
+    names = tenants()
+    with ThreadPoolExecutor(max_workers=max(1, min(TENANT_AGGREGATE_WORKERS, len(names))),
+                            thread_name_prefix="tenant-aggregate") as pool:
+        results = list(pool.map(run, names))
+    return {label(tenant): result for tenant, result in zip(names, results)}
@@ -0,0 +1,279 @@
+"""
+Read-through cache for the ticket views citizens poll
+(`/grievances/track/{ticket_id}` and `/api/grievances/{id}`).
+
+A ticket changes status a handful of times in its life but is polled far
+more often, so each view is cached as (ETag, rendered JSON) and a poll is
+answered, usually with 304, without touching the database:
+
+- A local LRU per worker, bounded by bytes, with TRACK_CACHE_TTL.
+- Unknown ids are cached as negative entries for TRACK_NEGATIVE_TTL in a
+  separate, smaller LRU, so scraping random ids costs one query per id and
+  cannot evict real views.
+- Optionally a shared SQLite file (TRACK_CACHE_PATH) that all workers on a
+  host read and invalidate. With it, the local tier only keeps entries for
+  TRACK_CACHE_LOCAL_TTL, which bounds how long a worker can miss another
+  worker's invalidation.
+
+Invalidation is precise: a session hook collects every grievance created,
+updated or deleted in a transaction (status changes, analysis results,
+archive and restore included) and drops its views by id and ticket id after
+the commit. Changes that only touch the archive database (deleting an
+archived grievance) invalidate explicitly in services/archive.py. A load that started before an invalidation is not cached, so a
+slow read cannot put an old version back. Keys include the tenant, so
+tenants never see each other's tickets.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..database import current_tenant
+from ..models import Grievance
+from ..utils.metrics import CACHE_REQUESTS, gauge, record_error
+
+TRACK_CACHE_TTL = float(os.getenv("TRACK_CACHE_TTL", "300"))
+TRACK_NEGATIVE_TTL = float(os.getenv("TRACK_NEGATIVE_TTL", "30"))
+TRACK_CACHE_MAX_BYTES = int(os.getenv("TRACK_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+TRACK_NEGATIVE_MAX_ENTRIES = int(os.getenv("TRACK_NEGATIVE_MAX_ENTRIES", "10000"))
+TRACK_CACHE_PATH = os.getenv("TRACK_CACHE_PATH", "")  # shared tier; empty keeps the cache per worker
+TRACK_CACHE_LOCAL_TTL = float(os.getenv("TRACK_CACHE_LOCAL_TTL", "2"))
+
+VIEWS = ("track", "grievance")
+INVALIDATIONS_KEPT = 10000  # recent invalidation times, to reject loads that raced them
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[str, bytes]  # (etag, body)
+
+
+class LocalTier:
+    """LRU with per-entry expiry; positive entries bounded by bytes, negative ones by count."""
+
+    def __init__(self, max_bytes: int = TRACK_CACHE_MAX_BYTES, max_negative: int = TRACK_NEGATIVE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_negative = max_negative
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[float, str, bytes]]" = OrderedDict()
+        self._negative: "OrderedDict[str, float]" = OrderedDict()
+        self._invalidated: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str, now: float):
+        """(etag, body) on a hit, False for a cached unknown id, None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1], entry[2]
+                self._drop(key)
+            expires = self._negative.get(key)
+            if expires is not None:
+                if expires > now:
+                    return False
+                del self._negative[key]
+        return None
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+    def stale(self, key: str, since: float) -> bool:
+        invalidated = self._invalidated.get(key)
+        return invalidated is not None and invalidated >= since
+
+    def put(self, key: str, entry: Optional[Entry], expires: float, loaded_since: float):
+        with self._lock:
+            if self.stale(key, loaded_since):
+                return
+            if entry is None:
+                self._negative[key] = expires
+                self._negative.move_to_end(key)
+                while len(self._negative) > self.max_negative:
+                    self._negative.popitem(last=False)
+                return
+            etag, body = entry
+            if len(body) > self.max_bytes // 16:
+                return
+            self._drop(key)
+            self._negative.pop(key, None)
+            self._entries[key] = (expires, etag, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                evicted, _ = next(iter(self._entries.items()))
+                self._drop(evicted)
+
+    def invalidate(self, keys: Iterable[str], now: float):
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+                self._negative.pop(key, None)
+                self._invalidated[key] = now
+                self._invalidated.move_to_end(key)
+            while len(self._invalidated) > INVALIDATIONS_KEPT:
+                self._invalidated.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._negative.clear()
+            self._invalidated.clear()
+            self.size = 0
+
+
+class SharedTier:
+    """
+    Cache rows in a local SQLite file shared by the workers on one host.
+    Invalidation leaves a tombstone with its time, so a put from a load that
+    began earlier is ignored. Errors only cost a miss.
+    """
+
+    CLEANUP_EVERY = 1000  # puts between sweeps of expired rows
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._puts = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=0.05, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS track_cache ("
+                "key TEXT PRIMARY KEY, etag TEXT, body BLOB, found INTEGER NOT NULL DEFAULT 0, "
+                "expires REAL NOT NULL DEFAULT 0, invalidated REAL NOT NULL DEFAULT 0)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str, now: float):
+        try:
+            row = self._connection().execute(
+                "SELECT etag, body, found, expires FROM track_cache WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            record_error("track_cache.shared")
+            logger.debug("Shared track cache read failed: %s", e)
+            return None
+        if row is None:
+            return None
+        etag, body, found, expires = row
+        return ((etag, bytes(body)) if found else False), expires
+
+    def put(self, key: str, entry: Optional[Entry], expires: float, loaded_since: float):
+        etag, body = entry if entry is not None else (None, None)
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT INTO track_cache (key, etag, body, found, expires) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET etag = excluded.etag, body = excluded.body, "
+                "found = excluded.found, expires = excluded.expires WHERE track_cache.invalidated < ?",
+                (key, etag, body, int(entry is not None), expires, loaded_since),
+            )
+            self._puts += 1
+            if self._puts % self.CLEANUP_EVERY == 0:
+                now = time.time()
+                connection.execute("DELETE FROM track_cache WHERE expires < ? AND invalidated < ?",
+                                   (now, now - 3600))
+        except sqlite3.Error as e:
+            record_error("track_cache.shared")
+            logger.debug("Shared track cache write failed: %s", e)
+
+    def invalidate(self, keys: Iterable[str], now: float):
+        try:
+            self._connection().executemany(
+                "INSERT INTO track_cache (key, invalidated) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET etag = NULL, body = NULL, found = 0, expires = 0, "
+                "invalidated = excluded.invalidated",
+                [(key, now) for key in keys],
+            )
+        except sqlite3.Error as e:
+            # The entry then lives until its TTL; say so loudly, unlike a failed read
+            record_error("track_cache.shared")
+            logger.warning("Shared track cache invalidation failed: %s", e)
+
+
+def _key(tenant: Optional[str], view: str, identifier: str) -> str:
+    return f"{view}:{identifier}" if tenant is None else f"{tenant}/{view}:{identifier}"
+
+
+class TrackCache:
+    def __init__(self, shared_path: str = TRACK_CACHE_PATH):
+        self.local = LocalTier()
+        self.shared = SharedTier(shared_path) if shared_path else None
+        self.local_ttl = min(TRACK_CACHE_LOCAL_TTL, TRACK_CACHE_TTL) if self.shared else TRACK_CACHE_TTL
+
+    def fetch(self, view: str, identifier: str, load: Callable[[], Optional[Entry]]) -> Optional[Entry]:
+        """
+        The cached (etag, body) of a view, or load() on a miss; None if the id is unknown.
+        load() must return None for an unknown id, which is then cached negatively.
+        """
+        key = _key(current_tenant.get(), view, identifier)
+        now = time.time()
+        entry = self.local.get(key, now)
+        if entry is not None:
+            CACHE_REQUESTS.inc(cache=view, result="hit" if entry else "negative_hit")
+            return entry or None
+
+        if self.shared is not None:
+            shared = self.shared.get(key, now)
+            if shared is not None:
+                entry, expires = shared
+                self.local.put(key, entry or None, min(expires, now + self.local_ttl), now)
+                CACHE_REQUESTS.inc(cache=view, result="shared_hit" if entry else "shared_negative_hit")
+                return entry or None
+
+        CACHE_REQUESTS.inc(cache=view, result="miss")
+        entry = load()
+        ttl = TRACK_CACHE_TTL if entry is not None else TRACK_NEGATIVE_TTL
+        self.local.put(key, entry, now + min(ttl, self.local_ttl), now)
+        if self.shared is not None:
+            self.shared.put(key, entry, now + ttl, now)
+        return entry
+
+    def invalidate(self, *identifiers: Optional[str], tenant: Optional[str] = None):
+        keys = [_key(tenant, view, identifier) for identifier in set(identifiers) if identifier for view in VIEWS]
+        if not keys:
+            return
+        now = time.time()
+        self.local.invalidate(keys, now)
+        if self.shared is not None:
+            self.shared.invalidate(keys, now)
+
+
+track_cache = TrackCache()
+gauge("track_cache_bytes", "Bytes held by the local ticket view cache").set_function(lambda: track_cache.local.size)
+gauge("track_cache_entries", "Ticket views in the local cache").set_function(lambda: len(track_cache.local))
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed(session, flush_context, instances):
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(obj, Grievance):
+            session.info.setdefault("track_cache_keys", set()).update((obj.id, obj.ticket_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    identifiers = session.info.pop("track_cache_keys", None)
+    if identifiers:
+        track_cache.invalidate(*identifiers, tenant=session.info.get("tenant"))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed(session):
+    session.info.pop("track_cache_keys", None)
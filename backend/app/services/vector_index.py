@@ -0,0 +1,459 @@
+"""
+In-process vector index of grievance embeddings, used for "similar grievances".
+
+Small collections are searched by brute force over a float32 matrix. Once the
+index grows past IVF_THRESHOLD vectors it switches to an inverted-file layout:
+vectors are assigned to k-means centroids and stored as int8 codes, and a query
+only scans the lists of its nearest centroids.
+
+Embeddings are stored per grievance in the grievance_embeddings table, which is
+the source of truth. The index itself is persisted to an .npz file so that a
+restart does not need to re-read every vector from the database. Every
+SAVE_EVERY changes it is written on a background thread; the lock is only held
+to copy the arrays, so requests never wait for the file.
+"""
+import logging
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..database import DB_PATH, PerTenant, SessionLocal, tenant_path
+from ..models import Grievance, GrievanceEmbedding
+from .ai_services import HF_TOKEN, get_text_embeddings
+from .dedup import normalize_tokens
+from ..utils.metrics import span, record_cache
+
+EMBEDDING_DIM = 384
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND") or ("hf" if HF_TOKEN else "local")
+MODEL_NAME = "intfloat/multilingual-e5-small" if EMBEDDING_BACKEND == "hf" else "local-hash-384"
+
+INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", os.path.join(os.path.dirname(DB_PATH), "vector_index.npz"))
+IVF_THRESHOLD = int(os.getenv("VECTOR_IVF_THRESHOLD", "50000"))
+IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+SAVE_EVERY = 50  # persist (in the background) after this many changes
+
+logger = logging.getLogger(__name__)
+
+
+def local_embedding(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Local stand-in for the e5 model: signed feature hashing of words and
+    character trigrams. Cheap and deterministic, good enough for near-topic matches.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in normalize_tokens(text):
+        features = [(word, 1.0)]
+        padded = f"#{word}#"
+        features.extend((padded[i:i + 3], 0.5) for i in range(len(padded) - 2))
+        for feature, weight in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % dim] += weight if (h >> 16) & 1 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def embed_texts(texts: List[str]) -> Optional[np.ndarray]:
+    """Embed texts with the configured backend. Returns L2-normalized rows or None."""
+    if EMBEDDING_BACKEND == "hf":
+        vectors = get_text_embeddings(texts)
+        if vectors is None:
+            return None
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != EMBEDDING_DIM:
+            return None
+    else:
+        matrix = np.stack([local_embedding(t) for t in texts])
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def grievance_text(grievance) -> str:
+    return f"{grievance.title or ''}. {grievance.description_text or ''}"
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-vector symmetric int8 quantization."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class VectorIndex:
+    """Brute-force or IVF/int8 index over grievance embeddings."""
+
+    def __init__(self, path: str = INDEX_PATH, dim: int = EMBEDDING_DIM, model: str = MODEL_NAME):
+        self.path = path
+        self.dim = dim
+        self.model = model
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()  # one writer of the file at a time
+        self._saver: Optional[threading.Thread] = None
+        self._dirty = 0
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._active = np.zeros(0, dtype=bool)
+        self._categories = np.zeros(0, dtype=np.int32)
+        self._departments = np.zeros(0, dtype=np.int32)
+        self._vocab: Dict[str, int] = {}
+        # Flat mode
+        self._vectors: Optional[np.ndarray] = np.zeros((0, self.dim), dtype=np.float32)
+        # IVF mode
+        self._centroids: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._lists: Optional[np.ndarray] = None
+
+    @property
+    def mode(self) -> str:
+        return "ivf" if self._centroids is not None else "flat"
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _code(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        if value not in self._vocab:
+            self._vocab[value] = len(self._vocab)
+        return self._vocab[value]
+
+    def _grow(self, needed: int):
+        capacity = len(self._active)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+
+        def grow(array, shape_tail=()):
+            grown = np.zeros((new_capacity,) + shape_tail, dtype=array.dtype)
+            grown[:capacity] = array
+            return grown
+
+        self._active = grow(self._active)
+        self._categories = grow(self._categories)
+        self._departments = grow(self._departments)
+        if self._centroids is None:
+            self._vectors = grow(self._vectors, (self.dim,))
+        else:
+            self._codes = grow(self._codes, (self.dim,))
+            self._scales = grow(self._scales)
+            self._lists = grow(self._lists)
+
+    def _set_vector(self, row: int, vector: np.ndarray):
+        if self._centroids is None:
+            self._vectors[row] = vector
+        else:
+            codes, scales = _quantize(vector[None, :])
+            self._codes[row] = codes[0]
+            self._scales[row] = scales[0]
+            self._lists[row] = int(np.argmax(self._centroids @ vector))
+
+    def add(self, grievance_id: str, vector: np.ndarray, category: Optional[str] = None,
+            department: Optional[str] = None):
+        """Insert or replace a grievance's vector."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            row = self._rows.get(grievance_id)
+            if row is None:
+                row = self._size
+                self._grow(row + 1)
+                self.ids.append(grievance_id)
+                self._rows[grievance_id] = row
+                self._size += 1
+            self._active[row] = True
+            self._categories[row] = self._code(category)
+            self._departments[row] = self._code(department)
+            self._set_vector(row, vector)
+
+            if self._centroids is None and len(self._rows) >= IVF_THRESHOLD:
+                self._build_ivf()
+            self._touch()
+
+    def remove(self, grievance_id: str):
+        with self._lock:
+            row = self._rows.pop(grievance_id, None)
+            if row is not None:
+                self._active[row] = False
+                self._touch()
+
+    def update_metadata(self, grievance_id: str, category: Optional[str] = None,
+                        department: Optional[str] = None):
+        with self._lock:
+            row = self._rows.get(grievance_id)
+            if row is None:
+                return
+            if category is not None:
+                self._categories[row] = self._code(category)
+            if department is not None:
+                self._departments[row] = self._code(department)
+            self._touch()
+
+    def get_vector(self, grievance_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(grievance_id)
+            if row is None:
+                return None
+            if self._centroids is None:
+                return self._vectors[row].copy()
+            return self._codes[row].astype(np.float32) * self._scales[row]
+
+    def search(self, vector: np.ndarray, k: int = 5, category: Optional[str] = None,
+               department: Optional[str] = None, exclude: Tuple[str, ...] = ()) -> List[Tuple[str, float]]:
+        """Top-k (grievance_id, cosine similarity) pairs, optionally filtered."""
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            mask = self._active[:self._size].copy()
+            for value, codes in ((category, self._categories), (department, self._departments)):
+                if value is not None:
+                    if value not in self._vocab:
+                        return []
+                    mask &= codes[:self._size] == self._vocab[value]
+            for grievance_id in exclude:
+                row = self._rows.get(grievance_id)
+                if row is not None:
+                    mask[row] = False
+
+            if self._centroids is None:
+                rows = np.nonzero(mask)[0]
+                scores = self._vectors[rows] @ query
+            else:
+                rows, scores = self._search_ivf(query, mask, k)
+            # _compact() replaces the list once the lock is released; add() only appends
+            ids = self.ids
+
+        if len(rows) == 0:
+            return []
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores)
+        return [(ids[rows[i]], float(scores[i])) for i in order]
+
+    def _search_ivf(self, query, mask, k):
+        nlist = len(self._centroids)
+        probes = np.argsort(self._centroids @ query)[::-1][:IVF_NPROBE]
+        rows = np.nonzero(mask & np.isin(self._lists[:self._size], probes))[0]
+        if len(rows) < k and IVF_NPROBE < nlist:
+            # Selective filters may leave the probed lists short; scan everything
+            rows = np.nonzero(mask)[0]
+        scores = (self._codes[rows].astype(np.float32) @ query) * self._scales[rows]
+        return rows, scores
+
+    def _build_ivf(self, iterations: int = 10):
+        """Train spherical k-means centroids and convert storage to int8 codes."""
+        vectors = self._vectors[:self._size]
+        nlist = int(min(4096, max(16, np.sqrt(len(self._rows)))))
+        rng = np.random.default_rng(0)
+        live = np.nonzero(self._active[:self._size])[0]
+        nlist = min(nlist, len(live))
+        sample = vectors[rng.choice(live, size=min(len(live), 50 * nlist), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignments == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        lists = np.zeros(len(self._active), dtype=np.int32)
+        for start in range(0, self._size, 10000):
+            chunk = vectors[start:start + 10000]
+            lists[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        codes = np.zeros((len(self._active), self.dim), dtype=np.int8)
+        scales = np.ones(len(self._active), dtype=np.float32)
+        codes[:self._size], scales[:self._size] = _quantize(vectors)
+
+        self._centroids = centroids
+        self._lists, self._codes, self._scales = lists, codes, scales
+        self._vectors = None
+
+    def _touch(self):
+        self._dirty += 1
+        if self.loaded and self._dirty >= SAVE_EVERY:
+            self._save_later()
+
+    def _save_later(self):
+        """Start a background save unless one is already running (callers hold the lock)."""
+        if self._saver is not None and self._saver.is_alive():
+            return  # changes made meanwhile are picked up by the next save
+        self._saver = threading.Thread(target=self._save_in_background, name="vector-index-save", daemon=True)
+        self._saver.start()
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        except Exception as e:
+            logger.warning("Error saving vector index %s: %s", self.path, e)
+
+    def _compact(self):
+        live = np.nonzero(self._active[:self._size])[0]
+        if len(live) == self._size:
+            return
+        self.ids = [self.ids[r] for r in live]
+        self._rows = {gid: i for i, gid in enumerate(self.ids)}
+        self._active = self._active[live]
+        self._categories = self._categories[live]
+        self._departments = self._departments[live]
+        if self._centroids is None:
+            self._vectors = self._vectors[live]
+        else:
+            self._codes, self._scales, self._lists = self._codes[live], self._scales[live], self._lists[live]
+        self._size = len(live)
+
+    def save(self):
+        """Write the index to disk atomically."""
+        with self._save_lock:
+            # Copies, so adds and searches can go on while the file is written
+            with self._lock:
+                self._compact()
+                n = self._size
+                vocab = sorted(self._vocab, key=self._vocab.get)
+                arrays = {
+                    "model": np.array(self.model),
+                    "ids": np.array(self.ids, dtype=str),
+                    "categories": self._categories[:n].copy(),
+                    "departments": self._departments[:n].copy(),
+                    "vocab": np.array(vocab, dtype=str),
+                }
+                if self._centroids is None:
+                    arrays["vectors"] = self._vectors[:n].copy()
+                else:
+                    arrays.update(centroids=self._centroids.copy(), codes=self._codes[:n].copy(),
+                                  scales=self._scales[:n].copy(), lists=self._lists[:n].copy())
+                self._dirty = 0
+
+            tmp_path = self.path + ".tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, self.path)
+
+    def load_file(self) -> bool:
+        """Load a previously saved index. Returns False if none matches the current model."""
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            if str(data["model"]) != self.model:
+                return False
+            with self._lock:
+                self._reset()
+                self.ids = [str(i) for i in data["ids"]]
+                self._rows = {gid: i for i, gid in enumerate(self.ids)}
+                self._size = len(self.ids)
+                self._active = np.ones(self._size, dtype=bool)
+                self._categories = data["categories"].copy()
+                self._departments = data["departments"].copy()
+                self._vocab = {str(v): i for i, v in enumerate(data["vocab"])}
+                if "centroids" in data:
+                    self._vectors = None
+                    self._centroids = data["centroids"].copy()
+                    self._codes = data["codes"].copy()
+                    self._scales = data["scales"].copy()
+                    self._lists = data["lists"].copy()
+                else:
+                    self._vectors = data["vectors"].copy()
+        return True
+
+    def sync(self, db):
+        """Load from disk, then add or drop vectors so the index matches the database."""
+        with self._lock:
+            if self.loaded:
+                return
+            self.load_file()
+            stored = {
+                gid for (gid,) in db.query(GrievanceEmbedding.grievance_id)
+                .filter(GrievanceEmbedding.model == self.model)
+            }
+            for gid in set(self._rows) - stored:
+                self.remove(gid)
+            missing = list(stored - set(self._rows))
+            for start in range(0, len(missing), 500):
+                rows = (
+                    db.query(GrievanceEmbedding.grievance_id, GrievanceEmbedding.vector,
+                             Grievance.category, Grievance.department)
+                    .join(Grievance, Grievance.id == GrievanceEmbedding.grievance_id)
+                    .filter(GrievanceEmbedding.grievance_id.in_(missing[start:start + 500]))
+                )
+                for gid, blob, category, department in rows:
+                    self.add(gid, np.frombuffer(blob, dtype=np.float32), category, department)
+            self.loaded = True
+            if self._dirty:
+                self._save_later()
+
+
+vector_indexes: PerTenant[VectorIndex] = PerTenant(
+    lambda tenant: VectorIndex(INDEX_PATH if tenant is None else tenant_path(tenant, "vector_index.npz")))
+
+
+def get_index(db) -> VectorIndex:
+    index = vector_indexes.of(db)
+    if not index.loaded:
+        index.sync(db)
+    return index
+
+
+def embed_grievance(grievance) -> Optional[np.ndarray]:
+    with span("embedding"):
+        vectors = embed_texts([grievance_text(grievance)])
+    return None if vectors is None else vectors[0]
+
+
+def index_grievance(db, grievance) -> Optional[np.ndarray]:
+    """Embed a grievance, store the embedding and add it to the index."""
+    vector = embed_grievance(grievance)
+    if vector is None:
+        return None
+
+    db.merge(GrievanceEmbedding(grievance_id=grievance.id, model=MODEL_NAME, vector=vector.tobytes()))
+    db.commit()
+    get_index(db).add(grievance.id, vector, grievance.category, grievance.department)
+    return vector
+
+
+def index_grievance_task(grievance_id: str):
+    """Background task: embed a newly created grievance with its own session."""
+    db = SessionLocal()
+    try:
+        grievance = db.query(Grievance).filter(Grievance.id == grievance_id).first()
+        if grievance:
+            index_grievance(db, grievance)
+    except Exception as e:
+        logger.warning("Error indexing grievance %s: %s", grievance_id, e)
+    finally:
+        db.close()
+
+
+def remove_grievance(db, grievance_id: str):
+    db.query(GrievanceEmbedding).filter(GrievanceEmbedding.grievance_id == grievance_id).delete()
+    vector_indexes.of(db).remove(grievance_id)
+
+
+def find_similar(db, grievance, k: int = 5, category: Optional[str] = None, department: Optional[str] = None,
+                 background_tasks=None) -> Optional[List[Tuple[str, float]]]:
+    """
+    Top-k grievances similar to the given one, or None if no embedding can be produced.
+    A grievance that is not indexed yet is embedded for this query only; storing
+    its embedding is left to a task added to background_tasks, so reads do not write.
+    """
+    index = get_index(db)
+    vector = index.get_vector(grievance.id)
+    record_cache("embedding", hit=vector is not None)
+    if vector is None:
+        vector = embed_grievance(grievance)
+        if vector is None:
+            return None
+        if background_tasks is not None:
+            background_tasks.add_task(index_grievance_task, grievance.id)
+    with span("vector.search"):
+        return index.search(vector, k, category=category, department=department, exclude=(grievance.id,))
@@ -0,0 +1,70 @@
+"""
+Background warm-up after startup.
+
+The API answers health checks as soon as it has imported; this thread then
+builds what the first real requests would otherwise pay for: the provider
+SDK clients, the gazetteer, the category model and the duplicate and vector
+indexes (for the default database and every tenant). Each step is timed as
+a `warmup.<step>` stage and a failing step is only logged. Disable with
+WARMUP_ON_STARTUP=false.
+"""
+import logging
+import os
+import threading
+from typing import Callable, List, Tuple
+
+from ..database import SessionLocal, current_tenant
+from ..utils.metrics import span
+from . import ai_services, classifier, dedup, geo, tenancy, vector_index
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+
+def _per_tenant(load: Callable) -> Callable[[], None]:
+    """load(db) for every tenant's database in turn, with current_tenant set as in a request."""
+    def step():
+        for tenant in tenancy.tenants():
+            token = current_tenant.set(tenant)
+            db = SessionLocal()
+            try:
+                load(db)
+            except Exception as e:
+                logger.warning("Warm-up for tenant %s failed: %s", tenancy.label(tenant), e)
+            finally:
+                db.close()
+                current_tenant.reset(token)
+    return step
+
+
+def steps() -> List[Tuple[str, Callable[[], object]]]:
+    plan = []
+    if ai_services.GROQ_API_KEY:
+        plan.append(("groq_client", ai_services.groq_client))
+    if ai_services.HF_TOKEN:
+        plan.append(("hf_session", ai_services.hf_session))
+        plan.append(("hf_client", ai_services.hf_client))
+    plan += [
+        ("gazetteer", geo.gazetteer.load),
+        ("classifier", classifier.get_classifier),
+        ("duplicate_index", _per_tenant(lambda db: dedup.duplicate_indexes.of(db).load(db))),
+        ("vector_index", _per_tenant(vector_index.get_index)),
+    ]
+    return plan
+
+
+def warm_up():
+    for name, step in steps():
+        try:
+            with span(f"warmup.{name}"):
+                step()
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+    logger.info("Warm-up finished")
+
+
+def start() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
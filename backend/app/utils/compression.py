@@ -0,0 +1,44 @@
+"""
+Compression for archived text and JSON columns.
+
+zstd (the `zstandard` package) when installed, otherwise zlib from the
+standard library. Every blob is stored next to the name of the codec that
+wrote it, so an archive written with one codec stays readable after the
+other becomes the default.
+"""
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+CODEC = "zstd" if zstandard is not None else "zlib"
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+
+
+def compress(data: bytes, codec: str = CODEC) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, ZLIB_LEVEL)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This archive row is zstd-compressed; install the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def compress_text(text, codec: str = CODEC):
+    return None if text is None else compress(text.encode("utf-8"), codec)
+
+
+def decompress_text(data, codec: str):
+    return None if data is None else decompress(data, codec).decode("utf-8")
@@ -0,0 +1,13 @@
+CATEGORY_DEPARTMENTS = {
+    "sanitation": "Municipal Corporation",
+    "water-supply": "Water Department",
+    "electricity": "Electricity Board",
+    "roads": "Public Works Department",
+    "public-safety": "Police Department",
+    "healthcare": "Health Department",
+    "education": "Education Department",
+    "housing": "Housing Authority",
+    "other": "General Administration",
+}
+
+DEFAULT_DEPARTMENT = "General Administration"
@@ -0,0 +1,44 @@
+"""
+Version-based ETags for conditional GETs.
+
+Tags are computed from cheap version numbers (a grievance's row version, or
+the change log's head seq for whole-table views), never from the response
+body, so a matching If-None-Match is answered with 304 before the real
+query or any serialization runs.
+"""
+import hashlib
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "no-cache"  # clients may store responses but must revalidate
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode("utf-8"), digest_size=8).hexdigest()
+    # Weak: the representation is equivalent, not necessarily byte-identical (e.g. after compression)
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_fresh(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this version (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(t) for t in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
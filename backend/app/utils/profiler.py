@@ -0,0 +1,229 @@
+"""
+On-demand sampling profiler for a live worker.
+
+A capture starts a thread that reads every thread's Python stack with
+sys._current_frames() at a fixed interval and counts identical stacks. It
+does not trace calls, so the cost is one stack walk per thread per tick
+while a capture runs and nothing otherwise: with no capture the middleware
+is a single attribute check per request.
+
+Threads blocked in select(), a condition wait or a queue get are skipped,
+so the profile shows where CPU goes rather than where threads sleep.
+
+A capture can be limited to requests whose path starts with a prefix
+and/or that carry a header. ProfilerMiddleware marks matching requests; a
+sample counts only if its stack belongs to one of them, either as the
+coroutine chain running under the middleware (async endpoints) or as a
+threadpool worker running a call made from the request's context (sync
+endpoints, dependencies).
+
+The result is a collapsed-stack profile ("root;...;leaf count" lines, the
+input format of flamegraph.pl, speedscope and similar viewers) plus a table
+of the hottest functions by self and total samples.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import counter
+
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")  # empty disables the capture endpoint
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+MIN_INTERVAL = 0.001
+MAX_DEPTH = 128
+
+# Leaf frames of threads that are waiting, not running
+IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+CAPTURES = counter("profiler_captures_total", "Profiler captures by outcome", ("result",))
+
+_matched: contextvars.ContextVar[bool] = contextvars.ContextVar("profiler_matched", default=False)
+
+
+class Busy(Exception):
+    """Another capture is already running in this worker."""
+
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Capture:
+    def __init__(self, seconds: float, interval: float, path: Optional[str] = None,
+                 header: Optional[Tuple[str, Optional[str]]] = None):
+        self.seconds = seconds
+        self.interval = max(interval, MIN_INTERVAL)
+        self.path = path
+        self.header = (header[0].lower().encode("latin-1"),
+                       header[1].encode("latin-1") if header[1] is not None else None) if header else None
+        self.filtered = path is not None or header is not None
+        self.stacks: Counter = Counter()
+        self.ticks = 0
+        self.matched_requests = 0
+        self.elapsed = 0.0
+        self._request_frames: Dict[int, object] = {}  # id -> frame of ProfilerMiddleware.__call__
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    # Request filter
+
+    def matches(self, scope) -> bool:
+        if self.path is not None and not scope["path"].startswith(self.path):
+            return False
+        if self.header is not None:
+            name, value = self.header
+            found = [v for k, v in scope["headers"] if k == name]
+            if not found or (value is not None and value not in found):
+                return False
+        return True
+
+    def _belongs_to_request(self, frame) -> bool:
+        while frame is not None:
+            code = frame.f_code
+            if code is _MIDDLEWARE_CODE:
+                return id(frame) in self._request_frames
+            if code is _WORKER_CODE:
+                context = frame.f_locals.get("context")
+                return isinstance(context, contextvars.Context) and context.get(_matched, False)
+            frame = frame.f_back
+        return False
+
+    # Sampling
+
+    def _sample(self, own_id: int):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                continue
+            if self.filtered and not self._belongs_to_request(frame):
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+
+    def _run(self):
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + self.seconds
+        next_tick = started
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now >= next_tick:
+                self._sample(own_id)
+                self.ticks += 1
+                next_tick += self.interval
+                if next_tick < now:  # fell behind (e.g. GIL contention); don't burst to catch up
+                    next_tick = now + self.interval
+            self._stop.wait(max(0.0, min(next_tick, deadline) - time.perf_counter()))
+        self.elapsed = time.perf_counter() - started
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    # Results
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 25) -> List[dict]:
+        """Functions by self samples (stack leaf), with total samples (anywhere on the stack)."""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        samples = self.samples or 1
+        ranked = sorted(total, key=lambda label: (own[label], total[label]), reverse=True)[:limit]
+        return [
+            {
+                "function": label,
+                "selfSamples": own[label],
+                "totalSamples": total[label],
+                "selfPercent": round(100.0 * own[label] / samples, 2),
+                "totalPercent": round(100.0 * total[label] / samples, 2),
+            }
+            for label in ranked
+        ]
+
+
+_lock = threading.Lock()
+current: Optional[Capture] = None
+
+
+def begin(capture: Capture) -> Capture:
+    global current
+    with _lock:
+        if current is not None:
+            CAPTURES.inc(result="busy")
+            raise Busy()
+        current = capture
+    capture.start()
+    return capture
+
+
+def end(capture: Capture):
+    global current
+    capture.stop()
+    with _lock:
+        if current is capture:
+            current = None
+    CAPTURES.inc(result="completed")
+
+
+class ProfilerMiddleware:
+    """
+    Marks requests that match the running capture's filter. Register it
+    innermost so the endpoint's coroutine chain runs under __call__.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        capture = current
+        if capture is None or not capture.filtered or scope["type"] != "http" or not capture.matches(scope):
+            return await self.app(scope, receive, send)
+        frame = sys._getframe()
+        capture._request_frames[id(frame)] = frame
+        capture.matched_requests += 1
+        token = _matched.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _matched.reset(token)
+            capture._request_frames.pop(id(frame), None)
+
+
+def _worker_code():
+    """Code of the loop that runs anyio's threadpool jobs, which holds each job's copied context."""
+    try:
+        from anyio._backends._asyncio import WorkerThread
+    except ImportError:  # other anyio versions: only async endpoints can be attributed
+        return None
+    return WorkerThread.run.__code__
+
+
+_MIDDLEWARE_CODE = ProfilerMiddleware.__call__.__code__
+_WORKER_CODE = _worker_code()
@@ -0,0 +1,192 @@
+"""
+gzip/brotli response compression with a cache of precompressed bodies.
+
+A pure ASGI middleware (so it sees whether a body is streamed) that
+compresses JSON and text responses of at least COMPRESSION_MIN_BYTES with
+the best encoding the client accepts: brotli when the `brotli` package is
+installed, else gzip. Responses that carry an ETag are versioned
+representations (see utils/etag.py), so their compressed bytes are kept in
+an LRU keyed by (tenant, ETag, encoding) and a repeated hit costs a lookup instead
+of another compression pass. Those are also compressed harder, since the
+work is done once.
+
+Streamed responses (SSE, NDJSON batch results, anything sent in more than
+one body message) pass through untouched, as do 304s, errors and bodies
+that already have a Content-Encoding. Large bodies are compressed in a
+worker thread so the event loop keeps serving other requests.
+"""
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import anyio
+
+from ..database import current_tenant
+from .metrics import counter, gauge
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+THREAD_THRESHOLD = 128 * 1024  # bodies at least this large are compressed off the event loop
+
+# (one-off, cached): cached bodies are compressed once, so they can afford more effort
+GZIP_LEVELS = (6, 9)
+BROTLI_QUALITIES = (5, 9)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+
+RESPONSES = counter("http_compression_responses_total", "Responses by compression outcome", ("encoding", "result"))
+BYTES = counter("http_compression_bytes_total", "Response bytes before and after compression", ("stage",))
+
+SUPPORTED = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The supported encoding the client prefers (highest q, brotli on ties), or None."""
+    best, best_q = None, 0.0
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if name not in SUPPORTED:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > best_q or (q == best_q and best is not None and SUPPORTED.index(name) < SUPPORTED.index(best)):
+            best, best_q = name, q
+    return best
+
+
+def compress(body: bytes, encoding: str, cached: bool) -> bytes:
+    effort = 1 if cached else 0
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITIES[effort])
+    return gzip.compress(body, compresslevel=GZIP_LEVELS[effort], mtime=0)
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by (tenant, etag, encoding, original length), bounded by bytes."""
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[Optional[str], bytes, str, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+compressed_cache = CompressedCache()
+gauge("http_compression_cache_bytes", "Bytes held by the precompressed response cache").set_function(
+    lambda: compressed_cache.size)
+
+
+def _compressible(headers: Dict[bytes, bytes]) -> bool:
+    content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+    if any(content_type.startswith(t) for t in STREAMING_TYPES):
+        return False
+    return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_bytes: int = COMPRESSION_MIN_BYTES, cache: CompressedCache = compressed_cache):
+        self.app = app
+        self.min_bytes = min_bytes
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                if (message["status"] != 200 or b"content-encoding" in headers
+                        or not _compressible(headers)):
+                    passthrough = True
+                    return await send(message)
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Streamed: send as it comes, uncompressed
+                RESPONSES.inc(encoding="identity", result="streamed")
+                passthrough = True
+                await send(start_message)
+                return await send(message)
+
+            headers = [(k, v) for k, v in start_message["headers"] if k.lower() != b"vary"]
+            vary = [v for k, v in start_message["headers"] if k.lower() == b"vary"]
+            headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+            if len(body) < self.min_bytes:
+                RESPONSES.inc(encoding="identity", result="small")
+                await send(dict(start_message, headers=headers))
+                return await send(message)
+
+            etag = dict(start_message["headers"]).get(b"etag")
+            # Tenants' ETags come from separate databases and can coincide
+            key = (current_tenant.get(), etag, encoding, len(body)) if etag else None
+            compressed = self.cache.get(key) if key else None
+            if compressed is not None:
+                RESPONSES.inc(encoding=encoding, result="cached")
+            else:
+                if len(body) >= THREAD_THRESHOLD:
+                    compressed = await anyio.to_thread.run_sync(compress, body, encoding, key is not None)
+                else:
+                    compressed = compress(body, encoding, key is not None)
+                if key:
+                    self.cache.put(key, compressed)
+                RESPONSES.inc(encoding=encoding, result="compressed")
+            BYTES.inc(len(body), stage="original")
+            BYTES.inc(len(compressed), stage="sent")
+
+            headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(compressed)).encode())]
+            await send(dict(start_message, headers=headers))
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
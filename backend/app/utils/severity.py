@@ -0,0 +1,18 @@
+SEVERITY_LEVELS = ["low", "medium", "high", "critical"]  # least to most severe
+DEFAULT_SEVERITY = "medium"
+
+
+def normalize_severity(value) -> str:
+    severity = str(value or "").strip().lower()
+    return severity if severity in SEVERITY_LEVELS else "unknown"
+
+
+def overall_severity(severities, assessed=None) -> str:
+    """
+    Most severe known level among the image findings and the combined
+    assessment (if any); medium when there are none. A combined assessment can
+    raise the level but never hide a more severe single finding.
+    """
+    ranks = [SEVERITY_LEVELS.index(s) for s in map(normalize_severity, [*severities, assessed])
+             if s in SEVERITY_LEVELS]
+    return SEVERITY_LEVELS[max(ranks)] if ranks else DEFAULT_SEVERITY
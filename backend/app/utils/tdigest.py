@@ -0,0 +1,166 @@
+"""
+Merging t-digest (Dunning & Ertl) for mergeable percentile sketches.
+
+A digest summarizes any number of values in at most ~compression centroids,
+with error concentrated away from the tails, so p50/p90/p99 stay accurate.
+Two digests merge into one describing the union of their inputs, which lets
+per-(department, category, month) sketches be combined at query time.
+
+    digest = TDigest()
+    for hours in durations:
+        digest.add(hours)
+    digest.quantile(0.9)
+    TDigest.from_bytes(digest.to_bytes())
+"""
+import math
+import struct
+from array import array
+from bisect import bisect_right
+from typing import List, Tuple
+
+_HEADER = struct.Struct("<BdddddI")  # format version, compression, count, total, min, max, centroids
+_FORMAT_VERSION = 1
+
+
+class TDigest:
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.count = 0.0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[Tuple[float, float]] = []
+
+    def __len__(self) -> int:
+        return int(self.count)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def add(self, value: float, weight: float = 1.0):
+        value = float(value)
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.total += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) > 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        other._compress()
+        if not other.count:
+            return self
+        self._buffer.extend(zip(other._means, other._weights))
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self._buffer) > 5 * self.compression:
+            self._compress()
+        return self
+
+    # Scale function k1: centroids near q=0 and q=1 stay small
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _q(self, k: float) -> float:
+        k = min(max(k, -self.compression / 4), self.compression / 4)
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+
+        means, weights = [], []
+        mean, weight = items[0]
+        before = 0.0
+        q_limit = self._q(self._k(0.0) + 1)
+        for value, w in items[1:]:
+            if (before + weight + w) / total <= q_limit:
+                weight += w
+                mean += (value - mean) * w / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                before += weight
+                q_limit = self._q(self._k(before / total) + 1)
+                mean, weight = value, w
+        means.append(mean)
+        weights.append(weight)
+        self._means, self._weights = means, weights
+
+    def _centers(self) -> List[float]:
+        centers, cumulative = [], 0.0
+        for w in self._weights:
+            centers.append(cumulative + w / 2)
+            cumulative += w
+        return centers
+
+    def quantile(self, q: float) -> float:
+        """Estimated value at quantile q in [0, 1]; NaN if empty."""
+        self._compress()
+        if not self.count:
+            return math.nan
+        if len(self._means) == 1 or q <= 0:
+            return self._means[0] if q > 0 else self.min
+        if q >= 1:
+            return self.max
+
+        target = q * self.count
+        centers = self._centers()
+        if target <= centers[0]:
+            return self._interpolate(target, 0.0, self.min, centers[0], self._means[0])
+        if target >= centers[-1]:
+            return self._interpolate(target, centers[-1], self._means[-1], self.count, self.max)
+        i = bisect_right(centers, target) - 1
+        return self._interpolate(target, centers[i], self._means[i], centers[i + 1], self._means[i + 1])
+
+    def cdf(self, value: float) -> float:
+        """Estimated fraction of values <= value; NaN if empty."""
+        self._compress()
+        if not self.count:
+            return math.nan
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        centers = self._centers()
+        if value <= self._means[0]:
+            rank = self._interpolate(value, self.min, 0.0, self._means[0], centers[0])
+        elif value >= self._means[-1]:
+            rank = self._interpolate(value, self._means[-1], centers[-1], self.max, self.count)
+        else:
+            i = bisect_right(self._means, value) - 1
+            rank = self._interpolate(value, self._means[i], centers[i], self._means[i + 1], centers[i + 1])
+        return min(max(rank / self.count, 0.0), 1.0)
+
+    @staticmethod
+    def _interpolate(x: float, x0: float, y0: float, x1: float, y1: float) -> float:
+        if x1 == x0:
+            return (y0 + y1) / 2
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def to_bytes(self) -> bytes:
+        self._compress()
+        header = _HEADER.pack(_FORMAT_VERSION, self.compression, self.count, self.total,
+                              self.min, self.max, len(self._means))
+        return header + array("d", self._means).tobytes() + array("d", self._weights).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        version, compression, count, total, minimum, maximum, n = _HEADER.unpack_from(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"unsupported t-digest format {version}")
+        digest = cls(compression)
+        digest.count, digest.total, digest.min, digest.max = count, total, minimum, maximum
+        values = array("d")
+        values.frombytes(data[_HEADER.size:_HEADER.size + 16 * n])
+        digest._means, digest._weights = list(values[:n]), list(values[n:])
+        return digest
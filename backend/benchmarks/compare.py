@@ -0,0 +1,70 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Exits with status 1 if any scenario's p95 latency grew, or its throughput
+dropped, by more than the threshold percentage. Scenarios where requests were
+rate limited (429) in either run are listed, since their figures only cover
+the requests that got through.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        report = json.load(f)
+    return {(r["dataset"], r["scenario"]): r for r in report["results"]}
+
+
+def change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    regressions = []
+    throttled = []
+
+    print(f"{'dataset':>9} {'scenario':<10} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18} {'req/s':>18}")
+    for key in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[key], candidate[key]
+        cells = []
+        for metric in ("p50", "p95", "p99"):
+            a, b = old["latency_ms"][metric], new["latency_ms"][metric]
+            cells.append(f"{a:.1f}->{b:.1f} ({change(a, b):+.0f}%)")
+        a, b = old["throughput_rps"], new["throughput_rps"]
+        cells.append(f"{a:.1f}->{b:.1f} ({change(a, b):+.0f}%)")
+        print(f"{key[0]:>9} {key[1]:<10} " + " ".join(f"{c:>18}" for c in cells))
+
+        if old.get("rate_limited") or new.get("rate_limited"):
+            throttled.append(f"{key[1]}@{key[0]} ({old.get('rate_limited', 0)}->{new.get('rate_limited', 0)})")
+        if change(old["latency_ms"]["p95"], new["latency_ms"]["p95"]) > args.threshold:
+            regressions.append(f"{key[1]}@{key[0]}: p95 latency")
+        if -change(old["throughput_rps"], new["throughput_rps"]) > args.threshold:
+            regressions.append(f"{key[1]}@{key[0]}: throughput")
+
+    missing = set(baseline) ^ set(candidate)
+    if missing:
+        print(f"\nNot compared (present in only one file): {sorted(missing)}")
+
+    if throttled:
+        print("\nRate limited (429) requests, not in the figures: " + ", ".join(throttled))
+
+    if regressions:
+        print(f"\nRegressions over {args.threshold}%: " + ", ".join(regressions))
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Load and latency benchmark for the grievance API.
+
+For each dataset size it seeds (or reuses) a SQLite database, starts the
+provider stubs and an API server pointed at both, drives each scenario at a
+fixed concurrency and records throughput and p50/p95/p99 latency. Results are
+written as JSON so runs can be compared with `python -m benchmarks.compare`.
+
+All traffic comes from one client, so the API's per-client rate limit is off
+unless --rate-limit is given; 429s are then counted apart from errors and,
+like errors, left out of the latency figures.
+
+Usage (from backend/):
+    python -m benchmarks.run --sizes 10k,100k,1m --concurrency 16 --requests 300 \
+        --output benchmarks/results/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from sqlalchemy import create_engine
+
+from app.migrate import migrate
+from app.scripts.generate_dataset import generate
+from .stubs import StubServer, add_stub_arguments, config_from_args
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, "benchmarks", "data")
+
+SCENARIOS = {
+    "create": ("POST", "/api/grievances"),
+    "list": ("GET", "/api/grievances?status=pending&department=Water%20Department"),
+    "search": ("GET", "/api/grievances?search=pothole"),
+    "stats": ("GET", "/admin/stats"),
+    "analytics": ("GET", "/admin/analytics"),
+}
+
+# 1x1 PNG; the stubs never decode it, it only has to be valid base64
+TINY_IMAGE = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+
+DESCRIPTIONS = [
+    "Water pipe burst near the market, the road is flooding and there is no supply",
+    "Garbage has not been collected for a week and the smell is unbearable",
+    "Street light pole is broken and the lane is completely dark at night",
+    "Huge pothole on the main road, two-wheelers are falling every day",
+]
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1], 1)
+    return int(float(value[:-1] if multiplier > 1 else value) * multiplier)
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def create_body(rng: random.Random, images: int) -> dict:
+    return {
+        "name": "Bench Citizen",
+        "phone": "9000000000",
+        "title": "Benchmark complaint",
+        "description": f"{rng.choice(DESCRIPTIONS)} (ref {rng.randint(0, 10**9)})",
+        "category": rng.choice(["water-supply", "roads", "sanitation", "electricity", None]),
+        "location": rng.choice(["Sector 12", "Main Road", "Near Hospital", "Block A"]),
+        "images": [TINY_IMAGE] * images or None,
+    }
+
+
+def run_scenario(base_url: str, name: str, total: int, concurrency: int, warmup: int, timeout: float,
+                 images: int = 0) -> dict:
+    method, path = SCENARIOS[name]
+    local = threading.local()
+    rng = random.Random(name)
+
+    def call(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        body = create_body(rng, images) if method == "POST" else None
+        started = time.perf_counter()
+        try:
+            status = session.request(method, base_url + path, json=body, timeout=timeout).status_code
+        except requests.RequestException:
+            status = None
+        return time.perf_counter() - started, status
+
+    for i in range(warmup):
+        call(i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(call, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, status in samples if status is not None and status < 400)
+    rate_limited = sum(1 for _, status in samples if status == 429)
+    errors = len(samples) - len(latencies) - rate_limited
+    return {
+        "scenario": name,
+        "requests": total,
+        "errors": errors,
+        "rate_limited": rate_limited,
+        "concurrency": concurrency,
+        "duration_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def start_api(db_path: str, stub_env: dict, port: int, workers: int,
+              rate_limit: float = 0.0) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(stub_env)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "VECTOR_INDEX_PATH": db_path + ".vectors.npz",
+        "LOG_LEVEL": "WARNING",
+        # 0 turns the limiter off; the bucket holds a minute's worth so a warm start is not throttled
+        "RATE_LIMIT_PER_MINUTE": str(rate_limit),
+        "RATE_LIMIT_BURST": str(max(rate_limit, 1.0)),
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not become healthy within 120s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,100k,1m", help="comma-separated dataset sizes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenarios")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario")
+    parser.add_argument("--images", type=int, default=1, help="images attached to each created grievance")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="API rate limit in requests per minute per client (default: off)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where seeded databases are kept")
+    parser.add_argument("--seed", type=int, default=0, help="dataset generator seed")
+    parser.add_argument("--fresh", action="store_true", help="re-seed databases even if present")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    stubs = StubServer(config=config_from_args(args)).start()
+    results = []
+    try:
+        for size in [parse_size(s) for s in args.sizes.split(",")]:
+            db_path = os.path.join(args.data_dir, f"bench_{size}_seed{args.seed}.db")
+            if args.fresh or not os.path.exists(db_path):
+                for suffix in ("", ".vectors.npz"):
+                    if os.path.exists(db_path + suffix):
+                        os.remove(db_path + suffix)
+                print(f"Seeding {size} grievances...", file=sys.stderr)
+                stats = generate(f"sqlite:///{db_path}", size, seed=args.seed, image_rate=0.0,
+                                 change_log=False, bulk_load=True)
+                print(f"  {stats['rows_per_second']:,.0f} rows/s", file=sys.stderr)
+            else:
+                # Cached databases may predate newer columns
+                bench_engine = create_engine(f"sqlite:///{db_path}")
+                migrate(bench_engine)
+                bench_engine.dispose()
+
+            api = start_api(db_path, stubs.env(), args.port, args.workers, args.rate_limit)
+            try:
+                for name in scenarios:
+                    print(f"[{size}] {name}...", file=sys.stderr)
+                    result = run_scenario(f"http://127.0.0.1:{args.port}", name, args.requests,
+                                          args.concurrency, args.warmup, args.timeout, args.images)
+                    result["dataset"] = size
+                    results.append(result)
+                    print(f"  p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms "
+                          f"p99={result['latency_ms']['p99']}ms {result['throughput_rps']} req/s "
+                          f"errors={result['errors']} rate_limited={result['rate_limited']}", file=sys.stderr)
+            finally:
+                api.terminate()
+                api.wait(timeout=30)
+    finally:
+        stubs.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": args.workers,
+            "rate_limit_per_minute": args.rate_limit,
+            "images_per_create": args.images,
+            "dataset_seed": args.seed,
+            "stub": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                     "error_rate": args.error_rate, "overrides": args.stub or []},
+            "provider_calls": stubs.config.calls,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Local stand-ins for the external AI providers, for benchmarking without network or quota.
+
+Serves, on one port:
+    POST /hf/<model>/pipeline/sentence-similarity   HF sentence similarity
+    POST /hf/<model>/pipeline/feature-extraction    HF embeddings
+    POST /hf/<captioning model>                     HF image-to-text (BLIP)
+    POST /openai/v1/chat/completions                Groq chat completions
+
+Point the API at it with:
+    HF_INFERENCE_BASE_URL=http://127.0.0.1:<port>/hf
+    GROQ_BASE_URL=http://127.0.0.1:<port>
+
+Usage:
+    python -m benchmarks.stubs --port 9100 --latency-ms 150 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVICES = ("similarity", "embedding", "caption", "chat")
+
+CAPTIONS = [
+    "a road with a large pothole filled with water",
+    "a pile of garbage on the side of a street",
+    "a broken street light pole next to a road",
+    "water leaking from a pipe onto the pavement",
+    "a cracked wall of an old building",
+]
+
+LLM_ANALYSIS = {
+    "description": "Localized surface degradation of the carriageway with standing water.",
+    "key_observations": ["Surface failure approximately 2 sq meters", "Standing water indicates drainage deficiency"],
+    "identified_problems": ["Primary deficiency: pothole - structural surface failure"],
+    "affected_areas": ["Primary impact zone: public right-of-way"],
+    "recommended_actions": ["Immediate: barricade the area", "Short-term: patch repair", "Long-term: drainage review"],
+    "severity": "medium",
+    "severity_reason": "Hazard to two-wheelers but no structural collapse risk",
+}
+
+
+class StubConfig:
+    def __init__(self, latency_ms=100.0, jitter_ms=20.0, error_rate=0.0, overrides=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # Per-service {"latency_ms": ..., "error_rate": ...}
+        self.overrides = overrides or {}
+        self.calls = {s: 0 for s in SERVICES}
+        self._lock = threading.Lock()
+
+    def setting(self, service: str, name: str) -> float:
+        return self.overrides.get(service, {}).get(name, getattr(self, name))
+
+    def count(self, service: str):
+        with self._lock:
+            self.calls[service] += 1
+
+
+def _embedding(text: str, dim: int = 384):
+    rng = random.Random(zlib.crc32(text.encode("utf-8")))
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _service(self) -> str:
+            if self.path.startswith("/openai/") or "chat/completions" in self.path:
+                return "chat"
+            if self.path.endswith("sentence-similarity"):
+                return "similarity"
+            if self.path.endswith("feature-extraction"):
+                return "embedding"
+            return "caption"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            service = self._service()
+            config.count(service)
+
+            latency = config.setting(service, "latency_ms")
+            jitter = config.setting(service, "jitter_ms")
+            time.sleep(max(0.0, random.gauss(latency, jitter)) / 1000.0)
+            if random.random() < config.setting(service, "error_rate"):
+                self._send(503, {"error": "stub: injected failure"})
+                return
+
+            if service == "chat":
+                # Multi-image prompts (batch and per-grievance analysis) expect one result per image
+                try:
+                    prompt = json.loads(raw or b"{}")["messages"][-1]["content"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    prompt = ""
+                match = re.search(r"Number of images: (\d+)", prompt)
+                content = {
+                    "results": [dict(LLM_ANALYSIS, index=i + 1) for i in range(int(match.group(1)))],
+                    "overall": {"severity": "high", "severity_reason": "Several hazards at one site"},
+                } if match else LLM_ANALYSIS
+                self._send(200, {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": "llama-3.3-70b-versatile",
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": json.dumps(content)},
+                    }],
+                    "usage": {"prompt_tokens": 600, "completion_tokens": 250, "total_tokens": 850},
+                })
+                return
+
+            try:
+                payload = json.loads(raw or b"{}")
+            except ValueError:
+                payload = {}
+            if service == "similarity":
+                sentences = payload.get("inputs", {}).get("sentences", [])
+                self._send(200, [round(random.uniform(0.7, 0.9), 4) for _ in sentences])
+            elif service == "embedding":
+                inputs = payload.get("inputs", [])
+                if isinstance(inputs, str):
+                    self._send(200, _embedding(inputs))
+                else:
+                    self._send(200, [_embedding(t) for t in inputs])
+            else:
+                self._send(200, [{"generated_text": random.choice(CAPTIONS)}])
+
+    return Handler
+
+
+class StubServer:
+    """Runs the stub providers on a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: StubConfig = None):
+        self.config = config or StubConfig()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.config))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment variables that point the API at this server."""
+        return {
+            "HF_INFERENCE_BASE_URL": f"{self.url}/hf",
+            "GROQ_BASE_URL": self.url,
+            "HF_TOKEN": "stub-token",
+            "GROQ_API_KEY": "stub-key",
+        }
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def parse_overrides(values):
+    """Parse ["chat:latency_ms=800", "caption:error_rate=0.1"] into a dict."""
+    overrides = {}
+    for value in values or []:
+        service, setting = value.split(":", 1)
+        name, number = setting.split("=", 1)
+        if service not in SERVICES:
+            raise ValueError(f"unknown service {service!r}, expected one of {SERVICES}")
+        overrides.setdefault(service, {})[name] = float(number)
+    return overrides
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="mean provider latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--stub", action="append", metavar="SERVICE:SETTING=VALUE",
+                        help=f"per-service override, services: {', '.join(SERVICES)}")
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, parse_overrides(args.stub))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, config_from_args(args))
+    print(f"Stub providers listening on {server.url}")
+    for key, value in server.env().items():
+        print(f"  {key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
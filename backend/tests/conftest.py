@@ -0,0 +1,88 @@
+"""
+Shared fixtures. Run from backend/: `pip install -r requirements-dev.txt && pytest`.
+
+The app reads its configuration at import time, so the environment is set
+here, before anything imports it: throwaway SQLite files in a temp
+directory, two tenants, no provider keys (analysis falls back to its local
+defaults) and no rate limiting unless a test installs a limiter.
+"""
+import os
+import tempfile
+import uuid
+
+_ROOT = tempfile.mkdtemp(prefix="grievance-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_ROOT}/grievance.db",
+    "TENANTS": "north,south",
+    "TENANT_DATABASE_URL": f"sqlite:///{_ROOT}/tenants/{{tenant}}/grievance.db",
+    "VECTOR_INDEX_PATH": f"{_ROOT}/vector_index.npz",
+    "NOTIFY_FILE_PATH": f"{_ROOT}/notifications.jsonl",
+    "NOTIFY_GATEWAY": "none",
+    "EMBEDDING_BACKEND": "local",
+    "HF_TOKEN": "",
+    "GROQ_API_KEY": "",
+    "WARMUP_ON_STARTUP": "false",
+    "MIGRATE_ON_STARTUP": "false",
+    "RATE_LIMIT_PER_MINUTE": "0",
+    "TRACK_CACHE_PATH": "",
+})
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import database  # noqa: E402
+from app.database import TENANTS, tenant_engines  # noqa: E402
+from app import main  # noqa: E402
+from app.main import app  # noqa: E402
+from app.migrate import migrate  # noqa: E402
+from app.models import ArchiveBase  # noqa: E402
+
+# Tenant files (vector indexes) next to the test databases, not in the repo's db/
+database.DB_PATH = os.path.join(_ROOT, "grievance.db")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    for tenant in [None, *TENANTS]:
+        migrate(tenant_engines.engine(tenant))
+        migrate(tenant_engines.archive_engine(tenant), metadata=ArchiveBase.metadata)
+
+
+@pytest.fixture(autouse=True)
+def unique_tickets(monkeypatch):
+    # The real ids draw from 900 numbers a year; a test run creates enough grievances to collide
+    monkeypatch.setattr(main, "generate_ticket_id", lambda: f"GRV-TEST-{uuid.uuid4().hex[:10].upper()}")
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def tenant_headers(tenant):
+    return {"X-Tenant": tenant} if tenant else {}
+
+
+def new_grievance(**overrides):
+    """A create request whose text is unique, so it never matches another test's grievance as a duplicate."""
+    # Mostly unique words: the shared template alone would be similar enough to count as a duplicate
+    words = [uuid.uuid4().hex[:8] for _ in range(5)]
+    body = {
+        "name": "Test Citizen",
+        "phone": "9000000000",
+        "title": f"Streetlight {words[0]}",
+        "description": f"Streetlight broken near the bus stop {' '.join(words[:4])}",
+        "location": f"Ward {words[4]}",
+        "category": "electricity",
+    }
+    body.update(overrides)
+    return body
+
+
+@pytest.fixture
+def create(client):
+    def create(tenant=None, **overrides):
+        response = client.post("/api/grievances", json=new_grievance(**overrides), headers=tenant_headers(tenant))
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
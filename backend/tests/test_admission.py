@@ -0,0 +1,65 @@
+"""Admission control: 429 from the per-client token bucket, 503 when a provider's queue is full or too slow."""
+import pytest
+
+from app import main
+from app.services import admission
+
+TEXT = {"text": "The water supply has been cut off for two days"}
+
+
+def test_an_empty_token_bucket_is_rejected_with_429(client, monkeypatch):
+    monkeypatch.setattr(admission, "rate_limiter", admission.RateLimiter(per_minute=6, burst=2))
+
+    assert client.post("/api/analyze-text", json=TEXT).status_code == 200
+    assert client.post("/api/analyze-text", json=TEXT).status_code == 200
+    rejected = client.post("/api/analyze-text", json=TEXT)
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+
+def test_clients_have_separate_buckets():
+    limiter = admission.RateLimiter(per_minute=6, burst=1)
+    assert limiter.acquire("10.0.0.1") == 0
+    assert limiter.acquire("10.0.0.1") > 0
+    assert limiter.acquire("10.0.0.2") == 0
+
+
+@pytest.fixture
+def busy_provider(monkeypatch):
+    """Install a one-slot "hf" limiter, route text analysis through it and hold its only slot."""
+    def install(queue_size, timeout):
+        limiter = admission.ProviderLimiter("hf", 1, queue_size=queue_size, timeout=timeout)
+        monkeypatch.setitem(admission.providers, "hf", limiter)
+        monkeypatch.setattr(main, "providers_for", lambda *args, **kwargs: ["hf"])
+        level = limiter.acquire()
+        return limiter, level
+    return install
+
+
+def test_a_full_provider_queue_is_rejected_with_503(client, busy_provider):
+    limiter, level = busy_provider(queue_size=0, timeout=5)
+    try:
+        rejected = client.post("/api/analyze-text", json=TEXT)
+    finally:
+        limiter.release(level, 0.0)
+    assert rejected.status_code == 503
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert limiter.waiting == 0
+
+
+def test_a_queued_request_times_out_with_503(client, busy_provider):
+    limiter, level = busy_provider(queue_size=4, timeout=0.05)
+    try:
+        rejected = client.post("/api/analyze-text", json=TEXT)
+    finally:
+        limiter.release(level, 0.0)
+    assert rejected.status_code == 503
+    assert limiter.waiting == 0
+    assert limiter.in_flight == 0
+
+
+def test_a_freed_slot_admits_the_next_request(client, busy_provider):
+    limiter, level = busy_provider(queue_size=0, timeout=5)
+    limiter.release(level, 0.0)
+    assert client.post("/api/analyze-text", json=TEXT).status_code == 200
+    assert limiter.in_flight == 0
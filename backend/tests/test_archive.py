@@ -0,0 +1,64 @@
+"""Deleting, archiving and restoring grievances keeps cached views and dashboard ETags honest."""
+from app.database import SessionLocal
+from app.services import archive
+
+
+def _archive_all():
+    db = SessionLocal()
+    try:
+        return archive.archive_resolved(db, older_than_days=0)
+    finally:
+        db.close()
+
+
+def _resolve_and_archive(client, created):
+    response = client.patch(f"/api/grievances/{created['grievance_id']}", json={"status": "resolved"})
+    assert response.status_code == 200
+    assert _archive_all() >= 1
+
+
+def test_deleting_an_archived_grievance_drops_its_cached_views(client, create):
+    created = create()
+    grievance_id, ticket = created["grievance_id"], created["ticket_id"]
+    _resolve_and_archive(client, created)
+    assert client.get(f"/grievances/track/{grievance_id}").status_code == 200
+    assert client.get(f"/api/grievances/{ticket}").status_code == 200
+
+    assert client.delete(f"/api/grievances/{grievance_id}").status_code == 200
+
+    assert client.get(f"/grievances/track/{grievance_id}").status_code == 404
+    assert client.get(f"/api/grievances/{ticket}").status_code == 404
+
+
+def test_deleting_an_archived_grievance_moves_the_dashboard_etags(client, create):
+    created = create()
+    _resolve_and_archive(client, created)
+    stats = client.get("/admin/stats")
+    analytics = client.get("/admin/analytics")
+
+    assert client.delete(f"/api/grievances/{created['grievance_id']}").status_code == 200
+
+    fresh = client.get("/admin/stats", headers={"If-None-Match": stats.headers["etag"]})
+    assert fresh.status_code == 200
+    assert fresh.json()["total"] == stats.json()["total"] - 1
+    assert client.get("/admin/analytics", headers={"If-None-Match": analytics.headers["etag"]}).status_code == 200
+
+    changes = client.get("/api/grievances/changes", params={"since": 0}).json()["changes"]
+    assert changes[-1]["op"] == "delete"
+    assert changes[-1]["grievance_id"] == created["grievance_id"]
+
+
+def test_archive_and_restore_refresh_the_tracking_view(client, create):
+    grievance_id = create()["grievance_id"]
+    hot = client.get(f"/grievances/track/{grievance_id}")
+    assert hot.json()["status"] == "pending"
+
+    _resolve_and_archive(client, {"grievance_id": grievance_id})
+    archived = client.get(f"/grievances/track/{grievance_id}")
+    assert archived.json()["status"] == "resolved"
+    assert archived.headers["etag"] != hot.headers["etag"]
+
+    assert client.post(f"/admin/grievances/{grievance_id}/restore").status_code == 200
+    restored = client.get(f"/grievances/track/{grievance_id}", headers={"If-None-Match": archived.headers["etag"]})
+    assert restored.status_code == 200
+    assert restored.headers["etag"] != archived.headers["etag"]
@@ -0,0 +1,50 @@
+"""Cached grievance views (row cache, track cache) follow updates and deletes."""
+from app import main
+
+
+def _listed(client, grievance_id):
+    rows = client.get("/api/grievances").json()["grievances"]
+    return next((row for row in rows if row["id"] == grievance_id), None)
+
+
+def test_an_update_refreshes_the_cached_views(client, create):
+    grievance_id = create()["grievance_id"]
+    # Warm every cache first
+    assert _listed(client, grievance_id)["status"] == "pending"
+    detail = client.get(f"/api/grievances/{grievance_id}")
+    track = client.get(f"/grievances/track/{grievance_id}")
+    assert detail.json()["status"] == "pending"
+
+    response = client.patch(f"/api/grievances/{grievance_id}", json={"status": "in_progress", "department": "Roads"})
+    assert response.status_code == 200
+
+    listed = _listed(client, grievance_id)
+    assert (listed["status"], listed["department"]) == ("in_progress", "Roads")
+    updated = client.get(f"/api/grievances/{grievance_id}", headers={"If-None-Match": detail.headers["etag"]})
+    assert updated.status_code == 200
+    assert updated.json()["department"] == "Roads"
+    tracked = client.get(f"/grievances/track/{grievance_id}", headers={"If-None-Match": track.headers["etag"]})
+    assert tracked.status_code == 200
+    assert tracked.json()["status"] == "in_progress"
+
+
+def test_a_delete_drops_the_cached_views(client, create):
+    grievance_id = create()["grievance_id"]
+    assert _listed(client, grievance_id) is not None
+    assert client.get(f"/api/grievances/{grievance_id}").status_code == 200
+    assert client.get(f"/grievances/track/{grievance_id}").status_code == 200
+
+    assert client.delete(f"/api/grievances/{grievance_id}").status_code == 200
+
+    assert _listed(client, grievance_id) is None
+    assert client.get(f"/api/grievances/{grievance_id}").status_code == 404
+    assert client.get(f"/grievances/track/{grievance_id}").status_code == 404
+
+
+def test_a_cached_unknown_id_is_found_once_created(client, create, monkeypatch):
+    ticket = "GRV-TEST-NOT-YET"
+    assert client.get(f"/api/grievances/{ticket}").status_code == 404
+
+    monkeypatch.setattr(main, "generate_ticket_id", lambda: ticket)
+    create()
+    assert client.get(f"/api/grievances/{ticket}").status_code == 200
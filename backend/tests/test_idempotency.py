@@ -0,0 +1,46 @@
+"""Idempotency-Key on POST /api/grievances: retries replay, reused keys with another body are refused."""
+import uuid
+
+from app.database import SessionLocal
+from app.models import Grievance
+
+from .conftest import new_grievance
+
+
+def _count(grievance_id):
+    db = SessionLocal()
+    try:
+        return db.query(Grievance).filter(Grievance.id == grievance_id).count()
+    finally:
+        db.close()
+
+
+def test_a_retry_replays_the_original_response(client):
+    key = {"Idempotency-Key": uuid.uuid4().hex}
+    body = new_grievance()
+
+    first = client.post("/api/grievances", json=body, headers=key)
+    retry = client.post("/api/grievances", json=body, headers=key)
+
+    assert first.status_code == retry.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert _count(first.json()["grievance_id"]) == 1
+
+
+def test_reusing_a_key_with_another_body_is_rejected(client):
+    key = {"Idempotency-Key": uuid.uuid4().hex}
+    first = client.post("/api/grievances", json=new_grievance(), headers=key)
+    assert first.status_code == 200
+
+    conflicting = client.post("/api/grievances", json=new_grievance(), headers=key)
+    assert conflicting.status_code == 422
+
+
+def test_keys_are_independent(client):
+    body = new_grievance()
+    first = client.post("/api/grievances", json=body, headers={"Idempotency-Key": uuid.uuid4().hex})
+    second = client.post("/api/grievances", json=body, headers={"Idempotency-Key": uuid.uuid4().hex})
+    assert "Idempotent-Replayed" not in second.headers
+    assert second.json()["grievance_id"] != first.json()["grievance_id"]
@@ -0,0 +1,52 @@
+"""Each tenant has its own row cache, duplicate index and vector index."""
+from app.services import dedup, vector_index
+from app.services.row_cache import row_caches
+
+from .conftest import new_grievance, tenant_headers
+
+
+def _listed_ids(client, tenant):
+    rows = client.get("/api/grievances", headers=tenant_headers(tenant)).json()["grievances"]
+    return {row["id"] for row in rows}
+
+
+def test_lists_and_details_are_per_tenant(client, create):
+    north = create(tenant="north")["grievance_id"]
+    south = create(tenant="south")["grievance_id"]
+    # Cache both rows in their own tenant first
+    assert north in _listed_ids(client, "north")
+    assert south in _listed_ids(client, "south")
+
+    assert north not in _listed_ids(client, "south")
+    assert south not in _listed_ids(client, "north")
+    assert north not in _listed_ids(client, None)
+    assert client.get(f"/api/grievances/{north}", headers=tenant_headers("south")).status_code == 404
+    assert client.get(f"/api/grievances/{north}", headers=tenant_headers("north")).status_code == 200
+    assert row_caches.get("north") is not row_caches.get("south")
+
+
+def test_duplicates_are_only_found_within_a_tenant(create):
+    body = new_grievance()
+    first = create(tenant="north", **body)
+
+    assert create(tenant="south", **body)["duplicate_of"] is None
+    assert create(tenant="north", **body)["duplicate_of"] == first["ticket_id"]
+    assert dedup.duplicate_indexes.get("north") is not dedup.duplicate_indexes.get("south")
+
+
+def test_similar_grievances_come_from_the_same_tenant(client, create):
+    body = new_grievance()
+    north = create(tenant="north", **body)["grievance_id"]
+    south = create(tenant="south", **body)["grievance_id"]
+    other_north = create(tenant="north", **new_grievance())["grievance_id"]
+
+    response = client.get(f"/api/grievances/{other_north}/similar", params={"k": 50},
+                          headers=tenant_headers("north"))
+    assert response.status_code == 200
+    similar = {row["id"] for row in response.json()["similar"]}
+    assert north in similar
+    assert south not in similar
+
+    south_index = vector_index.vector_indexes.get("south")
+    assert south_index.get_vector(south) is not None
+    assert south_index.get_vector(north) is None
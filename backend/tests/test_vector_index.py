@@ -0,0 +1,63 @@
+"""Vector index: reads never write, and the index file is saved off the request path."""
+import numpy as np
+
+from app.database import SessionLocal
+from app.models import Grievance, GrievanceEmbedding
+from app.services import vector_index
+
+
+def _embedding_count(grievance_id):
+    db = SessionLocal()
+    try:
+        return db.query(GrievanceEmbedding).filter(GrievanceEmbedding.grievance_id == grievance_id).count()
+    finally:
+        db.close()
+
+
+def _unindex(grievance_id):
+    db = SessionLocal()
+    try:
+        vector_index.remove_grievance(db, grievance_id)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_finding_similar_grievances_does_not_store_an_embedding(create):
+    grievance_id = create()["grievance_id"]
+    _unindex(grievance_id)
+
+    db = SessionLocal()
+    try:
+        grievance = db.query(Grievance).filter(Grievance.id == grievance_id).one()
+        assert vector_index.find_similar(db, grievance) is not None
+        assert not db.new and not db.dirty
+    finally:
+        db.close()
+    assert _embedding_count(grievance_id) == 0
+
+
+def test_the_similar_endpoint_indexes_in_the_background(client, create):
+    grievance_id = create()["grievance_id"]
+    _unindex(grievance_id)
+
+    response = client.get(f"/api/grievances/{grievance_id}/similar")
+    assert response.status_code == 200
+    # TestClient runs background tasks before returning
+    assert _embedding_count(grievance_id) == 1
+    assert vector_index.vector_indexes.get(None).get_vector(grievance_id) is not None
+
+
+def test_changes_are_saved_on_a_background_thread(tmp_path):
+    index = vector_index.VectorIndex(str(tmp_path / "index.npz"), dim=8, model="test")
+    index.loaded = True
+    rng = np.random.default_rng(0)
+    for i in range(vector_index.SAVE_EVERY):
+        index.add(f"g{i}", rng.random(8, dtype=np.float32), "water")
+
+    assert index._saver is not None
+    index._saver.join(5)
+    reloaded = vector_index.VectorIndex(index.path, dim=8, model="test")
+    assert reloaded.load_file()
+    assert len(reloaded) == vector_index.SAVE_EVERY
+    np.testing.assert_allclose(reloaded.get_vector("g7"), index.get_vector("g7"))